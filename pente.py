@@ -1,4 +1,22 @@
+import copy
+import math
+import multiprocessing
+import random
+import threading
 import time
+from array import array
+from collections import Counter, OrderedDict
+from concurrent.futures import ProcessPoolExecutor, wait
+from functools import lru_cache
+from operator import itemgetter
+
+from pente_threats import ThreatSearch
+
+try:
+    import numpy as np
+    from numpy.lib.stride_tricks import sliding_window_view
+except ImportError:  # NumPy is optional, the pure Python heuristics are used without it
+    np = None
 
 agent = 1
 player = 2
@@ -31,19 +49,259 @@ directions = [
     (0, -1), (-1, 0), (-1, -1), (1, -1)
 ]
 
-class PenteGame:
+_BITBOARD_TABLES = {}
+
+
+class BitBoard(list):
+    """
+    Board backend that keeps one big-int bitboard per player next to the rows
+
+    Cells are numbered row * (board_size + 1) + col. The extra column is never
+    set, so shifting a bitboard along any of the four line directions cannot
+    wrap a line onto the next row. The rows are plain lists, so reads and the
+    heuristics cost the same as with the list backend. PenteGame.push_move and
+    pop_move update the bitboards; assigning a whole row keeps them in sync
+    too, but after writing single cells straight into the rows call sync().
+    """
+
     def __init__(self, board_size=19):
+        self.size = board_size
+        self.stride = board_size + 1
+        self.bits = [0, 0, 0]  # Indexed by stone value, bits[0] is unused
+        # Shift for horizontal, vertical, diagonal and anti-diagonal lines
+        self.shifts = (1, self.stride, self.stride + 1, self.stride - 1)
+        if board_size not in _BITBOARD_TABLES:
+            _BITBOARD_TABLES[board_size] = self._build_tables()
+        self.board_mask, self.cell_bits, self.capture_masks, self.win_masks = _BITBOARD_TABLES[board_size]
+        super().__init__([0] * board_size for _ in range(board_size))
+
+    def _build_tables(self):
+        """
+        Precompute the masks of every cell, indexed by row * board_size + col
+
+        Returns:
+            tuple: (on-board mask, bit of each cell,
+                    capture masks: (neighbours, ((pair, end, first, second), ...)),
+                    win masks: ((neighbours, five-cell windows), ...) per line direction)
+        """
+        size = self.size
+
+        def bit(row, col):
+            return 1 << self.index(row, col)
+
+        def on_board(row, col):
+            return 0 <= row < size and 0 <= col < size
+
+        board_mask = 0
+        cell_bits = []
+        capture_masks = []
+        win_masks = []
+        for row in range(size):
+            for col in range(size):
+                board_mask |= bit(row, col)
+                cell_bits.append(bit(row, col))
+
+                neighbours = 0
+                shapes = []
+                for dx, dy in directions:
+                    if on_board(row + 3 * dx, col + 3 * dy):
+                        first, second = (row + dx, col + dy), (row + 2 * dx, col + 2 * dy)
+                        shapes.append((bit(*first) | bit(*second), bit(row + 3 * dx, col + 3 * dy), first, second))
+                        neighbours |= bit(*first)
+                capture_masks.append((neighbours, tuple(shapes)))
+
+                lines = []
+                for dx, dy in directions[:4]:
+                    adjacent = 0
+                    for step in (1, -1):
+                        if on_board(row + step * dx, col + step * dy):
+                            adjacent |= bit(row + step * dx, col + step * dy)
+                    windows = []
+                    for start in range(-4, 1):
+                        cells = [(row + (start + k) * dx, col + (start + k) * dy) for k in range(5)]
+                        if all(on_board(r, c) for r, c in cells):
+                            window = 0
+                            for r, c in cells:
+                                window |= bit(r, c)
+                            windows.append(window)
+                    lines.append((adjacent, tuple(windows)))
+                win_masks.append(tuple(lines))
+        return board_mask, cell_bits, capture_masks, win_masks
+
+    def __setitem__(self, row, values):
+        if row < 0:
+            row += len(self)
+        list.__setitem__(self, row, list(values))
+        self.sync_row(row)
+
+    def index(self, row, col):
+        """Bit index of a cell"""
+        return row * self.stride + col
+
+    def sync_row(self, row):
+        """Rebuild the bits of one row from its list contents."""
+        row_bits = ((1 << self.size) - 1) << (row * self.stride)
+        self.bits[1] &= ~row_bits
+        self.bits[2] &= ~row_bits
+        for col, stone in enumerate(list.__getitem__(self, row)[:self.size]):
+            if stone:
+                self.bits[stone] |= 1 << (row * self.stride + col)
+
+    def sync(self):
+        """Rebuild the bitboards from the rows, after cells were written straight into them."""
+        for row in range(self.size):
+            self.sync_row(row)
+
+    def cells(self, bits):
+        """Flat row * board_size + col indices of the set bits, in increasing order."""
+        cells = []
+        while bits:
+            low = bits & -bits
+            row, col = divmod(low.bit_length() - 1, self.stride)
+            cells.append(row * self.size + col)
+            bits ^= low
+        return cells
+
+    def find_captures(self, row, col, player):
+        """
+        Stones player captures by playing at (row, col), read from the precomputed masks
+
+        Returns:
+            list: (row, col) of each captured stone, two per pair
+        """
+        neighbours, shapes = self.capture_masks[row * self.size + col]
+        opponent = self.bits[3 - player]
+        if not opponent & neighbours:
+            return []  # No opponent stone next to the cell, nothing to capture
+        mine = self.bits[player]
+        captured = []
+        for pair, end, first, second in shapes:
+            if opponent & pair == pair and mine & end:
+                captured.append(first)
+                captured.append(second)
+        return captured
+
+    def fives(self, player, shift):
+        """Bitboard of the start cells of every five-in-a-row along one shift."""
+        stones = self.bits[player]
+        pairs = stones & (stones >> shift)
+        fours = pairs & (pairs >> 2 * shift)
+        return fours & (stones >> 4 * shift)
+
+    def has_five(self, player):
+        """Check whether player has five in a row anywhere on the board."""
+        return any(self.fives(player, shift) for shift in self.shifts)
+
+    def five_through(self, row, col, player):
+        """Check whether player has five in a row on a line through (row, col)."""
+        stones = self.bits[player]
+        for adjacent, windows in self.win_masks[row * self.size + col]:
+            if stones & adjacent:  # A five through the cell continues on one side at least
+                for window in windows:
+                    if stones & window == window:
+                        return True
+        return False
+
+    def capture_moves(self, player):
+        """Bitboard of the empty cells where player would capture at least one pair."""
+        mine = self.bits[player]
+        opponent = self.bits[3 - player]
+        empty = ~(mine | opponent) & self.board_mask
+        moves = 0
+        for shift in self.shifts:
+            moves |= (opponent >> shift) & (opponent >> 2 * shift) & (mine >> 3 * shift)
+            moves |= (opponent << shift) & (opponent << 2 * shift) & (mine << 3 * shift)
+        return moves & empty
+
+
+_ZOBRIST_KEYS = {}
+
+
+def zobrist_keys(board_size):
+    """
+    Zobrist keys for a board size, generated once from a fixed seed
+
+    Returns:
+        tuple: (stone keys per player and cell, side-to-move key,
+                capture-count keys per player and count)
+    """
+    if board_size not in _ZOBRIST_KEYS:
+        rng = random.Random(board_size)
+        cells = board_size * board_size
+        stone_keys = [None] + [[rng.getrandbits(64) for _ in range(cells)] for _ in range(2)]
+        side_key = rng.getrandbits(64)
+        capture_keys = [None] + [[rng.getrandbits(64) for _ in range(cells // 2 + 1)] for _ in range(2)]
+        _ZOBRIST_KEYS[board_size] = (stone_keys, side_key, capture_keys)
+    return _ZOBRIST_KEYS[board_size]
+
+
+class PenteGame:
+    def __init__(self, board_size=19, backend="list"):
         """
         Initialize the Pente game board and game state
 
         Args:
             board_size (int): Size of the game board (default 19x19)
+            backend (str): Board representation, 'list' or 'bitboard'
         """
         self.board_size = board_size
-        self.board = [[0 for _ in range(board_size)] for _ in range(board_size)]
+        self.backend = backend
+        if backend == "bitboard":
+            self.board = BitBoard(board_size)
+        elif backend == "list":
+            self.board = [[0 for _ in range(board_size)] for _ in range(board_size)]
+        else:
+            raise ValueError(f"Unknown board backend: {backend}")
+        self.bitboard = self.board if backend == "bitboard" else None  # Kept in sync by push/pop
         self.current_player = 1
         self.captures_p1 = 0
         self.captures_p2 = 0
+        self.last_move = None  # Lets check_win look only at the lines through it
+        self.move_stack = []  # (row, col, player, captured, last_move, current_player, hash) per move
+        self.stone_keys, self.side_key, self.capture_keys = zobrist_keys(board_size)
+        self.observers = []  # Incremental evaluators updated on every push/pop
+        self.hash = self.compute_hash()
+
+    def compute_hash(self):
+        """
+        Zobrist key of the position from scratch
+
+        push_move/pop_move keep self.hash up to date; call this after writing
+        stones straight into the board.
+
+        Returns:
+            int: 64-bit key covering stones, side to move and capture counts
+        """
+        key = self.capture_keys[1][self.captures_p1] ^ self.capture_keys[2][self.captures_p2]
+        if self.current_player == 2:
+            key ^= self.side_key
+        for row in range(self.board_size):
+            for col in range(self.board_size):
+                stone = self.board[row][col]
+                if stone:
+                    key ^= self.stone_keys[stone][row * self.board_size + col]
+        return key
+
+    def copy(self):
+        """
+        Independent copy of the game for searching away from the original
+
+        The board, captures, side to move and move history are copied;
+        observers are not, a search attaches its own to the copy.
+
+        Returns:
+            PenteGame: The copy
+        """
+        game = PenteGame(self.board_size, self.backend)
+        for row in range(self.board_size):
+            game.board[row] = list(self.board[row])
+        game.current_player = self.current_player
+        game.captures_p1 = self.captures_p1
+        game.captures_p2 = self.captures_p2
+        game.last_move = self.last_move
+        game.move_stack = list(self.move_stack)
+        game.hash = game.compute_hash()
+        return game
 
     def is_valid_move(self, row, col):
         """
@@ -61,101 +319,1218 @@ class PenteGame:
                 self.board[row][col] == 0)
 
     def make_move(self, row, col):
+        return self.push_move(row, col)
+
+    def push_move(self, row, col, player=None):
+        """
+        Place a stone, resolve its captures and record how to undo them
+
+        Args:
+            row (int): Row of the move
+            col (int): Column of the move
+            player (int): Stone to place, defaults to the current player
+
+        Returns:
+            bool: True if the move was made, False if it was invalid
+        """
         if not self.is_valid_move(row, col):
             return False
+        if player is None:
+            player = self.current_player
+
+        previous_hash = key = self.hash
+        self.board[row][col] = player
+        if self.bitboard is not None:
+            self.bitboard.bits[player] |= self.bitboard.cell_bits[row * self.board_size + col]
+        key ^= self.stone_keys[player][row * self.board_size + col]
+        captured = self.remove_captures(row, col)
+        if captured:
+            opponent_keys = self.stone_keys[3 - player]
+            for r, c in captured:
+                key ^= opponent_keys[r * self.board_size + c]
+            capture_keys = self.capture_keys[player]
+            if player == 1:
+                key ^= capture_keys[self.captures_p1]
+                self.captures_p1 += len(captured) // 2
+                key ^= capture_keys[self.captures_p1]
+            else:
+                key ^= capture_keys[self.captures_p2]
+                self.captures_p2 += len(captured) // 2
+                key ^= capture_keys[self.captures_p2]
+        if self.current_player == player:
+            key ^= self.side_key
+
+        self.move_stack.append((row, col, player, captured, self.last_move, self.current_player, previous_hash))
+        self.last_move = (row, col)
+        self.current_player = 3 - player
+        self.hash = key
+        for observer in self.observers:
+            observer.update(row, col, captured)
+        return True
 
-        self.board[row][col] = self.current_player
+    def pop_move(self):
+        """
+        Undo the last push_move, putting back any captured stones
 
-        captures = self.check_captures(row, col)
-        if captures > 0:
-            if self.current_player == 1:
-                self.captures_p1 += captures
-            elif self.current_player == 2:
-                self.captures_p2 += captures
+        Returns:
+            tuple: (row, col) of the undone move
+        """
+        row, col, player, captured, last_move, current_player, self.hash = self.move_stack.pop()
+        self.board[row][col] = 0
+        bitboard = self.bitboard
+        if bitboard is not None:
+            bitboard.bits[player] ^= bitboard.cell_bits[row * self.board_size + col]
+        if captured:
+            opponent = 3 - player
+            for r, c in captured:
+                self.board[r][c] = opponent
+            if bitboard is not None:
+                cell_bits = bitboard.cell_bits
+                for r, c in captured:
+                    bitboard.bits[opponent] |= cell_bits[r * self.board_size + c]
+            if player == 1:
+                self.captures_p1 -= len(captured) // 2
+            else:
+                self.captures_p2 -= len(captured) // 2
+        self.last_move = last_move
+        self.current_player = current_player
+        for observer in self.observers:
+            observer.update(row, col, captured)
+        return row, col
+
+    def attach_observer(self, observer_class):
+        """
+        Get the observer of a class kept in sync by push_move/pop_move, creating it if needed
 
-        self.toggle_player()
+        Args:
+            observer_class (type): Class taking the game, with rebuild() and update(row, col, captured)
 
-        print(f"Current player after move: {self.current_player}")  # Debugging line
-        return True
+        Returns:
+            object: The attached observer
+        """
+        for observer in self.observers:
+            if type(observer) is observer_class:
+                return observer
+        observer = observer_class(self)
+        self.observers.append(observer)
+        return observer
 
     def toggle_player(self):
         #Switch the current player between 1 and 2.
         self.current_player = 3 - self.current_player
-        print(f"Current player after toggle: {self.current_player}")  # Debugging line
+        self.hash ^= self.side_key
 
     def check_captures(self, row, col):
-       
-        total_captures = 0
-        current_stone = self.board[row][col]
-        opponent_stone = 3 - current_stone
+        return len(self.remove_captures(row, col)) // 2
 
-        for dx, dy in directions:
-            total_captures += self.check_direction_captures(row, col, dx, dy, current_stone, opponent_stone)
+    def remove_captures(self, row, col):
+        """
+        Remove every pair captured by the stone at (row, col)
 
-        return total_captures
+        Returns:
+            list: (row, col) of each removed stone, two per captured pair
+        """
+        bitboard = self.bitboard
+        if bitboard is None:
+            captured = []
+            current_stone = self.board[row][col]
+            opponent_stone = 3 - current_stone
+
+            for dx, dy in directions:
+                if self.check_direction_captures(row, col, dx, dy, current_stone, opponent_stone):
+                    captured.append((row + dx, col + dy))
+                    captured.append((row + 2 * dx, col + 2 * dy))
+
+            return captured
+
+        # One pass over the cell's precomputed capture masks, then clear rows and bits together
+        player = self.board[row][col]
+        captured = bitboard.find_captures(row, col, player)
+        if captured:
+            cell_bits = bitboard.cell_bits
+            opponent = 3 - player
+            for r, c in captured:
+                self.board[r][c] = 0
+                bitboard.bits[opponent] ^= cell_bits[r * self.board_size + c]
+        return captured
 
     def check_direction_captures(self, row, col, dx, dy, current_stone, opponent_stone):
        
-        captures = 0
-        try:
-            # Check for opponent stones to capture
-            if (self.board[row + dx][col + dy] == opponent_stone and
-                    self.board[row + 2 * dx][col + 2 * dy] == opponent_stone and
-                    self.board[row + 3 * dx][col + 3 * dy] == current_stone):
-                # Remove captured stones
-                self.board[row + dx][col + dy] = 0
-                self.board[row + 2 * dx][col + 2 * dy] = 0
-                captures = 1
-        except IndexError:
-            # Out of board bounds
+        # Out of board bounds (negative indices would wrap around)
+        if not (0 <= row + 3 * dx < self.board_size and 0 <= col + 3 * dy < self.board_size):
+            return 0
+
+        found = (self.board[row + dx][col + dy] == opponent_stone and
+                 self.board[row + 2 * dx][col + 2 * dy] == opponent_stone and
+                 self.board[row + 3 * dx][col + 3 * dy] == current_stone)
+        if not found:
             return 0
 
-        return captures
+        # Remove captured stones
+        self.board[row + dx][col + dy] = 0
+        self.board[row + 2 * dx][col + 2 * dy] = 0
+        return 1
 
     def check_win(self):
-        """Check for win conditions."""
-        for player in [1, 2]:
-            # Check horizontal, vertical, and diagonal for a winning line
-            for row in range(self.board_size):
-                for col in range(self.board_size - 4):
-                    if all(self.board[row][col + i] == player for i in range(5)):
-                        return player
-            for col in range(self.board_size):
-                for row in range(self.board_size - 4):
-                    if all(self.board[row + i][col] == player for i in range(5)):
-                        return player
-            for row in range(self.board_size - 4):
-                for col in range(self.board_size - 4):
-                    if all(self.board[row + i][col + i] == player for i in range(5)):
-                        return player
-                    if all(self.board[row + 4 - i][col + i] == player for i in range(5)):
-                        return player
+        """
+        Check for win conditions.
+
+        When the last move is known only the lines through it can hold a new
+        five, so just those are checked. Stones written straight into the
+        board bypass last_move; set it to None to force a full-board scan.
+        """
+        if self.last_move is not None:
+            row, col = self.last_move
+            stone = self.board[row][col]
+            if stone and self.check_win_at(row, col):
+                return stone
+        else:
+            if self.bitboard is not None:
+                self.bitboard.sync()  # Stones written straight into the rows are not in the bits yet
+            for player in [1, 2]:
+                if self.has_five(player):
+                    return player
 
         if self.captures_p1 >= 5:
             return 1
         if self.captures_p2 >= 5:
             return 2
 
-        return None  
+        return None
+
+    def check_win_at(self, row, col):
+        """
+        Check whether the stone at (row, col) is part of five in a row
+
+        Only the up-to-9-cell lines through the cell are examined.
+
+        Returns:
+            bool: True if one of the four lines through the cell holds a five
+        """
+        stone = self.board[row][col]
+        if not stone:
+            return False
+        if self.bitboard is not None:
+            return self.bitboard.five_through(row, col, stone)
+
+        for dx, dy in directions[:4]:
+            count = 1
+            for step in (1, -1):
+                for i in range(1, 5):
+                    r, c = row + step * i * dx, col + step * i * dy
+                    if not (0 <= r < self.board_size and 0 <= c < self.board_size) or self.board[r][c] != stone:
+                        break
+                    count += 1
+            if count >= 5:
+                return True
+        return False
+
+    def has_five(self, player):
+        """Scan the whole board for five in a row of player's stones."""
+        if self.bitboard is not None:
+            # Shift-and-AND over the four line directions
+            return self.bitboard.has_five(player)
+
+        # Check horizontal, vertical, and diagonal for a winning line
+        for row in range(self.board_size):
+            for col in range(self.board_size - 4):
+                if all(self.board[row][col + i] == player for i in range(5)):
+                    return True
+        for col in range(self.board_size):
+            for row in range(self.board_size - 4):
+                if all(self.board[row + i][col] == player for i in range(5)):
+                    return True
+        for row in range(self.board_size - 4):
+            for col in range(self.board_size - 4):
+                if all(self.board[row + i][col + i] == player for i in range(5)):
+                    return True
+                if all(self.board[row + 4 - i][col + i] == player for i in range(5)):
+                    return True
+        return False
+
+class SearchTimeout(Exception):
+    """Raised inside the search when the deadline has passed or a stop was requested."""
+
+
+class TranspositionTable:
+    """
+    Fixed-size transposition table kept in flat typed arrays
+
+    Each bucket has two slots: a depth-preferred slot, only replaced by an
+    entry searched at least as deep (or left over from an older search),
+    and an always-replace slot that takes everything else.
+    """
+
+    EXACT, LOWER, UPPER = 1, 2, 3
+    ENTRY_BYTES = 8 + 1 + 1 + 1 + 8 + 4  # key, depth, bound, generation, score, move
+
+    def __init__(self, size_mb=16):
+        """
+        Allocate the table
+
+        Args:
+            size_mb (float): Memory budget in megabytes
+        """
+        self.buckets = max(1, int(size_mb * 1024 * 1024) // (2 * self.ENTRY_BYTES))
+        slots = 2 * self.buckets
+        self.keys = array('Q', bytes(8 * slots))
+        self.depths = array('b', bytes(slots))
+        self.bounds = array('B', bytes(slots))  # 0 marks an empty slot
+        self.generations = array('B', bytes(slots))
+        self.scores = array('d', bytes(8 * slots))
+        self.moves = array('i', [-1]) * slots
+        self.generation = 0
+
+    def new_search(self):
+        """Age the entries so the depth-preferred slots can be reclaimed."""
+        self.generation = (self.generation + 1) & 0xFF
+
+    def clear(self):
+        """Drop every entry."""
+        slots = 2 * self.buckets
+        self.bounds = array('B', bytes(slots))
+        self.moves = array('i', [-1]) * slots
+
+    def probe(self, key):
+        """
+        Look up a position
+
+        Args:
+            key (int): Zobrist key of the position
+
+        Returns:
+            tuple: (depth, bound, score, move) or None if the position is not stored
+        """
+        slot = 2 * (key % self.buckets)
+        for slot in (slot, slot + 1):
+            if self.bounds[slot] and self.keys[slot] == key:
+                return self.depths[slot], self.bounds[slot], self.scores[slot], self.moves[slot]
+        return None
+
+    def store(self, key, depth, bound, score, move=-1):
+        """
+        Record a search result
+
+        Args:
+            key (int): Zobrist key of the position
+            depth (int): Remaining depth the score was searched to
+            bound (int): EXACT, LOWER or UPPER
+            score (float): Score of the position
+            move (int): Best move as row * board_size + col, -1 if none
+        """
+        slot = 2 * (key % self.buckets)
+        if (self.bounds[slot] and self.keys[slot] != key and depth < self.depths[slot]
+                and self.generations[slot] == self.generation):
+            slot += 1
+        self.keys[slot] = key
+        self.depths[slot] = depth
+        self.bounds[slot] = bound
+        self.generations[slot] = self.generation
+        self.scores[slot] = score
+        self.moves[slot] = move
+
+
+class EvaluationCache:
+    """
+    Bounded cache of leaf evaluations keyed by position hash and evaluated side
+
+    The least recently used entry is evicted once the capacity is reached.
+    Values belong to one heuristic; switching heuristics empties the cache.
+    """
+
+    def __init__(self, capacity=65536):
+        """
+        Args:
+            capacity (int): Most evaluations kept
+        """
+        self.capacity = capacity
+        self.entries = OrderedDict()
+        self.heuristic = None  # Heuristic the cached values come from
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self):
+        return len(self.entries)
+
+    def get(self, key):
+        """Cached evaluation for key, or None, counting the hit or miss."""
+        value = self.entries.get(key)
+        if value is None:
+            self.misses += 1
+            return None
+        self.entries.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def put(self, key, value):
+        """Store an evaluation, evicting the least recently used one when full."""
+        self.entries[key] = value
+        if len(self.entries) > self.capacity:
+            self.entries.popitem(last=False)
+
+    def clear(self):
+        """Drop every entry, keeping the counters."""
+        self.entries.clear()
+
+
+class SearchStats:
+    """
+    Counters and timers of PenteAI searches
+
+    Collected only while set as PenteAI.stats, so a search without it pays
+    for a few None checks. Every get_best_move starts from zero; the
+    on_iteration hook receives a summary of each completed iteration and
+    on_search one of the whole move, for monitoring to scrape. With workers
+    > 1 the root moves are searched in other processes and not counted.
+    """
+
+    def __init__(self, on_iteration=None, on_search=None):
+        """
+        Args:
+            on_iteration (function): Called with an iteration summary dict after each completed depth
+            on_search (function): Called with the summary() dict when get_best_move returns
+        """
+        self.on_iteration = on_iteration
+        self.on_search = on_search
+        self.reset()
+
+    def reset(self):
+        """Zero every counter, at the start of a search."""
+        self.started = time.perf_counter()
+        self.nodes = 0  # Nodes of the finished search, the AI counts them while it runs
+        self.evaluations = 0  # Leaf evaluations requested, cached or not
+        self.evaluation_cache_hits = 0
+        self.tt_probes = 0
+        self.tt_hits = 0
+        self.tt_cutoffs = 0  # Nodes answered from the transposition table
+        self.cutoffs = Counter()  # Index of the move causing a beta cutoff -> count
+        self.expanded = Counter()  # Ply -> nodes whose children were searched
+        self.children = Counter()  # Ply -> children searched
+        self.move_generation_time = 0.0
+        self.evaluation_time = 0.0
+        self.win_check_time = 0.0
+        self.threat_time = 0.0
+        self.iterations = []
+
+    def branching_factors(self):
+        """Average children searched per expanded node, by ply from the root."""
+        return {ply: self.children[ply] / self.expanded[ply] for ply in sorted(self.expanded)}
+
+    def end_iteration(self, depth, nodes, move, score, pv):
+        """Record a completed iteration and pass its summary to on_iteration."""
+        elapsed = time.perf_counter() - self.started
+        iteration = {
+            "depth": depth,
+            "move": move,
+            "score": score,
+            "pv": list(pv),
+            "nodes": nodes,
+            "elapsed": elapsed,
+            "nps": nodes / elapsed if elapsed else 0.0,
+        }
+        self.iterations.append(iteration)
+        if self.on_iteration is not None:
+            self.on_iteration(iteration)
+
+    def end_search(self, nodes):
+        """Record the search's node count and pass the summary to on_search."""
+        self.nodes = nodes
+        if self.on_search is not None:
+            self.on_search(self.summary())
+
+    def summary(self):
+        """
+        Everything collected during the last search
+
+        Returns:
+            dict: Node and evaluation counts, hit rates, cutoffs by move index,
+                branching factor by ply, seconds per activity and the iterations
+        """
+        elapsed = time.perf_counter() - self.started
+        cutoffs = sum(self.cutoffs.values())
+        return {
+            "nodes": self.nodes,
+            "elapsed": elapsed,
+            "nps": self.nodes / elapsed if elapsed else 0.0,
+            "evaluations": self.evaluations,
+            "evaluation_cache_hit_rate": self.evaluation_cache_hits / self.evaluations if self.evaluations else 0.0,
+            "tt_probes": self.tt_probes,
+            "tt_hit_rate": self.tt_hits / self.tt_probes if self.tt_probes else 0.0,
+            "tt_cutoffs": self.tt_cutoffs,
+            "cutoffs": dict(sorted(self.cutoffs.items())),
+            "first_move_cutoff_rate": self.cutoffs[0] / cutoffs if cutoffs else 0.0,
+            "branching_factor": self.branching_factors(),
+            "times": {
+                "move_generation": self.move_generation_time,
+                "evaluation": self.evaluation_time,
+                "win_checks": self.win_check_time,
+                "threat_search": self.threat_time,
+            },
+            "iterations": list(self.iterations),
+        }
+
+
+_ADVANCED_RAYS = {}
+
+if np is not None:
+    # Offsets inside a 9x9 window centred on a cell of every read made by
+    # evaluate_board_state_advanced, indexed by (direction, side, step)
+    _RAY_ROWS = np.array([[[4 + step * i * dx for i in range(1, 5)] for step in [1, -1]]
+                          for dx, dy in [(0, 1), (1, 0), (1, 1), (1, -1)]])
+    _RAY_COLS = np.array([[[4 + step * i * dy for i in range(1, 5)] for step in [1, -1]]
+                          for dx, dy in [(0, 1), (1, 0), (1, 1), (1, -1)]])
+
+
+class AdvancedLineScores:
+    """
+    Incremental form of PenteAI.evaluate_board_state_advanced
+
+    The advanced heuristic scores every cell and line direction from the
+    stones on two rays of up to four cells. Those rays are precomputed
+    (reproducing the original indexing, including negative indices wrapping
+    around the board), and each push/pop only rescores the windows whose rays
+    contain a changed cell. Totals are kept for both players' perspectives.
+    """
+
+    def __init__(self, game):
+        self.game = game
+        self.size = game.board_size
+        if self.size not in _ADVANCED_RAYS:
+            _ADVANCED_RAYS[self.size] = self._build_rays(self.size)
+        self.rays, self.affected = _ADVANCED_RAYS[self.size]
+        self.rebuild()
+
+    @staticmethod
+    def _build_rays(size):
+        """Flat cell indices read by each (cell, direction) window and the windows reading each cell."""
+        rays = []
+        affected = [set() for _ in range(size * size)]
+        for row in range(size):
+            for col in range(size):
+                for dx, dy in [(0, 1), (1, 0), (1, 1), (1, -1)]:
+                    window = []
+                    for step in [1, -1]:
+                        ray = []
+                        for i in range(1, 5):
+                            r, c = row + step * i * dx, col + step * i * dy
+                            # board[r][c] raises IndexError past the far edges, wraps below zero
+                            if not (-size <= r < size and -size <= c < size):
+                                break
+                            ray.append((r % size) * size + c % size)
+                        window.append(tuple(ray))
+                    for cell in window[0] + window[1]:
+                        affected[cell].add(len(rays))
+                    rays.append(tuple(window))
+        return rays, [tuple(sorted(windows)) for windows in affected]
+
+    def rebuild(self):
+        """Recompute every window from the game board."""
+        self.cells = [stone for row in self.game.board for stone in row[:self.size]]
+        self.contributions = [self._score_window(window) for window in range(len(self.rays))]
+        self.totals = [0, sum(c[0] for c in self.contributions), sum(c[1] for c in self.contributions)]
+
+    def _score_window(self, window):
+        """Score of one (cell, direction) window from player 1's and player 2's perspective."""
+        cells = self.cells
+        seq1 = empty1 = seq2 = empty2 = 0
+        for ray in self.rays[window]:
+            alive1 = alive2 = True
+            for cell in ray:
+                stone = cells[cell]
+                if stone == 0:
+                    if alive1:
+                        empty1 += 1
+                    if alive2:
+                        empty2 += 1
+                elif stone == 1:
+                    if alive1:
+                        seq1 += 1
+                    alive2 = False
+                else:
+                    if alive2:
+                        seq2 += 1
+                    alive1 = False
+                if not (alive1 or alive2):
+                    break
+        own1 = 50 if seq1 == 3 and empty1 > 0 else 100 if seq1 == 4 and empty1 > 0 else 0
+        own2 = 50 if seq2 == 3 and empty2 > 0 else 100 if seq2 == 4 and empty2 > 0 else 0
+        block1 = 60 if seq1 == 3 and empty1 > 0 else 120 if seq1 == 4 and empty1 > 0 else 0
+        block2 = 60 if seq2 == 3 and empty2 > 0 else 120 if seq2 == 4 and empty2 > 0 else 0
+        return own1 - block2, own2 - block1
+
+    def update(self, row, col, captured):
+        """Rescore the windows reading the moved stone or any captured stone."""
+        board = self.game.board
+        changed = [(row, col)] + list(captured)
+        windows = set()
+        for r, c in changed:
+            cell = r * self.size + c
+            self.cells[cell] = board[r][c]
+            windows.update(self.affected[cell])
+        totals = self.totals
+        contributions = self.contributions
+        for window in windows:
+            old = contributions[window]
+            new = contributions[window] = self._score_window(window)
+            totals[1] += new[0] - old[0]
+            totals[2] += new[1] - old[1]
+
+    def score(self, player):
+        """Same value as evaluate_board_state_advanced(game.board, player)."""
+        center = self.size // 2
+        return self.totals[player] + 10 * (1 if self.cells[center * self.size + center] == player else 0)
+
+
+_EASY_LINES = {}
+
+
+class EasyLineScores:
+    """
+    Incremental form of PenteAI.evaluate_board_state_easy
+
+    The easy heuristic gives each empty cell the threat score of the last
+    line direction whose nine-cell window holds two or more stones of a
+    colour. Stone counts per cell and direction are updated along the four
+    lines through each changed cell, and only the cells on those lines are
+    rescored. The final sum runs in the original row-major order, so the
+    floating point result is identical.
+    """
+
+    def __init__(self, game):
+        self.game = game
+        self.size = game.board_size
+        if self.size not in _EASY_LINES:
+            _EASY_LINES[self.size] = self._build_lines(self.size)
+        self.lines, self.neighbors = _EASY_LINES[self.size]
+        self.rebuild()
+
+    @staticmethod
+    def _build_lines(size):
+        """Per direction and cell, the on-board cells within four steps, and their union per cell."""
+        lines = []
+        for dx, dy in [(0, 1), (1, 0), (1, 1), (-1, 1)]:
+            line = []
+            for row in range(size):
+                for col in range(size):
+                    line.append(tuple((row + step * dx) * size + col + step * dy for step in range(-4, 5)
+                                      if 0 <= row + step * dx < size and 0 <= col + step * dy < size))
+            lines.append(line)
+        neighbors = [tuple(sorted({cell for line in lines for cell in line[index]}))
+                     for index in range(size * size)]
+        return lines, neighbors
+
+    def rebuild(self):
+        """Recompute every count and cell score from the game board."""
+        self.cells = [stone for row in self.game.board for stone in row[:self.size]]
+        self.counts = [[[0] * (self.size * self.size) for _ in range(4)] for _ in range(3)]
+        for direction, line in enumerate(self.lines):
+            for index, window in enumerate(line):
+                for cell in window:
+                    stone = self.cells[cell]
+                    if stone:
+                        self.counts[stone][direction][index] += 1
+        self.values = [None, [0] * (self.size * self.size), [0] * (self.size * self.size)]
+        for index in range(self.size * self.size):
+            self._score_cell(index)
+
+    def _score_cell(self, index):
+        """Threat score of one cell from both players' perspectives."""
+        value1 = value2 = 0
+        if not self.cells[index]:
+            counts1, counts2 = self.counts[1], self.counts[2]
+            for direction in range(4):
+                own1 = counts1[direction][index]
+                own2 = counts2[direction][index]
+                first = own1 >= 2
+                second = own2 >= 2
+                if first or second:
+                    value1 = (own2 * 50 if second else 0) + (own1 * 40 if first else 0)
+                    value2 = (own1 * 50 if first else 0) + (own2 * 40 if second else 0)
+        self.values[1][index] = value1
+        self.values[2][index] = value2
+
+    def update(self, row, col, captured):
+        """Shift the counts along the lines through each changed cell and rescore those cells."""
+        board = self.game.board
+        rescore = set()
+        for r, c in [(row, col)] + list(captured):
+            cell = r * self.size + c
+            old, new = self.cells[cell], board[r][c]
+            if old == new:
+                continue
+            self.cells[cell] = new
+            for direction, line in enumerate(self.lines):
+                old_counts = self.counts[old][direction] if old else None
+                new_counts = self.counts[new][direction] if new else None
+                for index in line[cell]:
+                    if old_counts:
+                        old_counts[index] -= 1
+                    if new_counts:
+                        new_counts[index] += 1
+            rescore.update(self.neighbors[cell])
+        for index in rescore:
+            self._score_cell(index)
+
+    def score(self, player):
+        """Same value as evaluate_board_state_easy(game.board, player)."""
+        score = 0
+        threats = 0
+        for move_score in filter(None, self.values[player]):
+            score -= move_score * 1.3
+            threats += 1
+        for _ in range(threats):
+            score -= 20
+        center = self.size // 2
+        if self.cells[center * self.size + center] == player:
+            score += 10
+        return score
+
+
+_ANALYSIS_WINDOWS = {}
+
+
+class BoardAnalysis:
+    """
+    Everything PenteAI.analyze_board finds in its single pass over the empty cells
+
+    Cached results are shared between callers and must not be modified.
+
+    Attributes:
+        threats (dict): (row, col) -> threat plus opportunity score of the
+            last direction holding two or more stones of either colour
+        opportunities (dict): (row, col) -> the player's own part of that
+            score, for the last direction holding two or more of their stones
+        parallel (tuple): (row, col) with two or more opponent stones within
+            four cells along a line
+        surrounding (tuple): (row, col) with opponent stones on both sides
+    """
+
+    __slots__ = ('threats', 'opportunities', 'parallel', 'surrounding')
+
+    def __init__(self, threats, opportunities, parallel, surrounding):
+        self.threats = threats
+        self.opportunities = opportunities
+        self.parallel = parallel
+        self.surrounding = surrounding
+
+
+def _analysis_windows(size):
+    """Per cell, readers of the nine-cell windows along the four lines; off-board cells read the sentinel."""
+    if size not in _ANALYSIS_WINDOWS:
+        off_board = size * size
+        windows = []
+        for row in range(size):
+            for col in range(size):
+                windows.append(tuple(itemgetter(*[
+                    (row + step * dx) * size + col + step * dy
+                    if 0 <= row + step * dx < size and 0 <= col + step * dy < size else off_board
+                    for step in range(-4, 5)]) for dx, dy in [(0, 1), (1, 0), (1, 1), (-1, 1)]))
+        _ANALYSIS_WINDOWS[size] = windows
+    return _ANALYSIS_WINDOWS[size]
+
+
+@lru_cache(maxsize=1024)
+def _analyze_cells(cells, player, opponent, board_size):
+    """BoardAnalysis of a flat board, memoized on the board's contents."""
+    cells = cells + (3,)  # Sentinel read for off-board cells
+    threats = {}
+    opportunities = {}
+    parallel = []
+    surrounding = []
+    for index, readers in enumerate(_analysis_windows(board_size)):
+        if cells[index]:
+            continue
+        move = divmod(index, board_size)
+        in_parallel = in_surrounding = False
+        for reader in readers:
+            window = reader(cells)
+            opponent_count = window.count(opponent)
+            player_count = window.count(player)
+            in_parallel = in_parallel or opponent_count >= 2
+            in_surrounding = in_surrounding or window[3:6].count(opponent) >= 2
+            opportunity_score = player_count * 40 if player_count >= 2 else 0
+            total_score = (opponent_count * 50 if opponent_count >= 2 else 0) + opportunity_score
+            if total_score > 0:
+                threats[move] = total_score
+            if opportunity_score:
+                opportunities[move] = opportunity_score
+        if in_parallel:
+            parallel.append(move)
+        if in_surrounding:
+            surrounding.append(move)
+    return BoardAnalysis(threats, opportunities, tuple(parallel), tuple(surrounding))
+
+
+_CANDIDATE_GEOMETRY = {}
+
+
+def _swap_stones(pattern):
+    """The same pattern seen from the other player's side."""
+    return tuple(3 - cell if cell else 0 for cell in pattern)
+
+
+def _perspective(patterns, stone):
+    """A pattern table written for `agent`, with `stone` playing the agent's role."""
+    return dict(patterns) if stone == agent else {_swap_stones(pattern): weight for pattern, weight in patterns.items()}
+
+
+_PATTERN_LINES = {}
+
+
+class PatternTable:
+    """
+    Compiled matcher for stone pattern tables such as agent_patterns
+
+    Every pattern, in both orientations, is compiled into a lookup table
+    indexed by the base-4 code of a window of `length` cells (0 empty, 1 and
+    2 stones, 3 off the board), listing the patterns the window starts with.
+    A line is scanned with one rolling code and one table read per cell, so
+    adding patterns does not slow the scan down.
+    """
+
+    def __init__(self, patterns):
+        """
+        Args:
+            patterns (dict): Pattern tuple -> weight, matched in both orientations
+        """
+        oriented = {}
+        for pattern, weight in patterns.items():
+            for shape in {tuple(pattern), tuple(pattern[::-1])}:
+                oriented[shape] = oriented.get(shape, 0) + weight
+        self.patterns = oriented
+        self.length = max(len(pattern) for pattern in oriented)
+        self.mask = 4 ** self.length - 1
+        self.padding = (3,) * (self.length - 1)
+        self.matches = [()] * (self.mask + 1)
+        for pattern, weight in oriented.items():
+            code = 0
+            for stone in pattern:
+                code = code << 2 | stone
+            spare = 2 * (self.length - len(pattern))
+            for suffix in range(1 << spare):
+                self.matches[code << spare | suffix] += ((pattern, weight),)
+        self.weights = [sum(weight for _, weight in found) for found in self.matches]
+
+    def score(self, line):
+        """Total weight of the matches in a sequence of cell values."""
+        weights = self.weights
+        mask = self.mask
+        code = mask  # Cells before the line read as off the board
+        total = 0
+        for stone in line + self.padding:
+            code = (code << 2 | stone) & mask
+            total += weights[code]
+        return total
+
+    def scan(self, line):
+        """
+        Every match in a sequence of cell values
+
+        Returns:
+            list: (start index, pattern, weight) tuples
+        """
+        matches = self.matches
+        mask = self.mask
+        code = mask
+        found = []
+        for end, stone in enumerate(line + self.padding):
+            code = (code << 2 | stone) & mask
+            for pattern, weight in matches[code]:
+                found.append((end - self.length + 1, pattern, weight))
+        return found
+
+    def covers(self, line, index):
+        """Whether a match in a sequence of cell values includes line[index]."""
+        matches = self.matches
+        mask = self.mask
+        length = self.length
+        first = max(0, index - length + 1)
+        line = line + self.padding
+        code = mask
+        for stone in line[first:first + length - 1]:
+            code = code << 2 | stone
+        for start in range(first, index + 1):
+            code = (code << 2 | line[start + length - 1]) & mask
+            for pattern, _ in matches[code]:
+                if start + len(pattern) > index:
+                    return True
+        return False
+
+    @staticmethod
+    def board_lines(size):
+        """(row, col, dx, dy, reader) for every line of the board, readers take the flat board."""
+        if size not in _PATTERN_LINES:
+            lines = []
+            for dx, dy in directions[:4]:
+                for row in range(size):
+                    for col in range(size):
+                        # Start only where the previous cell in this direction is off the board
+                        if 0 <= row - dx < size and 0 <= col - dy < size:
+                            continue
+                        cells = []
+                        r, c = row, col
+                        while 0 <= r < size and 0 <= c < size:
+                            cells.append(r * size + c)
+                            r, c = r + dx, c + dy
+                        if len(cells) > 1:  # Corner cells of the diagonals hold no pattern
+                            lines.append((row, col, dx, dy, itemgetter(*cells)))
+            _PATTERN_LINES[size] = lines
+        return _PATTERN_LINES[size]
+
+    def board_score(self, board):
+        """Total weight of the matches along every line of the board."""
+        size = len(board)
+        flat = [stone for row in board for stone in row[:size]]
+        score = self.score
+        return sum(score(reader(flat)) for _, _, _, _, reader in self.board_lines(size))
+
+    def find(self, board):
+        """
+        Every match on the board
+
+        Returns:
+            list: ((row, col) of the first cell, (dx, dy), pattern, weight) tuples
+        """
+        size = len(board)
+        flat = [stone for row in board for stone in row[:size]]
+        found = []
+        for row, col, dx, dy, reader in self.board_lines(size):
+            for start, pattern, weight in self.scan(reader(flat)):
+                found.append(((row + start * dx, col + start * dy), (dx, dy), pattern, weight))
+        return found
+
+
+# player_patterns with the side to move as `agent`, for ranking replies
+_REPLY_TABLES = {stone: PatternTable(_perspective(player_patterns, stone)) for stone in (1, 2)}
+
+
+def _evaluation_table(stone):
+    """agent_patterns and player_patterns for `stone`, minus the same for the opponent."""
+    patterns = {}
+    for table in (agent_patterns, player_patterns):
+        for pattern, weight in _perspective(table, stone).items():
+            patterns[pattern] = patterns.get(pattern, 0) + weight
+        for pattern, weight in _perspective(table, 3 - stone).items():
+            patterns[pattern] = patterns.get(pattern, 0) - weight
+    return PatternTable(patterns)
+
+
+_EVALUATION_TABLES = {stone: _evaluation_table(stone) for stone in (1, 2)}
+
+
+class CandidateMoves:
+    """
+    Move generator over the empty cells within `distance` of any stone
+
+    The candidate set and the per-cell count of nearby stones are kept up to
+    date by push_move/pop_move, so generating moves costs one pass over the
+    candidates. Each candidate is ranked by reading the four 11-cell lines
+    centred on it with the side to move's stone placed there:
+
+        0-3  five, blocking a five, open four, blocking an open four
+        4    capture (a capture reaching five pairs counts as a five)
+        5    creates one of the player_patterns
+        6    proximity only, more nearby stones first
+    """
+
+    def __init__(self, game, distance=1):
+        self.game = game
+        self.size = game.board_size
+        self.distance = distance
+        self.rebuild()
+
+    @staticmethod
+    def _build_geometry(size, distance):
+        """Neighbourhood cells and 11-cell lines (cell indices and readers) for every cell."""
+        off_board = size * size  # Index of the sentinel cell
+        neighborhoods = []
+        segments = []
+        segment_cells = []
+        for row in range(size):
+            for col in range(size):
+                neighborhoods.append(tuple(
+                    (row + i) * size + col + j
+                    for i in range(-distance, distance + 1) for j in range(-distance, distance + 1)
+                    if (i or j) and 0 <= row + i < size and 0 <= col + j < size))
+                lines = []
+                for dx, dy in directions[:4]:
+                    lines.append(tuple(
+                        (row + k * dx) * size + col + k * dy
+                        if 0 <= row + k * dx < size and 0 <= col + k * dy < size else off_board
+                        for k in range(-5, 6)))
+                segment_cells.append(tuple(lines))
+                segments.append(tuple(itemgetter(*line) for line in lines))
+        return neighborhoods, segments, segment_cells
+
+    def rebuild(self):
+        """Recompute the candidates from the game board."""
+        key = (self.size, self.distance)
+        if key not in _CANDIDATE_GEOMETRY:
+            _CANDIDATE_GEOMETRY[key] = self._build_geometry(self.size, self.distance)
+        self.neighborhoods, self.segments, self.segment_cells = _CANDIDATE_GEOMETRY[key]
+        self.cells = [0] * (self.size * self.size) + [3]  # Trailing sentinel reads as off the board
+        self.near = [0] * (self.size * self.size)
+        self.candidates = set()
+        for row in range(self.size):
+            for col in range(self.size):
+                stone = self.game.board[row][col]
+                if stone:
+                    self.cells[row * self.size + col] = stone
+                    self._add_stone(row * self.size + col)
+
+    def _add_stone(self, cell):
+        near = self.near
+        cells = self.cells
+        for neighbor in self.neighborhoods[cell]:
+            near[neighbor] += 1
+            if not cells[neighbor]:
+                self.candidates.add(neighbor)
+        self.candidates.discard(cell)
+
+    def _remove_stone(self, cell):
+        near = self.near
+        for neighbor in self.neighborhoods[cell]:
+            near[neighbor] -= 1
+            if not near[neighbor]:
+                self.candidates.discard(neighbor)
+        if near[cell]:
+            self.candidates.add(cell)
+
+    def update(self, row, col, captured):
+        """Follow a push/pop of the stone at (row, col) and its captured stones."""
+        board = self.game.board
+        for r, c in [(row, col)] + list(captured):
+            cell = r * self.size + c
+            old, new = self.cells[cell], board[r][c]
+            self.cells[cell] = new
+            if new and not old:
+                self._add_stone(cell)
+            elif old and not new:
+                self._remove_stone(cell)
+
+    def tier(self, cell, me):
+        """Priority tier of playing `me` at an empty cell, lower is more urgent."""
+        opponent = 3 - me
+        captures = self.game.captures_p1 if me == 1 else self.game.captures_p2
+        cells = self.cells
+        patterns = _REPLY_TABLES[me]
+        best = 6
+        for getter in self.segments[cell]:
+            segment = getter(cells)
+            if segment.count(0) + segment.count(3) == 11:
+                continue  # Nothing on this line
+            left, right = segment[:5], segment[6:]
+            for stone, five, open_four in ((me, 0, 2), (opponent, 1, 3)):
+                line = left + (stone,) + right
+                run = 1
+                for i in range(4, -1, -1):
+                    if line[i] != stone:
+                        break
+                    run += 1
+                for i in range(6, 11):
+                    if line[i] != stone:
+                        break
+                    run += 1
+                if run >= 5:
+                    if stone == me:
+                        return five
+                    best = five
+                    continue
+                if run == 4 and best > open_four:
+                    for start in range(6):
+                        if line[start:start + 6] == (0, stone, stone, stone, stone, 0):
+                            best = open_four
+                            break
+            if best <= 4:
+                continue
+            if (segment[6:9] == (opponent, opponent, me)) or (segment[4:1:-1] == (opponent, opponent, me)):
+                if captures >= 4:
+                    return 0
+                best = 4
+                continue
+            if best == 6 and patterns.covers(left + (me,) + right, 5):
+                best = 5
+        return best
+
+    def ranked(self, me):
+        """
+        Candidate moves for `me` with their ranking, most urgent first
+
+        Returns:
+            list: (tier, -nearby stones, row * board_size + col) tuples
+        """
+        size = self.size
+        if not self.candidates:
+            # Empty board: the centre block, nearest to the centre first
+            center = size // 2
+            return sorted((6, max(abs(i), abs(j)), (center + i) * size + center + j)
+                          for i in range(-2, 3) for j in range(-2, 3)
+                          if 0 <= center + i < size and 0 <= center + j < size
+                          and self.game.board[center + i][center + j] == 0)
+        near = self.near
+        return sorted((self.tier(cell, me), -near[cell], cell) for cell in self.candidates)
+
+    def tactical(self, me):
+        """
+        Candidate moves for `me` in tiers 0-4 (fives, fours and captures), most urgent first
+
+        Only a cell with a capture shape, or a neighbour starting three
+        stones of one colour within three cells, gets the full tier reading.
+
+        Returns:
+            list: (tier, row * board_size + col) tuples
+        """
+        opponent = 3 - me
+        cells = self.cells
+        capture = (opponent, opponent, me)
+        moves = []
+        for cell in self.candidates:
+            for getter in self.segments[cell]:
+                segment = getter(cells)
+                neighbors = (segment[4], segment[6])
+                near = segment[2:9]
+                if ((opponent in neighbors and (near.count(opponent) >= 3 or segment[6:9] == capture
+                                                or segment[4:1:-1] == capture))
+                        or (me in neighbors and near.count(me) >= 3)):
+                    tier = self.tier(cell, me)
+                    if tier <= 4:
+                        moves.append((tier, cell))
+                    break
+        moves.sort()
+        return moves
+
+    def ordered(self, me):
+        """
+        Candidate moves for `me` in priority order, without duplicates
+
+        Returns:
+            list: (row, col) tuples
+        """
+        return [divmod(cell, self.size) for _, _, cell in self.ranked(me)]
+
 
 class PenteAI:
-    def __init__(self, game, player_number):
+    threat_time_share = 0.1  # Part of the time limit the forced-win search may use
+    aspiration_window = 50  # Half-width of the root window around the last iteration's score, 0 disables it
+    def __init__(self, game, player_number, tt_size_mb=16, move_radius=1, check_interval=64, workers=1,
+                 threat_depth=8, quiescence_depth=4, eval_cache_size=65536, stats=None):
         """
         Initialize AI player
 
         Args:
             game (PenteGame): Game instance
             player_number (int): AI's player number (1 or 2)
+            tt_size_mb (float): Transposition table size in megabytes
+            move_radius (int): Candidate moves lie within this distance of a stone
+            check_interval (int): Nodes searched between two deadline checks
+            workers (int): Processes splitting the root moves, 1 searches in this process
+            threat_depth (int): Attacker moves the forced-win search looks ahead, 0 disables it
+            quiescence_depth (int): Plies of captures and fours searched below minimax leaves,
+                0 evaluates the leaves directly
+            eval_cache_size (int): Leaf evaluations kept in the evaluation cache, 0 disables it
+            stats (SearchStats): Collects statistics of every search and calls its hooks, None skips it
         """
+        self.tt_size_mb = tt_size_mb
+        self.move_radius = move_radius
+        self.check_interval = check_interval
+        self.workers = workers
+        self.threat_depth = threat_depth
+        self.quiescence_depth = quiescence_depth
+        self.pool = None  # Process pool for workers > 1, started on the first search
+        self.shared_alpha = None
+        self.shared_stop = None
+        self.stop_flag = None  # multiprocessing.Value another process sets to stop this search
+        self.nodes = 0
+        self.deadline = None  # Hard deadline of the running search, as a time.time() value
+        self.stop_requested = False
+        self.completed_depth = 0
         self.game = game
         self.player_number = player_number
         self.opponent = 3 - player_number
+        self.tt = TranspositionTable(tt_size_mb)
+        self.tt_heuristic = None  # Scores in the table belong to this heuristic
+        self.eval_cache = EvaluationCache(eval_cache_size) if eval_cache_size else None
+        self.line_scores = None  # Incremental evaluator kept on the game for line_scores_heuristic
+        self.line_scores_heuristic = None
+        self.stats = stats
+
+        # Move ordering state
+        cells = game.board_size * game.board_size
+        self.history = [None, [0] * cells, [0] * cells]  # Cutoff credit per player and cell
+        self.killers = {}  # ply -> up to two quiet moves that caused a cutoff
+        self.pv = []  # Principal variation of the last completed iteration
+        self.pv_lines = {}  # ply -> best line found below that ply in the current iteration
+        self.follow_pv = False
+        self.root_ply = 0
+        self.root_scores = {}  # Root move -> score of its last search in the current get_best_move
+
+        # Pondering state
+        self.ponder_search = None  # PenteAI searching the expected reply's position on a game copy
+        self.ponder_thread = None
+        self.ponder_hits = 0
+        self.ponder_misses = 0
 
     @staticmethod
     def evaluate_board_state_advanced(board, player):
         """
         Heuristic function for evaluating board state in a two-player game
 
+        Runs the NumPy version when NumPy is installed, the pure Python one otherwise.
+
+        Args:
+            board (list): Game board
+            player (int): Current player number
+
+        Returns:
+            int: Evaluation score of the board state
+        """
+        if np is not None:
+            return PenteAI.evaluate_board_state_advanced_numpy(board, player)
+        return PenteAI.evaluate_board_state_advanced_python(board, player)
+
+    @staticmethod
+    def evaluate_board_state_advanced_numpy(board, player):
+        """
+        NumPy version of evaluate_board_state_advanced with identical scores
+
+        The board is padded so every read of the Python version becomes a
+        fixed offset: negative coordinates wrap around like list indices and
+        cells past the far edges hold 3, which stops a run like the
+        IndexError does. A 9x9 sliding window then gathers the 4 directions
+        x 2 sides x 4 steps for all cells at once.
+        """
+        board_size = len(board)
+        try:
+            cells = np.asarray(board, dtype=np.int8)
+        except ValueError:
+            cells = None
+        if cells is None or cells.shape != (board_size, board_size) or board_size < 4:
+            return PenteAI.evaluate_board_state_advanced_python(board, player)
+
+        padded = np.full((board_size + 8, board_size + 8), 3, dtype=np.int8)
+        wrapped = np.arange(-4, board_size) % board_size
+        padded[:board_size + 4, :board_size + 4] = cells[np.ix_(wrapped, wrapped)]
+        lines = sliding_window_view(padded, (9, 9))[:, :, _RAY_ROWS, _RAY_COLS]  # (row, col, dir, side, step)
+
+        empty = lines == 0
+        score = 0
+        for stone, three, four in ((player, 50, 100), (3 - player, -60, -120)):
+            own = lines == stone
+            alive = np.logical_and.accumulate(own | empty, axis=-1)
+            seq = np.count_nonzero(alive & own, axis=(-2, -1))
+            has_space = np.count_nonzero(alive & empty, axis=(-2, -1)) > 0
+            score += three * int(np.count_nonzero((seq == 3) & has_space))
+            score += four * int(np.count_nonzero((seq == 4) & has_space))
+
+        center = board_size // 2
+        score += 10 * (1 if board[center][center] == player else 0)
+        return score
+
+    @staticmethod
+    def evaluate_board_state_advanced_python(board, player):
+        """
+        Pure Python version of evaluate_board_state_advanced
+
         Args:
             board (list): Game board
             player (int): Current player number
@@ -234,6 +1609,24 @@ class PenteAI:
 
         return score
 
+    @staticmethod
+    def evaluate_board_state_patterns(board, player):
+        """
+        Heuristic scoring agent_patterns and player_patterns along every line
+
+        Matches of the tables with `player` in the agent's role count for the
+        player, matches with the opponent in that role count against. The
+        compiled PatternTable reads each line once.
+
+        Args:
+            board (list): Game board
+            player (int): Current player number
+
+        Returns:
+            int: Evaluation score of the board state
+        """
+        return _EVALUATION_TABLES[player].board_score(board)
+
     @staticmethod
     def evaluate_board_state_easy(board, player):
         """
@@ -250,13 +1643,9 @@ class PenteAI:
         score = 0
         board_size = len(board)
 
-        # Use `analyze_board` to evaluate threats and opportunities
-        threats = PenteAI.analyze_board(board, player, opponent, board_size, mode="threats")
-        opportunities = PenteAI.analyze_board(board, player, opponent, board_size, mode="opportunities")
-
-        # Add scores for opportunities (player's advantage) with reduced weight
-        for _, move_score in opportunities.items():
-            score += move_score * 0.7  
+        # Use `analyze_board` to evaluate threats; their scores already include the
+        # player's own opportunities, so those are not added a second time
+        threats = PenteAI.analyze_board(board, player, opponent, board_size).threats
 
         # Subtract scores for threats (opponent's advantage) with increased weight
         for _, move_score in threats.items():
@@ -273,223 +1662,785 @@ class PenteAI:
 
         return score
 
-    def get_best_move(self, board, minimax_func, isAlphaBeta, heuristic_fun, max_depth=3, time_limit=2):
+    def attach_line_scores(self, heuristic_fun):
+        """
+        Keep an incremental evaluator on the game for heuristic_fun, if it has one
+
+        Args:
+            heuristic_fun (function): Heuristic the search will use at the leaves
+        """
+        evaluator_class = INCREMENTAL_HEURISTICS.get(heuristic_fun)
+        if evaluator_class is None:
+            self.line_scores = self.line_scores_heuristic = None
+            return
+        self.line_scores = self.game.attach_observer(evaluator_class)
+        self.line_scores.rebuild()
+        self.line_scores_heuristic = heuristic_fun
+
+    def evaluate(self, heuristic_funtion):
+        """
+        Score the current position for the AI
+
+        Positions already scored come from the evaluation cache. Otherwise the
+        incremental evaluator is used when it tracks heuristic_funtion, with a
+        full heuristic call as the fallback.
+        """
+        stats = self.stats
+        if stats is not None:
+            started = time.perf_counter()
+            stats.evaluations += 1
+        cache = self.eval_cache
+        if cache is not None:
+            if heuristic_funtion != cache.heuristic:
+                cache.clear()
+                cache.heuristic = heuristic_funtion
+            key = self.game.hash << 2 | self.player_number
+            score = cache.get(key)
+            if score is not None:
+                if stats is not None:
+                    stats.evaluation_cache_hits += 1
+                    stats.evaluation_time += time.perf_counter() - started
+                return score
+        if self.line_scores is not None and heuristic_funtion == self.line_scores_heuristic:
+            score = self.line_scores.score(self.player_number)
+        else:
+            score = heuristic_funtion(self.game.board, self.player_number)
+        if cache is not None:
+            cache.put(key, score)
+        if stats is not None:
+            stats.evaluation_time += time.perf_counter() - started
+        return score
+
+    def get_best_move(self, board, minimax_func, isAlphaBeta, heuristic_fun, max_depth=3, time_limit=2,
+                      soft_time_limit=None):
+        """
+        Iterative deepening search for the AI's move
+
+        A short threat-space search runs first; when it finds a forced win its
+        first move is played without a full-width search. With isAlphaBeta,
+        iterations after the first search an aspiration window around the
+        previous score and repeat with the full window when the score falls
+        outside it.
+
+        A ponder search started with ponder() is stopped first. When the
+        opponent played the expected reply, its completed iterations are kept
+        and deepening carries on from there; otherwise the search starts over
+        with the transposition table it filled.
+
+        Args:
+            board (list): Game board
+            minimax_func (function): Search used below the root
+            isAlphaBeta (bool): Whether minimax_func takes alpha and beta
+            heuristic_fun (function): Leaf evaluation
+            max_depth (int): Deepest iteration
+            time_limit (float): Hard limit in seconds, the running iteration is aborted there
+            soft_time_limit (float): No new iteration starts after this many seconds
+                (default half of time_limit), stretched by half each time the best
+                move changes between iterations
+
+        Returns:
+            tuple: (row, col) best move of the last completed iteration
+        """
         best_move = None
         start_time = time.time()
+        self.deadline = start_time + time_limit
+        soft_limit = time_limit / 2 if soft_time_limit is None else soft_time_limit
+        stats = self.stats
+        if stats is not None:
+            stats.reset()
+        pondered = self.stop_pondering()
+        self.prepare_search(heuristic_fun)
+        parallel = self.workers > 1 and getattr(minimax_func, '__self__', None) is self
+        if parallel:
+            self.shared_stop = self.shared_stop or multiprocessing.Value('b', 0)
+            self.shared_stop.value = 0
+
+        valid_moves = self.get_prioritized_moves(board, self.player_number)
+        root_scores = self.root_scores = {}
+        current_best_move = None
+        best_score = None
+        first_depth = 1
+        if pondered is not None:
+            if pondered.game.hash == self.game.hash and pondered.tt_heuristic == heuristic_fun:
+                self.ponder_hits += 1
+                if pondered.completed_depth:
+                    # Ponder hit: keep the iterations searched on the opponent's time
+                    first_depth = pondered.completed_depth + 1
+                    best_move = pondered.pv[0]
+                    best_score = pondered.root_scores.get(best_move)
+                    root_scores.update(pondered.root_scores)
+                    self.pv = pondered.pv
+                    self.completed_depth = pondered.completed_depth
+            else:
+                self.ponder_misses += 1
+        try:
+            # A forced win found by threat-space search needs no full-width search
+            if self.threat_depth:
+                threat_deadline = min(self.deadline, start_time + time_limit * self.threat_time_share)
+                threat_started = time.perf_counter()
+                winning_move = ThreatSearch(self.game, self.move_generator(), self.threat_depth).find_win(
+                    self.player_number, threat_deadline)
+                if stats is not None:
+                    stats.threat_time = time.perf_counter() - threat_started
+                if winning_move is not None:
+                    self.pv = [winning_move]
+                    return winning_move
+
+            for depth in range(first_depth, max_depth + 1):
+                if depth > 1 and time.time() - start_time > soft_limit:
+                    break
+
+                # Last iteration's best move first, then the others by their last scores
+                valid_moves.sort(key=lambda move: -root_scores.get(move, float('-inf')))
+                if parallel:
+                    current_best_move, current_pv, current_score = self.search_root_parallel(
+                        valid_moves, depth, minimax_func, isAlphaBeta, heuristic_fun, root_scores)
+                elif isAlphaBeta and self.aspiration_window and best_score is not None:
+                    alpha, beta = best_score - self.aspiration_window, best_score + self.aspiration_window
+                    current_best_move, current_pv, current_score = self.search_root(
+                        board, valid_moves, depth, minimax_func, isAlphaBeta, heuristic_fun, root_scores, alpha, beta)
+                    if not alpha < current_score < beta:
+                        # Failed low or high: the scores are only bounds
+                        current_best_move, current_pv, current_score = self.search_root(
+                            board, valid_moves, depth, minimax_func, isAlphaBeta, heuristic_fun, root_scores)
+                else:
+                    current_best_move, current_pv, current_score = self.search_root(
+                        board, valid_moves, depth, minimax_func, isAlphaBeta, heuristic_fun, root_scores)
+
+                if current_best_move:
+                    if best_move and current_best_move != best_move:
+                        # Unstable choice: allow more time before giving up on deeper iterations
+                        soft_limit = min(time_limit, soft_limit * 1.5)
+                    best_move = current_best_move
+                    best_score = current_score
+                    self.pv = current_pv
+                    self.completed_depth = depth
+                    if stats is not None:
+                        stats.end_iteration(depth, self.nodes, best_move, best_score, current_pv)
+        except SearchTimeout:
+            self.unwind()
+            if best_move is None:
+                best_move = current_best_move
+        finally:
+            self.deadline = None
+            self.stop_requested = False
+            if stats is not None:
+                stats.end_search(self.nodes)
+
+        if best_move is None and valid_moves:
+            best_move = valid_moves[0]
+        return best_move
 
-        valid_moves = self.get_prioritized_moves(board)
-        for depth in range(1, max_depth + 1):
-            current_best_move = None
-            current_best_score = float('-inf')
+    def prepare_search(self, heuristic_fun):
+        """Bring the game's incremental state and the search tables up to date before a search."""
+        # Resync after stones written straight into the board, keep scores per heuristic
+        self.game.hash = self.game.compute_hash()
+        if heuristic_fun != self.tt_heuristic:
+            self.tt.clear()
+            self.tt_heuristic = heuristic_fun
+        self.tt.new_search()
+        self.attach_line_scores(heuristic_fun)
+        self.move_generator().rebuild()
+        self.start_search()
+
+    def search_root(self, board, valid_moves, depth, minimax_func, isAlphaBeta, heuristic_fun, root_scores,
+                    alpha=float('-inf'), beta=float('inf')):
+        """
+        Search every root move to one depth in this process
 
-            for row, col in valid_moves:
-                if time.time() - start_time > time_limit:
-                    return best_move if best_move else current_best_move
+        With pvs as minimax_func the moves after the first are searched with
+        a null window first, like below the root.
+
+        Args:
+            alpha (float): Lower end of the root window, an aspiration window when finite
+            beta (float): Upper end of the root window, the search stops at a move reaching it
 
-                if self.game.is_valid_move(row, col):
-                    self.game.board[row][col] = self.player_number
-                    if isAlphaBeta:
-                        score = minimax_func(board, depth - 1, False, float('-inf'), float('inf'), heuristic_fun)
+        Returns:
+            tuple: (best move, principal variation, best score)
+        """
+        current_best_move = None
+        current_best_score = float('-inf')
+        current_pv = []
+        self.follow_pv = bool(self.pv)
+        scout = isAlphaBeta and getattr(minimax_func, '__func__', None) is PenteAI.pvs
+
+        searched = 0
+        for row, col in valid_moves:
+            if self.game.push_move(row, col, self.player_number):
+                searched += 1
+                if isAlphaBeta:
+                    floor = max(alpha, current_best_score)
+                    if scout and current_best_move is not None:
+                        score = minimax_func(board, depth - 1, False, floor, math.nextafter(floor, math.inf),
+                                             heuristic_fun)
+                        if floor < score < beta:
+                            score = minimax_func(board, depth - 1, False, floor, beta, heuristic_fun)
                     else:
-                        score = minimax_func(board, depth - 1, False, heuristic_fun)
-                    self.game.board[row][col] = 0
+                        score = minimax_func(board, depth - 1, False, floor, beta, heuristic_fun)
+                else:
+                    score = minimax_func(board, depth - 1, False, heuristic_fun)
+                self.game.pop_move()
+                self.follow_pv = False
+                root_scores[(row, col)] = score
+
+                if score > current_best_score:
+                    current_best_score = score
+                    current_best_move = (row, col)
+                    current_pv = [(row, col)] + self.pv_lines.get(1, [])
+                    if score >= beta:
+                        break  # Fail high, the caller widens the window
+
+        if self.stats is not None:
+            self.stats.expanded[0] += 1
+            self.stats.children[0] += searched
+        return current_best_move, current_pv, current_best_score
+
+    def search_root_parallel(self, valid_moves, depth, minimax_func, isAlphaBeta, heuristic_fun, root_scores):
+        """
+        Search the root moves to one depth across the process pool
 
-                    if score > current_best_score:
-                        current_best_score = score
-                        current_best_move = (row, col)
+        Each root move is one task. Workers keep their game, transposition
+        table and ordering tables between tasks on the same position, and
+        share the best exact root score so far as alpha. A move whose score
+        did not beat the alpha it was searched with is only a bound and never
+        chosen over an exact one.
 
-            if current_best_move:
-                best_move = current_best_move
+        Returns:
+            tuple: (best move, principal variation, best score)
+        """
+        pool = self.process_pool()
+        self.shared_alpha.value = float('-inf')
+        position = (tuple(tuple(row) for row in self.game.board), self.game.captures_p1,
+                    self.game.captures_p2, self.game.current_player, self.game.backend)
+        settings = (self.player_number, minimax_func.__name__, isAlphaBeta, heuristic_fun,
+                    self.tt_size_mb, self.move_radius, self.check_interval, self.quiescence_depth)
+        futures = [pool.submit(_search_root_move, position, settings, move, depth, self.deadline)
+                   for move in valid_moves if self.game.is_valid_move(*move)]
+        done, pending = wait(futures, timeout=max(0.0, self.deadline - time.time()))
+        if pending:
+            for future in pending:
+                future.cancel()
+            raise SearchTimeout()
+
+        current_best_move = None
+        current_best_score = float('-inf')
+        current_pv = []
+        for future in futures:
+            result = future.result()
+            if result is None:
+                raise SearchTimeout()
+            move, score, exact, pv = result
+            root_scores[move] = score
+            if exact and score > current_best_score:
+                current_best_score = score
+                current_best_move = move
+                current_pv = pv
+        return current_best_move, current_pv, current_best_score
+
+    def process_pool(self):
+        """The worker pool for parallel root search, started on first use."""
+        if self.pool is None:
+            self.shared_alpha = multiprocessing.Value('d', float('-inf'))
+            self.shared_stop = self.shared_stop or multiprocessing.Value('b', 0)
+            self.pool = ProcessPoolExecutor(max_workers=self.workers, initializer=_init_search_worker,
+                                            initargs=(self.shared_alpha, self.shared_stop))
+        return self.pool
+
+    def ponder(self, minimax_func, isAlphaBeta, heuristic_fun, max_depth=3):
+        """
+        Search the position after the opponent's expected reply while they think
 
-        return best_move
+        The reply is the second move of the last principal variation, or the
+        opponent's best ranked candidate when there is none. A copy of this AI
+        sharing its transposition table, history and evaluation cache searches
+        a copy of the game in a background thread, with no time limit, until
+        it reaches max_depth or the next get_best_move stops it.
 
-    def get_prioritized_moves(self, board):
+        Args:
+            minimax_func (function): This AI's search method used below the root
+            isAlphaBeta (bool): Whether minimax_func takes alpha and beta
+            heuristic_fun (function): Leaf evaluation
+            max_depth (int): Deepest iteration
+
+        Returns:
+            tuple: (row, col) expected reply, or None when there is nothing to ponder
         """
-        Get list of valid moves, prioritizing strategic positions
+        self.stop_pondering()
+        game = self.game
+        if game.current_player != self.opponent or game.check_win():
+            return None
+        if len(self.pv) > 1 and self.pv[0] == game.last_move and game.is_valid_move(*self.pv[1]):
+            reply = self.pv[1]
+        else:
+            replies = self.get_prioritized_moves(game.board, self.opponent)
+            if not replies:
+                return None
+            reply = replies[0]
+
+        position = game.copy()
+        position.push_move(reply[0], reply[1], self.opponent)
+        if position.check_win():
+            return None
+        search = copy.copy(self)  # Shares the transposition table, history and evaluation cache
+        search.game = position
+        search.workers = 1
+        search.pool = search.shared_stop = None
+        search.threat_depth = 0  # Threat search cannot be stopped early, get_best_move runs it
+        search.stats = None  # Statistics describe the moves the AI plays
+        search.stop_requested = False
+        search.ponder_search = search.ponder_thread = None
+        self.ponder_search = search
+        self.ponder_thread = threading.Thread(
+            target=search.get_best_move, daemon=True,
+            args=(position.board, getattr(search, minimax_func.__name__), isAlphaBeta, heuristic_fun,
+                  max_depth, math.inf))
+        self.ponder_thread.start()
+        return reply
+
+    def stop_pondering(self):
         """
-        board_size = self.game.board_size
-        prioritized_moves = []
-        center = board_size // 2
-        important_agent_pattern = [(0, 1, 1, 1, 1, 0), 
-                                   (2, 1, 1, 1, 1, 0), 
-                                   (0, 1, 1, 1, 1, 2)]
-        for row in range(board_size):
-            for col in range(board_size):        
-                if self.game.is_valid_move(row, col):
-                    for dx, dy in directions:
-                        for pattern in important_agent_pattern:
-                            # Actually check if the pattern matches
-                            pattern_matches = all(
-                                0 <= row + i * dx < board_size and 
-                                0 <= col + i * dy < board_size and
-                                board[row + i * dx][col + i * dy] == cell
-                                for i, cell in enumerate(pattern)
-                            )
-                            
-                            if pattern_matches and (row, col) not in prioritized_moves:
-                                prioritized_moves.append((row, col))
-                                break
-        # Check for captures (higher priority)
-        for row in range(board_size):
-            for col in range(board_size):
-                if board[row][col] == player:
-                    for dx, dy in directions:
-                        try:
-                            if (0 <= row + 4 * dx < board_size and
-                                    0 <= col + 4 * dy < board_size and
-                                    board[row + dx][col + dy] == agent and
-                                    board[row + 2 * dx][col + 2 * dy] == player and
-                                    board[row + 3 * dx][col + 3 * dy] == player
-                                    and self.game.is_valid_move(row + 4 * dx, col + 4 * dy)):
-                                if (row + 4 * dx, col + 4 * dy) not in prioritized_moves:
-                                    prioritized_moves.append((row + 4 * dx, col + 4 * dy))
-                        except IndexError:
-                            continue
-        # Check player (opponent) patterns
-        for row in range(board_size):
-            for col in range(board_size):
-                if self.game.is_valid_move(row, col):
-                    for dx, dy in directions:
-                        for pattern, _ in player_patterns.items():
-                            pattern_found = True
-                            pattern_length = len(pattern)
-
-                            if not (0 <= row + (pattern_length - 1) * dx < board_size and
-                                    0 <= col + (pattern_length - 1) * dy < board_size):
-                                continue
-
-                            for i, value in enumerate(pattern):
-                                if board[row + i * dx][col + i * dy] != value:
-                                    pattern_found = False
-                                    break
+        Stop the ponder search, if one is running, and wait for its thread
+
+        Returns:
+            PenteAI: The ponder search with its completed iterations, or None
+        """
+        search, thread = self.ponder_search, self.ponder_thread
+        self.ponder_search = self.ponder_thread = None
+        if thread is None:
+            return None
+        search.stop()
+        thread.join()
+        self.tt_heuristic = search.tt_heuristic
+        return search
+
+    def close(self):
+        """Stop pondering and shut down the worker pool, if one was started."""
+        self.stop_pondering()
+        if self.pool is not None:
+            self.pool.shutdown(cancel_futures=True)
+            self.pool = None
+
+    def stop(self):
+        """
+        Ask a running search to abort; get_best_move returns its last completed iteration
 
-                            if pattern_found and (row, col - 1) not in prioritized_moves:
-                                prioritized_moves.append((row, col - 1))
+        The request holds until a search ends, so one sent just before a search
+        starts is not lost. Callers starting a search after an earlier stop()
+        clear stop_requested first, before handing the search to another thread.
+        """
+        self.stop_requested = True
+        if self.shared_stop is not None:
+            self.shared_stop.value = 1
+
+    def check_time(self):
+        """Called every check_interval nodes, raises SearchTimeout when the search must end."""
+        if (self.stop_requested or (self.stop_flag is not None and self.stop_flag.value)
+                or (self.deadline is not None and time.time() >= self.deadline)):
+            raise SearchTimeout()
+
+    def unwind(self):
+        """Take back the moves an aborted search left on the game."""
+        while len(self.game.move_stack) > self.root_ply:
+            self.game.pop_move()
+
+    def start_search(self):
+        """Reset the per-search state, keeping the history table at half weight."""
+        self.root_ply = len(self.game.move_stack)
+        self.nodes = 0
+        self.completed_depth = 0
+        self.killers = {}
+        self.pv = []
+        self.pv_lines = {}
+        self.follow_pv = False
+        for player in (1, 2):
+            self.history[player] = [credit >> 1 for credit in self.history[player]]
+
+    def order_moves(self, player, ply, tt_move=None):
+        """
+        Order the children of a search node
 
-        # Check center and surrounding positions
-        for i in range(-2, 3):
-            for j in range(-2, 3):
-                if 0 <= center + i < board_size and 0 <= center + j < board_size:
-                    if (center + i, center + j) not in prioritized_moves:
-                        prioritized_moves.append((center + i, center + j))
+        The transposition table move and, while still on the previous
+        principal variation, its move at this ply come first. Tactical tiers
+        (fives, fours, captures) follow, then the killer moves of this ply,
+        then quiet moves by tier and history credit.
 
-        # Add positions near existing stones
-        for row in range(board_size):
-            for col in range(board_size):
-                if self.game.board[row][col] != 0:
-                    for i in range(-1, 2):
-                        for j in range(-1, 2):
-                            if (0 <= row + i < board_size and
-                                    0 <= col + j < board_size and
-                                    (row + i, col + j) not in prioritized_moves):
-                                prioritized_moves.append((row + i, col + j))
-
-        # Add remaining positions
-        for row in range(board_size):
-            for col in range(board_size):
-                if (row, col) not in prioritized_moves:
-                    prioritized_moves.append((row, col))
+        Returns:
+            list: (row, col, quiet) tuples, quiet moves are eligible as killers
+        """
+        size = self.game.board_size
+        first = set()
+        if tt_move is not None:
+            first.add(tt_move[0] * size + tt_move[1])
+        if self.follow_pv and ply < len(self.pv):
+            first.add(self.pv[ply][0] * size + self.pv[ply][1])
+        killers = self.killers.get(ply, ())
+        history = self.history[player]
+
+        ordered = []
+        for tier, proximity, cell in self.move_generator().ranked(player):
+            if cell in first:
+                key = (0, 0)
+            elif tier <= 4:
+                key = (1, tier)
+            elif cell in killers:
+                key = (2, killers.index(cell))
+            else:
+                key = (3, tier, -history[cell], proximity)
+            ordered.append((key, cell, tier > 4))
+        ordered.sort()
+        return [(cell // size, cell % size, quiet) for _, cell, quiet in ordered]
+
+    def record_cutoff(self, player, ply, row, col, depth):
+        """Credit a quiet move that caused a beta cutoff in the killer and history tables."""
+        cell = row * self.game.board_size + col
+        killers = self.killers.setdefault(ply, [])
+        if cell not in killers:
+            killers.insert(0, cell)
+            del killers[2:]
+        self.history[player][cell] += depth * depth
+
+    def get_prioritized_moves(self, board, player=None):
+        """
+        Get list of valid moves, prioritizing strategic positions
 
-        # Check center and surrounding positions
-        for i in range(-2, 3):
-            for j in range(-2, 3):
-                if 0 <= center + i < board_size and 0 <= center + j < board_size:
-                    prioritized_moves.append((center + i, center + j))
+        Only empty cells within move_radius of a stone are generated (the
+        centre block on an empty board), ranked by CandidateMoves.tier for the
+        side to move.
 
-        # Add positions near existing stones
-        for row in range(board_size):
-            for col in range(board_size):
-                if self.game.board[row][col] != 0:
-                    for i in range(-1, 2):
-                        for j in range(-1, 2):
-                            if (0 <= row + i < board_size and
-                                    0 <= col + j < board_size and
-                                    (row + i, col + j) not in prioritized_moves):
-                                prioritized_moves.append((row + i, col + j))
-
-        # Add remaining positions
-        for row in range(board_size):
-            for col in range(board_size):
-                prioritized_moves.append((row, col))
-        return prioritized_moves
+        Args:
+            board (list): Game board, kept for compatibility; the game's state is used
+            player (int): Side to move, defaults to the game's current player
+        """
+        return self.move_generator().ordered(player or self.game.current_player)
+
+    def move_generator(self):
+        """The game's CandidateMoves observer, configured for this AI's move_radius."""
+        generator = self.game.attach_observer(CandidateMoves)
+        if generator.distance != self.move_radius:
+            generator.distance = self.move_radius
+            generator.rebuild()
+        return generator
 
     def minimax_without_alpha_Beta(self, board, depth, is_maximizing, heuristic_funtion):
         """
         Minimax algorithm without alpha-beta pruning
         """
-        winner = self.game.check_win()
+        self.nodes += 1
+        if self.nodes % self.check_interval == 0:
+            self.check_time()
+        stats = self.stats
+        if stats is None:
+            winner = self.game.check_win()
+        else:
+            started = time.perf_counter()
+            winner = self.game.check_win()
+            stats.win_check_time += time.perf_counter() - started
         if winner == self.player_number:
             return 10000
         elif winner == self.opponent:
             return -10000
         elif depth == 0:
-            return heuristic_funtion(self.game.board, self.player_number)
-
-        valid_moves = self.get_prioritized_moves(board)
+            return self.evaluate(heuristic_funtion)
+
+        key = self.game.hash
+        entry = self.tt.probe(key)
+        if stats is not None:
+            stats.tt_probes += 1
+            stats.tt_hits += entry is not None
+        if entry and entry[0] >= depth and entry[1] == TranspositionTable.EXACT:
+            if stats is not None:
+                stats.tt_cutoffs += 1
+            return entry[2]
+
+        if stats is None:
+            valid_moves = self.get_prioritized_moves(board, self.player_number if is_maximizing else self.opponent)
+        else:
+            started = time.perf_counter()
+            valid_moves = self.get_prioritized_moves(board, self.player_number if is_maximizing else self.opponent)
+            stats.move_generation_time += time.perf_counter() - started
+            stats.expanded[len(self.game.move_stack) - self.root_ply] += 1
+            stats.children[len(self.game.move_stack) - self.root_ply] += len(valid_moves)
+        best_move = -1
 
         if is_maximizing:
             best_score = float('-inf')
             for row, col in valid_moves:
-                if self.game.is_valid_move(row, col):
-                    self.game.board[row][col] = self.player_number
+                if self.game.push_move(row, col, self.player_number):
                     score = self.minimax_without_alpha_Beta(board, depth - 1, False, heuristic_funtion)
-                    self.game.board[row][col] = 0
-                    best_score = max(best_score, score)
+                    self.game.pop_move()
+                    if score > best_score:
+                        best_score = score
+                        best_move = row * self.game.board_size + col
         else:
             best_score = float('inf')
             for row, col in valid_moves:
-                if self.game.is_valid_move(row, col):
-                    self.game.board[row][col] = self.opponent
+                if self.game.push_move(row, col, self.opponent):
                     score = self.minimax_without_alpha_Beta(board, depth - 1, True, heuristic_funtion)
-                    self.game.board[row][col] = 0
-                    best_score = min(best_score, score)
+                    self.game.pop_move()
+                    if score < best_score:
+                        best_score = score
+                        best_move = row * self.game.board_size + col
+
+        self.tt.store(key, depth, TranspositionTable.EXACT, best_score, best_move)
         return best_score
 
     def minimax(self, board, depth, is_maximizing, alpha, beta, heuristic_funtion=None):
         """
         Enhanced minimax algorithm with alpha-beta pruning
+
+        Children are tried in order_moves order, and every beta cutoff by a
+        quiet move feeds the killer and history tables. Leaves are scored by
+        the quiescence search.
+        """
+        return self.alpha_beta(depth, is_maximizing, alpha, beta, heuristic_funtion, False)
+
+    def pvs(self, board, depth, is_maximizing, alpha, beta, heuristic_funtion=None):
+        """
+        Principal variation search (NegaScout)
+
+        Takes the same arguments as minimax. The first child is searched with
+        the full window, the others with a null window that only tells whether
+        they beat the best score so far, and one that does is searched again
+        with the full window.
+        """
+        return self.alpha_beta(depth, is_maximizing, alpha, beta, heuristic_funtion, True)
+
+    def alpha_beta(self, depth, is_maximizing, alpha, beta, heuristic_funtion, scout):
+        """
+        Alpha-beta search shared by minimax and pvs
+
+        Args:
+            depth (int): Plies left before the quiescence search
+            is_maximizing (bool): Whether the AI is to move
+            alpha (float): Best score the AI is assured of
+            beta (float): Best score the opponent is assured of
+            heuristic_funtion (function): Leaf evaluation, the easy heuristic if None
+            scout (bool): Search the children after the first with null windows
+
+        Returns:
+            float: Score of the position for the AI
         """
         if not heuristic_funtion:
             heuristic_funtion = PenteAI.evaluate_board_state_easy
-        winner = self.game.check_win()
+        self.nodes += 1
+        if self.nodes % self.check_interval == 0:
+            self.check_time()
+        ply = len(self.game.move_stack) - self.root_ply
+        self.pv_lines[ply] = []
+        stats = self.stats
+        if stats is None:
+            winner = self.game.check_win()
+        else:
+            started = time.perf_counter()
+            winner = self.game.check_win()
+            stats.win_check_time += time.perf_counter() - started
         if winner == self.player_number:
             return 10000
         elif winner == self.opponent:
             return -10000
         elif depth == 0:
-            return heuristic_funtion(self.game.board, self.player_number)
-
-        valid_moves = self.get_prioritized_moves(board)
-
+            return self.quiescence(is_maximizing, alpha, beta, heuristic_funtion, self.quiescence_depth)
+
+        # Reuse a deep enough result from a transposition, or at least try its best move first
+        key = self.game.hash
+        alpha_orig, beta_orig = alpha, beta
+        tt_move = None
+        entry = self.tt.probe(key)
+        if stats is not None:
+            stats.tt_probes += 1
+            stats.tt_hits += entry is not None
+        if entry:
+            tt_depth, bound, tt_score, tt_cell = entry
+            if tt_depth >= depth:
+                if bound == TranspositionTable.EXACT:
+                    self.pv_lines[ply] = self.tt_line(depth)
+                    if stats is not None:
+                        stats.tt_cutoffs += 1
+                    return tt_score
+                if bound == TranspositionTable.LOWER:
+                    alpha = max(alpha, tt_score)
+                else:
+                    beta = min(beta, tt_score)
+                if beta <= alpha:
+                    if stats is not None:
+                        stats.tt_cutoffs += 1
+                    return tt_score
+            if tt_cell >= 0:
+                tt_move = divmod(tt_cell, self.game.board_size)
+        best_move = -1
+
+        mover = self.player_number if is_maximizing else self.opponent
+        if stats is None:
+            moves = self.order_moves(mover, ply, tt_move)
+        else:
+            started = time.perf_counter()
+            moves = self.order_moves(mover, ply, tt_move)
+            stats.move_generation_time += time.perf_counter() - started
+        index = -1
         if is_maximizing:
             best_score = float('-inf')
-            for row, col in valid_moves:
-                if self.game.is_valid_move(row, col):
-                    self.game.board[row][col] = self.player_number
-                    score = self.minimax(depth - 1, False, alpha, beta)
-                    self.game.board[row][col] = 0
-                    best_score = max(best_score, score)
+            for index, (row, col, quiet) in enumerate(moves):
+                if self.game.push_move(row, col, self.player_number):
+                    if scout and best_move >= 0:
+                        # Only a move beating alpha needs its exact score
+                        score = self.alpha_beta(depth - 1, False, alpha, math.nextafter(alpha, math.inf),
+                                                heuristic_funtion, scout)
+                        if alpha < score < beta:
+                            score = self.alpha_beta(depth - 1, False, alpha, beta, heuristic_funtion, scout)
+                    else:
+                        score = self.alpha_beta(depth - 1, False, alpha, beta, heuristic_funtion, scout)
+                    self.game.pop_move()
+                    self.follow_pv = False
+                    if score > best_score:
+                        best_score = score
+                        best_move = row * self.game.board_size + col
+                        self.pv_lines[ply] = [(row, col)] + self.pv_lines.get(ply + 1, [])
                     alpha = max(alpha, best_score)
                     if beta <= alpha:
+                        if quiet:
+                            self.record_cutoff(self.player_number, ply, row, col, depth)
+                        if stats is not None:
+                            stats.cutoffs[index] += 1
                         break
         else:
             best_score = float('inf')
-            for row, col in valid_moves:
-                if self.game.is_valid_move(row, col):
-                    self.game.board[row][col] = self.opponent
-                    score = self.minimax(board, depth - 1, True, alpha, beta)
-                    self.game.board[row][col] = 0
-                    best_score = min(best_score, score)
+            for index, (row, col, quiet) in enumerate(moves):
+                if self.game.push_move(row, col, self.opponent):
+                    if scout and best_move >= 0:
+                        score = self.alpha_beta(depth - 1, True, math.nextafter(beta, -math.inf), beta,
+                                                heuristic_funtion, scout)
+                        if alpha < score < beta:
+                            score = self.alpha_beta(depth - 1, True, alpha, beta, heuristic_funtion, scout)
+                    else:
+                        score = self.alpha_beta(depth - 1, True, alpha, beta, heuristic_funtion, scout)
+                    self.game.pop_move()
+                    self.follow_pv = False
+                    if score < best_score:
+                        best_score = score
+                        best_move = row * self.game.board_size + col
+                        self.pv_lines[ply] = [(row, col)] + self.pv_lines.get(ply + 1, [])
                     beta = min(beta, best_score)
                     if beta <= alpha:
+                        if quiet:
+                            self.record_cutoff(self.opponent, ply, row, col, depth)
+                        if stats is not None:
+                            stats.cutoffs[index] += 1
                         break
+        if stats is not None:
+            stats.expanded[ply] += 1
+            stats.children[ply] += index + 1
+
+        if best_score <= alpha_orig:
+            bound = TranspositionTable.UPPER
+        elif best_score >= beta_orig:
+            bound = TranspositionTable.LOWER
+        else:
+            bound = TranspositionTable.EXACT
+        self.tt.store(key, depth, bound, best_score, best_move)
+        return best_score
+
+    def tt_line(self, length):
+        """Follow the transposition table's best moves from the current position for up to `length` moves."""
+        line = []
+        while len(line) < length:
+            entry = self.tt.probe(self.game.hash)
+            if not entry or entry[3] < 0:
+                break
+            move = divmod(entry[3], self.game.board_size)
+            if not self.game.push_move(*move):
+                break
+            line.append(move)
+        for _ in line:
+            self.game.pop_move()
+        return line
+
+    def quiescence(self, is_maximizing, alpha, beta, heuristic_funtion, depth):
+        """
+        Settle pending captures and fours below a minimax leaf
+
+        Only tactical moves are searched: fives, five blocks, open fours,
+        open-four blocks and captures (CandidateMoves tiers 0-4). The side to
+        move may stand pat on the static evaluation, unless the opponent
+        threatens five.
+
+        Args:
+            is_maximizing (bool): Whether the AI is to move
+            alpha (float): Best score the AI is assured of
+            beta (float): Best score the opponent is assured of
+            heuristic_funtion (function): Static evaluation
+            depth (int): Tactical plies left, the static evaluation is returned at 0
+
+        Returns:
+            float: Score of the position for the AI
+        """
+        self.nodes += 1
+        if self.nodes % self.check_interval == 0:
+            self.check_time()
+        stats = self.stats
+        if stats is None:
+            winner = self.game.check_win()
+        else:
+            started = time.perf_counter()
+            winner = self.game.check_win()
+            stats.win_check_time += time.perf_counter() - started
+        if winner == self.player_number:
+            return 10000
+        elif winner == self.opponent:
+            return -10000
+        stand_pat = self.evaluate(heuristic_funtion)
+        if depth <= 0:
+            return stand_pat
+
+        mover = self.player_number if is_maximizing else self.opponent
+        size = self.game.board_size
+        if stats is None:
+            moves = self.move_generator().tactical(mover)
+        else:
+            started = time.perf_counter()
+            moves = self.move_generator().tactical(mover)
+            stats.move_generation_time += time.perf_counter() - started
+        if not moves:
+            return stand_pat
+
+        # Facing a five with none of its own, the side to move has to answer it
+        threatened = moves[0][0] == 1
+        if is_maximizing:
+            best_score = float('-inf') if threatened else stand_pat
+            if best_score >= beta:
+                return best_score
+            alpha = max(alpha, best_score)
+            for _, cell in moves:
+                self.game.push_move(cell // size, cell % size, mover)
+                score = self.quiescence(False, alpha, beta, heuristic_funtion, depth - 1)
+                self.game.pop_move()
+                best_score = max(best_score, score)
+                alpha = max(alpha, score)
+                if beta <= alpha:
+                    break
+        else:
+            best_score = float('inf') if threatened else stand_pat
+            if best_score <= alpha:
+                return best_score
+            beta = min(beta, best_score)
+            for _, cell in moves:
+                self.game.push_move(cell // size, cell % size, mover)
+                score = self.quiescence(True, alpha, beta, heuristic_funtion, depth - 1)
+                self.game.pop_move()
+                best_score = min(best_score, score)
+                beta = min(beta, score)
+                if beta <= alpha:
+                    break
         return best_score
-    
+
     @staticmethod
     def analyze_board(board, player, opponent, board_size, mode="all"):
         """
         Analyze the board for various threats and opportunities.
 
+        Every mode is computed in one pass over the empty cells and the result
+        is kept in a bounded LRU cache keyed by the board's contents, so
+        repeated positions are not analyzed again.
+
         Args:
             board (list): The game board
             player (int): Current player's number
@@ -498,51 +2449,356 @@ class PenteAI:
             mode (str): The analysis mode ('parallel', 'threats', 'opportunities', 'surrounding', 'cross', 'all')
 
         Returns:
-            list/dict: Depending on the mode, returns a list of moves or a dictionary of scores.
+            BoardAnalysis/list/dict: The whole BoardAnalysis for 'all', otherwise
+                a list of moves or a dictionary of scores for the mode
+        """
+        cells = tuple(stone for row in board[:board_size] for stone in row[:board_size])
+        analysis = _analyze_cells(cells, player, opponent, board_size)
+        if mode == "all":
+            return analysis
+        if mode in ["threats", "opportunities"]:
+            return dict(getattr(analysis, mode))
+        if mode in ["parallel", "surrounding"]:
+            return list(getattr(analysis, mode))
+        return []
+
+
+class MCTSNode:
+    """A position in the PenteMCTS tree, reached by `player` playing `move`."""
+
+    __slots__ = ('move', 'player', 'parent', 'prior', 'winner', 'children', 'untried', 'visits', 'wins')
+
+    def __init__(self, move, player, parent=None, prior=0.0, winner=None):
+        self.move = move
+        self.player = player
+        self.parent = parent
+        self.prior = prior  # 0-1 bias from the move's heuristic score or candidate tier
+        self.winner = winner  # Set when the move ended the game
+        self.children = []
+        self.untried = None  # (move, prior) still to expand, best last; generated on the first visit
+        self.visits = 0
+        self.wins = 0.0  # Playout results for `player`, draws count half
+
+
+class PenteMCTS:
+    """
+    Monte Carlo tree search (UCT) player, an alternative to PenteAI
+
+    The tree is grown with the PenteGame rules through push_move/pop_move,
+    captures included. Children are expanded best first, a node widening
+    with the square root of its visits, and get optional progressive-bias
+    priors: from the heuristic passed to get_best_move, scored after each
+    candidate move, or from the CandidateMoves tiers without one. Each
+    expanded leaf runs a batch of random rollouts restricted to cells next
+    to stones. The tree is kept between moves and reused when the game
+    continues from it.
+    """
+
+    def __init__(self, game, player_number, exploration=1.0, prior_weight=1.0, widening=2.0,
+                 rollout_depth=40, batch_size=4, playouts=None, seed=None):
         """
-        directions = [(0, 1), (1, 0), (1, 1), (-1, 1)]
-        results = []
+        Initialize the MCTS player
 
-        if mode in ["all", "opportunities", "threats"]:
-            results = {}
+        Args:
+            game (PenteGame): Game instance
+            player_number (int): AI's player number (1 or 2)
+            exploration (float): UCT exploration constant
+            prior_weight (float): Weight of the heuristic or candidate tier priors, 0 disables them
+            widening (float): Children a node may have per square root of its visits
+            rollout_depth (int): Moves a rollout plays before it counts as a draw
+            batch_size (int): Rollouts run from each expanded leaf
+            playouts (int): Playout budget per move on top of the time limit, None for no limit
+            seed (int): Seed of the rollout random generator
+        """
+        self.game = game
+        self.player_number = player_number
+        self.opponent = 3 - player_number
+        self.exploration = exploration
+        self.prior_weight = prior_weight
+        self.widening = widening
+        self.rollout_depth = rollout_depth
+        self.batch_size = batch_size
+        self.playouts = playouts
+        self.random = random.Random(seed)
+        self.root = None
+        self.root_ply = 0  # Length of the game's move stack at the root
+        self.root_hash = None
+        self.nodes = 0  # Playouts run by the last search, reported as nodes like PenteAI's
+        self.pv = []
+        self.completed_depth = 0
+        self.stop_requested = False
+        self.heuristic_fun = None  # Heuristic giving the priors, None for the candidate tiers
+        self.line_scores = None  # Its incremental evaluator, when it has one
+
+    def get_best_move(self, board, minimax_func=None, isAlphaBeta=False, heuristic_fun=None, max_depth=None,
+                      time_limit=2, soft_time_limit=None):
+        """
+        Run playouts from the current position and play the most visited move
 
-        for row in range(board_size):
-            for col in range(board_size):
-                if board[row][col] == 0:  # Empty spot
-                    for dx, dy in directions:
-                        opponent_count = 0
-                        player_count = 0
-                        empty_count = 0
-                        surrounding_opponent_count = 0
-
-                        for step in range(-4, 5):  # Look both directions
-                            nx, ny = row + step * dx, col + step * dy
-                            if 0 <= nx < board_size and 0 <= ny < board_size:
-                                if board[nx][ny] == opponent:
-                                    opponent_count += 1
-                                    if -1 <= step <= 1:
-                                        surrounding_opponent_count += 1
-                                elif board[nx][ny] == player:
-                                    player_count += 1
-                                elif board[nx][ny] == 0:
-                                    empty_count += 1
-                                else:
-                                    break
+        Takes the arguments of PenteAI.get_best_move so both players can be
+        called the same way; minimax_func, isAlphaBeta and max_depth are not
+        used. self.nodes counts the playouts run.
 
-                        # Handle each mode
-                        if mode in ["parallel", "all"] and opponent_count >= 2 and empty_count > 0:
-                            results.append((row, col))
-                            break
+        Args:
+            board (list): Game board, kept for compatibility; the game's state is used
+            heuristic_fun (function): Heuristic scoring the children of expanded nodes for
+                their priors, None to take them from the candidate tiers
+            time_limit (float): Seconds to search
 
-                        if mode in ["threats", "all"]:
-                            threat_score = opponent_count * 50 if opponent_count >= 2 and empty_count >= 1 else 0
-                            opportunity_score = player_count * 40 if player_count >= 2 and empty_count >= 1 else 0
-                            total_score = threat_score + opportunity_score
-                            if total_score > 0:
-                                results[(row, col)] = total_score
+        Returns:
+            tuple: (row, col) most visited move at the root
+        """
+        deadline = time.time() + time_limit
+        self.game.hash = self.game.compute_hash()
+        self.move_generator().rebuild()
+        self.heuristic_fun = heuristic_fun if self.prior_weight else None
+        evaluator_class = INCREMENTAL_HEURISTICS.get(self.heuristic_fun)
+        self.line_scores = self.game.attach_observer(evaluator_class) if evaluator_class else None
+        if self.line_scores is not None:
+            self.line_scores.rebuild()
+        self.root = self.reuse_root() or MCTSNode(None, self.opponent)
+        self.root_ply = len(self.game.move_stack)
+        self.root_hash = self.game.hash
+        self.nodes = 0
+        self.completed_depth = 0
+        try:
+            while not self.stop_requested and time.time() < deadline:
+                if self.playouts is not None and self.nodes >= self.playouts:
+                    break
+                self.playout()
+        finally:
+            self.stop_requested = False
+
+        self.pv = []
+        node = self.root
+        while node.children:
+            node = max(node.children, key=lambda child: child.visits)
+            self.pv.append(node.move)
+        self.completed_depth = len(self.pv)
+        if self.pv:
+            return self.pv[0]
+        moves = self.move_generator().ordered(self.player_number)
+        return moves[0] if moves else None
+
+    def stop(self):
+        """Ask a running search to return its best move so far."""
+        self.stop_requested = True
+
+    def move_generator(self):
+        """The game's CandidateMoves observer."""
+        return self.game.attach_observer(CandidateMoves)
+
+    def reuse_root(self):
+        """The kept tree's node for the current position, if the game went on from the old root."""
+        stack = self.game.move_stack
+        if self.root is None or len(stack) < self.root_ply:
+            return None
+        root_hash = stack[self.root_ply][6] if self.root_ply < len(stack) else self.game.hash
+        if root_hash != self.root_hash:
+            return None
+        node = self.root
+        for entry in stack[self.root_ply:]:
+            node = next((child for child in node.children if child.move == entry[:2]), None)
+            if node is None:
+                return None
+        node.parent = None
+        return node
+
+    def playout(self):
+        """Select a leaf, expand it, run a batch of rollouts and back the results up."""
+        game = self.game
+        node = self.root
+        pushed = 0
+        while node.winner is None:
+            if node.untried is None:
+                node.untried = self.candidate_priors(3 - node.player)
+            if node.untried and len(node.children) < 1 + self.widening * math.sqrt(node.visits):
+                move, prior = node.untried.pop()
+                player = 3 - node.player
+                game.push_move(move[0], move[1], player)
+                pushed += 1
+                child = MCTSNode(move, player, node, prior, game.check_win())
+                node.children.append(child)
+                node = child
+                break
+            if not node.children:
+                break  # No move left, the board is full
+            node = self.select(node)
+            game.push_move(node.move[0], node.move[1], node.player)
+            pushed += 1
+
+        if node.winner is not None:
+            wins = {node.winner: self.batch_size}
+        else:
+            wins = self.rollouts(3 - node.player, self.batch_size)
+        for _ in range(pushed):
+            game.pop_move()
+
+        self.nodes += 1
+        while node is not None:
+            node.visits += self.batch_size
+            node.wins += wins.get(node.player, 0) + wins.get(0, 0) / 2
+            node = node.parent
+
+    def candidate_priors(self, player):
+        """
+        Candidate moves of `player` with their priors
+
+        With a heuristic, every candidate is played and scored for `player`,
+        the scores scaled to 0-1; otherwise the prior follows the move's
+        candidate tier.
+
+        Returns:
+            list: (move, prior) pairs, best last
+        """
+        game = self.game
+        size = game.board_size
+        ranked = self.move_generator().ranked(player)
+        if self.heuristic_fun is None:
+            return [(divmod(cell, size), 1 - tier / 6) for tier, _, cell in reversed(ranked)]
+        scored = []
+        for _, _, cell in ranked:
+            row, col = divmod(cell, size)
+            game.push_move(row, col, player)
+            if self.line_scores is not None:
+                score = self.line_scores.score(player)
+            else:
+                score = self.heuristic_fun(game.board, player)
+            game.pop_move()
+            scored.append((score, row, col))
+        if not scored:
+            return []
+        scored.sort()
+        low, high = scored[0][0], scored[-1][0]
+        span = (high - low) or 1
+        return [((row, col), (score - low) / span) for score, row, col in scored]
+
+    def select(self, node):
+        """UCT child with a progressive bias toward high-tier moves."""
+        log_visits = math.log(node.visits)
+        exploration = self.exploration
+        prior_weight = self.prior_weight
+        return max(node.children, key=lambda child: (
+            child.wins / child.visits + exploration * math.sqrt(log_visits / child.visits)
+            + prior_weight * child.prior / (child.visits + 1)))
+
+    def rollouts(self, player, count):
+        """
+        Random games from the current position, `player` to move
+
+        Moves are drawn from the empty cells next to stones. The game's
+        observers are detached meanwhile and every move is taken back.
+
+        Returns:
+            dict: Rollouts won per player, draws under 0
+        """
+        game = self.game
+        board = game.board
+        size = game.board_size
+        generator = self.move_generator()
+        neighborhoods = generator.neighborhoods
+        start = list(generator.candidates) or [(size // 2) * size + size // 2]
+        wins = {}
+        observers, game.observers = game.observers, []
+        try:
+            for _ in range(count):
+                frontier = list(start)
+                mover = player
+                pushed = 0
+                winner = None
+                while frontier and pushed < self.rollout_depth:
+                    index = self.random.randrange(len(frontier))
+                    cell = frontier[index]
+                    frontier[index] = frontier[-1]
+                    frontier.pop()
+                    row, col = divmod(cell, size)
+                    if board[row][col]:
+                        continue
+                    game.push_move(row, col, mover)
+                    pushed += 1
+                    winner = game.check_win()
+                    if winner:
+                        break
+                    frontier.extend(neighbor for neighbor in neighborhoods[cell]
+                                    if not board[neighbor // size][neighbor % size])
+                    mover = 3 - mover
+                for _ in range(pushed):
+                    game.pop_move()
+                wins[winner or 0] = wins.get(winner or 0, 0) + 1
+        finally:
+            game.observers = observers
+        return wins
+
+
+# Per-process state of the parallel search workers
+_worker_alpha = None
+_worker_stop = None
+_worker_search = None  # (position, settings, PenteAI) of the last task
+
+
+def _init_search_worker(shared_alpha, shared_stop):
+    """Process pool initializer: keep the shared alpha and stop flag."""
+    global _worker_alpha, _worker_stop
+    _worker_alpha = shared_alpha
+    _worker_stop = shared_stop
+
+
+def _search_root_move(position, settings, move, depth, deadline):
+    """
+    Search one root move in a worker process
+
+    Returns:
+        tuple: (move, score, exact, principal variation), or None when the deadline passed
+    """
+    global _worker_search
+    (player_number, minimax_name, is_alpha_beta, heuristic_fun, tt_size_mb, move_radius, check_interval,
+     quiescence_depth) = settings
+    if _worker_search is None or _worker_search[:2] != (position, settings):
+        board, captures_p1, captures_p2, current_player, backend = position
+        game = PenteGame(len(board), backend)
+        for row, stones in enumerate(board):
+            game.board[row] = list(stones)  # Whole rows keep a bitboard backend in sync
+        game.captures_p1, game.captures_p2, game.current_player = captures_p1, captures_p2, current_player
+        ai = PenteAI(game, player_number, tt_size_mb, move_radius, check_interval,
+                     quiescence_depth=quiescence_depth)
+        ai.stop_flag = _worker_stop
+        ai.prepare_search(heuristic_fun)
+        _worker_search = (position, settings, ai)
+    ai = _worker_search[2]
+    ai.deadline = deadline
+    minimax_func = getattr(ai, minimax_name)
+    alpha = _worker_alpha.value if is_alpha_beta else float('-inf')
+
+    ai.game.push_move(move[0], move[1], player_number)
+    ai.follow_pv = False
+    try:
+        if is_alpha_beta:
+            score = minimax_func(ai.game.board, depth - 1, False, alpha, float('inf'), heuristic_fun)
+        else:
+            score = minimax_func(ai.game.board, depth - 1, False, heuristic_fun)
+    except SearchTimeout:
+        ai.unwind()
+        return None
+    ai.game.pop_move()
+
+    exact = score > alpha
+    if exact and is_alpha_beta:
+        with _worker_alpha.get_lock():
+            if score > _worker_alpha.value:
+                _worker_alpha.value = score
+    return move, score, exact, [move] + ai.pv_lines.get(1, [])
+
+
+# Heuristics with an incremental evaluator that reproduces their scores exactly
+INCREMENTAL_HEURISTICS = {
+    PenteAI.evaluate_board_state_advanced: AdvancedLineScores,
+    PenteAI.evaluate_board_state_advanced_numpy: AdvancedLineScores,
+    PenteAI.evaluate_board_state_advanced_python: AdvancedLineScores,
+    PenteAI.evaluate_board_state_easy: EasyLineScores,
+}
 
-                        if mode in ["surrounding", "all"] and surrounding_opponent_count >= 2:
-                            results.append((row, col))
-                            break
 
-        return results
+if __name__ == "__main__":
+    # Headless engine on stdin/stdout, pente_gui.py is the graphical front end
+    from pente_protocol import main
+    raise SystemExit(main())
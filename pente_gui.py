@@ -1,6 +1,8 @@
+from concurrent.futures import ThreadPoolExecutor
+
 import pygame
 from pygame.locals import *
-from pente import PenteGame, PenteAI
+from pente import PenteGame, PenteAI, PenteMCTS
 
 class PenteGameGUI:
     # Constants
@@ -9,13 +11,16 @@ class PenteGameGUI:
     WOODEN = (210, 180, 140)
     GRAY = (128, 128, 128)
     STONE_COLORS = {1: BLACK, 2: WHITE}
+    FPS = 30  # Frame cap of every screen, leaves the CPU to the AI and other processes
+    TEXT_CACHE_SIZE = 256  # Rendered text surfaces kept by render_text
 
-    def __init__(self, board_size=19, cell_size=30, margin=40):
+    def __init__(self, board_size=19, cell_size=30, margin=40, ponder=True):
         # Game configuration
         self.BOARD_SIZE = board_size
         self.CELL_SIZE = cell_size
         self.MARGIN = margin
         self.STONE_RADIUS = 12
+        self.ponder = ponder  # Let the minimax AI search on the player's time
         self.SCREEN_SIZE = self.MARGIN * 2 + (self.BOARD_SIZE - 1) * self.CELL_SIZE + 200  # Extra width for captures
 
         # Initialize Pygame
@@ -26,10 +31,25 @@ class PenteGameGUI:
         # Fonts
         self.title_font = pygame.font.SysFont('Calibri', 30, bold=True)
         self.font = pygame.font.SysFont('Calibri', 24)
+        self.heading_font = pygame.font.Font(None, 74)
+        self.button_font = pygame.font.Font(None, 50)
+        self.text_cache = {}  # (font, text, color) -> rendered surface
+
+        # Pre-rendered board and stones, the game screen only redraws the cells that changed
+        self.board_surface = self.render_board()
+        self.stone_sprites = {stone: self.render_stone(color) for stone, color in self.STONE_COLORS.items()}
+        self.full_redraw = True
+        self.shown_board = None  # Stones on screen, diffed against the game every frame
+        self.shown_captures = None
+        self.shown_thinking = None
 
         # Game logic
         self.pente_game = None
+        self.ai_game = None  # Copy of pente_game the AI searches, kept move for move in step
         self.ai = None
+        self.ai_executor = ThreadPoolExecutor(max_workers=1)  # Runs the AI search off the event loop
+        self.ai_future = None  # Pending get_best_move of the AI's turn
+        self.clock = pygame.time.Clock()
         self.winner = None
         self.current_algorithm = None
         self.current_difficulty = None
@@ -38,12 +58,11 @@ class PenteGameGUI:
 
     def create_button(self, text, x, y, width=200, height=60):
         """Helper method to create a button"""
-        button_font = pygame.font.Font(None, 50)
         button = pygame.Rect(x, y, width, height)
         pygame.draw.rect(self.screen, (139, 69, 19), button, border_radius=10)  # Brown color
         pygame.draw.rect(self.screen, (0, 0, 0), button, 2, border_radius=10)  # Black border (shadow)
 
-        button_text = button_font.render(text, True, (255, 255, 255))  # White text
+        button_text = self.render_text(self.button_font, text, (255, 255, 255))  # White text
         text_rect = button_text.get_rect(center=button.center)
 
         return button, text_rect, button_text
@@ -53,8 +72,7 @@ class PenteGameGUI:
         self.screen.fill((245, 211, 161))  # Light brown background
 
         # Welcome text
-        welcome_font = pygame.font.Font(None, 74)
-        welcome_text = welcome_font.render("Select Algorithm", True, self.BLACK)
+        welcome_text = self.render_text(self.heading_font, "Select Algorithm", self.BLACK)
         welcome_rect = welcome_text.get_rect(center=(self.SCREEN_SIZE // 2, self.SCREEN_SIZE // 2 - 150))
         self.screen.blit(welcome_text, welcome_rect)
 
@@ -68,7 +86,15 @@ class PenteGameGUI:
             self.SCREEN_SIZE // 2 + 50,
             self.SCREEN_SIZE // 2 - 40
         )
+        mcts_button, mcts_text_rect, mcts_text = self.create_button(
+            "MCTS",
+            self.SCREEN_SIZE // 2 - 100,
+            self.SCREEN_SIZE // 2 + 60
+        )
 
+        self.screen.blit(alpha_beta_text, alpha_beta_text_rect)
+        self.screen.blit(min_max_text, min_max_text_rect)
+        self.screen.blit(mcts_text, mcts_text_rect)
         pygame.display.flip()
 
         running = True
@@ -85,10 +111,11 @@ class PenteGameGUI:
                     elif min_max_button.collidepoint(event.pos):
                         self.current_algorithm = "Min-Max"
                         running = False
+                    elif mcts_button.collidepoint(event.pos):
+                        self.current_algorithm = "MCTS"
+                        running = False
 
-            self.screen.blit(alpha_beta_text, alpha_beta_text_rect)
-            self.screen.blit(min_max_text, min_max_text_rect)
-            pygame.display.flip()
+            self.clock.tick(self.FPS)
 
         self.show_difficulty_selection_screen()
 
@@ -96,8 +123,7 @@ class PenteGameGUI:
         """Display screen to select game difficulty"""
         self.screen.fill((245, 211, 161))  # Light brown background
 
-        welcome_font = pygame.font.Font(None, 74)
-        welcome_text = welcome_font.render(f"{self.current_algorithm} Difficulty", True, self.BLACK)
+        welcome_text = self.render_text(self.heading_font, f"{self.current_algorithm} Difficulty", self.BLACK)
         welcome_rect = welcome_text.get_rect(center=(self.SCREEN_SIZE // 2, self.SCREEN_SIZE // 2 - 150))
         self.screen.blit(welcome_text, welcome_rect)
 
@@ -112,6 +138,8 @@ class PenteGameGUI:
             self.SCREEN_SIZE // 2 - 40
         )
 
+        self.screen.blit(easy_text, easy_text_rect)
+        self.screen.blit(hard_text, hard_text_rect)
         pygame.display.flip()
 
         running = True
@@ -129,18 +157,17 @@ class PenteGameGUI:
                         self.current_difficulty = "Hard"
                         running = False
 
-            # Draw buttons
-            self.screen.blit(easy_text, easy_text_rect)
-            self.screen.blit(hard_text, hard_text_rect)
-            pygame.display.flip()
+            self.clock.tick(self.FPS)
 
         self.start_game()
 
     def start_game(self):
         print(f"Starting game with {self.current_algorithm} algorithm on {self.current_difficulty} mode")
 
-        # Initialize game logic
+        # Initialize game logic, the AI searches its own copy so the screen never shows its trial moves
+        self.cancel_ai_move()
         self.pente_game = PenteGame()
+        self.ai_game = self.pente_game.copy()
 
         # heuristic
         heuristic_fun = (PenteAI.evaluate_board_state_advanced
@@ -149,93 +176,178 @@ class PenteGameGUI:
 
         is_alpha_beta = self.current_algorithm == "Alpha-Beta"
 
-        # Initialize AI
-        self.ai = PenteAI(self.pente_game, player_number=2)
+        # Initialize AI, tree search uses the candidate tier priors on Hard
+        if self.current_algorithm == "MCTS":
+            self.ai = PenteMCTS(self.ai_game, player_number=2,
+                                prior_weight=1.0 if self.current_difficulty == "Hard" else 0.0)
+        else:
+            self.ai = PenteAI(self.ai_game, player_number=2)
 
         self.heuristic_fun = heuristic_fun
         self.is_alpha_beta = is_alpha_beta
 
         self.winner = None
+        self.full_redraw = True
         self.run_game()
 
     def run_game(self):
         running = True
         while running:
-            self.draw_board()
-            self.draw_stones()
-            self.draw_captures()
+            if self.ai_future is not None and self.ai_future.done():
+                self.finish_ai_move()
+
+            self.render()
 
             if self.winner:
                 self.display_winner(self.winner)
 
-            pygame.display.flip()
-
             for event in pygame.event.get():
                 if event.type == QUIT:
+                    self.cancel_ai_move()
                     running = False
 
                 if event.type == MOUSEBUTTONDOWN and not self.winner:
                     # Human turn
                     if self.pente_game.current_player == 1:
-                        # try:
-                            row, col = self.get_board_coordinates(event.pos)
-                            if 0 <= row < self.BOARD_SIZE and 0 <= col < self.BOARD_SIZE:
-                                if self.pente_game.make_move(row, col):
-                                    self.winner = self.pente_game.check_win()
-
-                                    self.draw_board()
-                                    self.draw_stones()
-                                    self.draw_captures()
-                                    pygame.display.flip()
-                                    # ai turn
-                                    if not self.winner:
-                                        ai_move = self.ai.get_best_move(
-                                            self.pente_game.board,
-                                            minimax_func=(
-                                                self.ai.minimax if self.is_alpha_beta else self.ai.minimax_without_alpha_Beta),
-                                            isAlphaBeta=self.is_alpha_beta,
-                                            heuristic_fun=self.heuristic_fun
-                                        )
-                                        if ai_move:
-                                            self.pente_game.make_move(ai_move[0], ai_move[1])
-                                            self.winner = self.pente_game.check_win()
-
-                        # except Exception as e:
-                        #     print(f"Invalid move: {e}")
+                        row, col = self.get_board_coordinates(event.pos)
+                        if 0 <= row < self.BOARD_SIZE and 0 <= col < self.BOARD_SIZE:
+                            if self.play_move(row, col):
+                                if self.winner:
+                                    self.stop_pondering()
+                                else:
+                                    self.start_ai_move()
 
+            self.clock.tick(self.FPS)
+
+        self.ai_executor.shutdown()
         pygame.quit()
 
-    def draw_board(self):
-        """Draw the game board grid"""
-        self.screen.fill(self.WOODEN)
+    def play_move(self, row, col):
+        """Make a move on the shown game and the AI's copy, returns False if it was invalid"""
+        if not self.pente_game.make_move(row, col):
+            return False
+        self.ai_game.make_move(row, col)
+        self.winner = self.pente_game.check_win()
+        return True
+
+    def search_function(self):
+        """Search method of the AI for the chosen algorithm, None for MCTS"""
+        if self.current_algorithm == "MCTS":
+            return None
+        return self.ai.minimax if self.is_alpha_beta else self.ai.minimax_without_alpha_Beta
+
+    def start_ai_move(self):
+        """Start the AI's search in the background, the event loop picks up the result"""
+        self.ai.stop_requested = False  # A stop() from here on, even before the search starts, is kept
+        self.ai_future = self.ai_executor.submit(
+            self.ai.get_best_move,
+            self.ai_game.board,
+            minimax_func=self.search_function(),
+            isAlphaBeta=self.is_alpha_beta,
+            heuristic_fun=self.heuristic_fun
+        )
+
+    def finish_ai_move(self):
+        """Play the move of the finished AI search and ponder on the player's time"""
+        future, self.ai_future = self.ai_future, None
+        ai_move = future.result()
+        if ai_move and self.play_move(ai_move[0], ai_move[1]):
+            if not self.winner and self.ponder and self.current_algorithm != "MCTS":
+                self.ai.ponder(self.search_function(), self.is_alpha_beta, self.heuristic_fun)
+
+    def cancel_ai_move(self):
+        """Stop a running AI search and its pondering, waiting for the worker to let go of the game"""
+        future, self.ai_future = self.ai_future, None
+        if future is not None:
+            if not future.done():
+                self.ai.stop()
+            future.exception()  # Waits for the search without raising its error
+        self.stop_pondering()
+
+    def stop_pondering(self):
+        """Stop the AI's background search on the player's time, if it has one"""
+        if isinstance(self.ai, PenteAI):
+            self.ai.stop_pondering()
+
+    def render_board(self):
+        """Render the wooden background and grid lines once, for the game screen to copy from"""
+        surface = pygame.Surface((self.SCREEN_SIZE, self.SCREEN_SIZE))
+        surface.fill(self.WOODEN)
 
         # Draw grid lines
         for row in range(self.BOARD_SIZE):
             pygame.draw.line(
-                self.screen, self.BLACK,
+                surface, self.BLACK,
                 (self.MARGIN, self.MARGIN + row * self.CELL_SIZE),
                 (self.MARGIN + (self.BOARD_SIZE - 1) * self.CELL_SIZE, self.MARGIN + row * self.CELL_SIZE),
                 1
             )
         for col in range(self.BOARD_SIZE):
             pygame.draw.line(
-                self.screen, self.BLACK,
+                surface, self.BLACK,
                 (self.MARGIN + col * self.CELL_SIZE, self.MARGIN),
                 (self.MARGIN + col * self.CELL_SIZE, self.MARGIN + (self.BOARD_SIZE - 1) * self.CELL_SIZE),
                 1
             )
+        return surface
+
+    def render_stone(self, color):
+        """Render one stone on a transparent sprite"""
+        size = self.STONE_RADIUS * 2 + 1
+        sprite = pygame.Surface((size, size), pygame.SRCALPHA)
+        pygame.draw.circle(sprite, color, (self.STONE_RADIUS, self.STONE_RADIUS), self.STONE_RADIUS)
+        return sprite
+
+    def render_text(self, font, text, color):
+        """Rendered text surface, cached since font rendering is slow"""
+        key = (font, text, color)
+        surface = self.text_cache.get(key)
+        if surface is None:
+            if len(self.text_cache) >= self.TEXT_CACHE_SIZE:
+                self.text_cache.clear()
+            surface = self.text_cache[key] = font.render(text, True, color)
+        return surface
+
+    def render(self):
+        """Draw what changed since the last frame and send only those rectangles to the display"""
+        dirty = []
+        if self.full_redraw:
+            self.draw_board()
+        dirty += self.draw_stones()
+        dirty += self.draw_captures()
+        dirty += self.draw_thinking()
+        if self.full_redraw:
+            pygame.display.flip()
+            self.full_redraw = False
+        elif dirty:
+            pygame.display.update(dirty)
+
+    def draw_board(self):
+        """Draw the game board grid, forgetting what was on screen"""
+        self.screen.blit(self.board_surface, (0, 0))
+        self.shown_board = [[0] * self.BOARD_SIZE for _ in range(self.BOARD_SIZE)]
+        self.shown_captures = None
+        self.shown_thinking = None
 
     def draw_stones(self):
-        """Draw stones on the board"""
+        """Draw the stones placed or captured since the last frame, returns the changed rectangles"""
+        dirty = []
         for row in range(self.BOARD_SIZE):
+            shown_row = self.shown_board[row]
+            board_row = self.pente_game.board[row]
+            if shown_row == board_row:
+                continue
             for col in range(self.BOARD_SIZE):
-                stone = self.pente_game.board[row][col]
-                if stone != 0:
-                    pygame.draw.circle(
-                        self.screen, self.STONE_COLORS[stone],
-                        (self.MARGIN + col * self.CELL_SIZE, self.MARGIN + row * self.CELL_SIZE),
-                        self.STONE_RADIUS
-                    )
+                stone = board_row[col]
+                if stone != shown_row[col]:
+                    shown_row[col] = stone
+                    rect = pygame.Rect(0, 0, self.STONE_RADIUS * 2 + 1, self.STONE_RADIUS * 2 + 1)
+                    rect.center = (self.MARGIN + col * self.CELL_SIZE, self.MARGIN + row * self.CELL_SIZE)
+                    self.screen.blit(self.board_surface, rect, rect)
+                    if stone != 0:
+                        self.screen.blit(self.stone_sprites[stone], rect)
+                    dirty.append(rect)
+        return dirty
 
     def get_board_coordinates(self, mouse_pos):
         """Convert mouse position to board coordinates"""
@@ -244,21 +356,40 @@ class PenteGameGUI:
         row = (y - self.MARGIN + self.CELL_SIZE // 2) // self.CELL_SIZE
         return row, col
 
+    def draw_thinking(self):
+        """Show that the AI is searching, with its completed depth and nodes so far"""
+        thinking = None
+        if self.ai_future is not None:
+            thinking = ("AI thinking...", f"Depth {self.ai.completed_depth}", f"Nodes {self.ai.nodes}")
+        if thinking == self.shown_thinking:
+            return []
+        self.shown_thinking = thinking
+
+        panel = pygame.Rect(self.MARGIN + (self.BOARD_SIZE - 1) * self.CELL_SIZE + 40, 170, 160, 90)
+        self.screen.blit(self.board_surface, panel, panel)
+        for i, line in enumerate(thinking or ()):
+            self.screen.blit(self.render_text(self.font, line, self.BLACK), (panel.x, panel.y + i * 30))
+        return [panel]
+
     def draw_captures(self):
         """Draw capture information for both players in a modern, spaced-out style"""
+        captures = (self.pente_game.captures_p1, self.pente_game.captures_p2)
+        if captures == self.shown_captures:
+            return []
+        self.shown_captures = captures
         captures_surface = pygame.Surface((250, 120), pygame.SRCALPHA)
 
         # Title
-        title = self.title_font.render("Captures", True, (0, 0, 0))
+        title = self.render_text(self.title_font, "Captures", (0, 0, 0))
         title_rect = title.get_rect(midtop=(125, 10))
         captures_surface.blit(title, title_rect)
 
         p1_box_rect = pygame.Rect(20, 40, 100, 100)
         pygame.draw.rect(captures_surface, (130, 69, 19), p1_box_rect, border_radius=10)  # Dark brown frame
-        player1_text = self.font.render("Player 1", True, (255, 255, 255))
+        player1_text = self.render_text(self.font, "Player 1", (255, 255, 255))
         player1_text_rect = player1_text.get_rect(midtop=(p1_box_rect.x + 50, p1_box_rect.y + 10))
         captures_surface.blit(player1_text, player1_text_rect)
-        player1_captures = self.font.render(str(self.pente_game.captures_p1), True, (255, 255, 255))
+        player1_captures = self.render_text(self.font, str(captures[0]), (255, 255, 255))
         player1_captures_rect = player1_captures.get_rect(center=(p1_box_rect.x + 50, p1_box_rect.y + 60))
         captures_surface.blit(player1_captures, player1_captures_rect)
 
@@ -267,14 +398,17 @@ class PenteGameGUI:
 
         p2_box_rect = pygame.Rect(p1_box_rect.right + spacing, 40, 100, 100)
         pygame.draw.rect(captures_surface, (139, 69, 19), p2_box_rect, border_radius=10)
-        player2_text = self.font.render("Player 2", True, (255, 255, 255))
+        player2_text = self.render_text(self.font, "Player 2", (255, 255, 255))
         player2_text_rect = player2_text.get_rect(midtop=(p2_box_rect.x + 50, p2_box_rect.y + 10))
         captures_surface.blit(player2_text, player2_text_rect)
-        player2_captures = self.font.render(str(self.pente_game.captures_p2), True, (255, 255, 255))
+        player2_captures = self.render_text(self.font, str(captures[1]), (255, 255, 255))
         player2_captures_rect = player2_captures.get_rect(center=(p2_box_rect.x + 50, p2_box_rect.y + 60))
         captures_surface.blit(player2_captures, player2_captures_rect)
 
-        self.screen.blit(captures_surface, (self.MARGIN + (self.BOARD_SIZE - 1) * self.CELL_SIZE + 20, 20))
+        panel = captures_surface.get_rect(topleft=(self.MARGIN + (self.BOARD_SIZE - 1) * self.CELL_SIZE + 20, 20))
+        self.screen.blit(self.board_surface, panel, panel)
+        self.screen.blit(captures_surface, panel)
+        return [panel]
 
     def display_winner(self, winner):
         """Display the winner and show reset and exit buttons."""
@@ -289,8 +423,7 @@ class PenteGameGUI:
         else:
             winner_text = "Draw!"
 
-        winner_font = pygame.font.Font(None, 74)
-        text = winner_font.render(winner_text, True, (255, 255, 255))
+        text = self.render_text(self.heading_font, winner_text, (255, 255, 255))
         text_rect = text.get_rect(center=(self.SCREEN_SIZE // 2, self.SCREEN_SIZE // 2 - 100))
         self.screen.blit(text, text_rect)
 
@@ -312,8 +445,8 @@ class PenteGameGUI:
         pygame.draw.rect(self.screen, self.BLACK, exit_button, 2, border_radius=10)
 
         # Add white text to buttons
-        reset_text = self.font.render("Reset", True, self.WHITE)
-        exit_text = self.font.render("Exit", True, self.WHITE)
+        reset_text = self.render_text(self.font, "Reset", self.WHITE)
+        exit_text = self.render_text(self.font, "Exit", self.WHITE)
 
         reset_text_rect = reset_text.get_rect(center=reset_button.center)
         exit_text_rect = exit_text.get_rect(center=exit_button.center)
@@ -338,5 +471,7 @@ class PenteGameGUI:
                         pygame.quit()
                         exit()
 
+            self.clock.tick(self.FPS)
+
 
 game = PenteGameGUI()
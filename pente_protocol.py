@@ -0,0 +1,211 @@
+"""
+Headless engine speaking a Gomocup-style line protocol on stdin/stdout
+
+Supported commands: START size, RESTART, BEGIN, TURN x,y, BOARD (x,y,field
+lines up to DONE), TAKEBACK x,y, INFO key value, ABOUT and END. Coordinates
+are x,y = column,row. The game keeps Pente rules, so BOARD stones are played
+in the order given (field 1 for the engine, 2 for the opponent) to resolve
+captures, and the first one listed belongs to player 1.
+
+INFO timeout_turn, timeout_match and time_left (milliseconds) set the time
+of each move. While it thinks the engine streams a MESSAGE line per
+completed iteration:
+
+    python pente_protocol.py --depth 8 --heuristic advanced
+"""
+import argparse
+import math
+import sys
+import time
+
+from pente import PenteGame, SearchStats
+from pente_tournament import ALGORITHMS, HEURISTICS, EngineConfig
+
+
+class EngineProtocol:
+    """Reads protocol commands, keeps the PenteGame between them and answers with the AI's moves"""
+
+    ABOUT = 'name="pente", version="1.0"'
+    MOVES_TO_GO = 20  # Moves the remaining match time is spread over
+    SAFETY_MARGIN = 0.1  # Share of a move's time kept back for overhead and I/O
+
+    def __init__(self, config, input=sys.stdin, output=sys.stdout):
+        """
+        Args:
+            config (EngineConfig): Search settings, its time_limit is used when no INFO gives one
+            input (file): Command stream
+            output (file): Answer stream
+        """
+        self.config = config
+        self.input = input
+        self.output = output
+        self.game = None
+        self.ai = None
+        self.board_lines = None  # Lines of a BOARD command until DONE
+        self.timeout_turn = None  # Seconds, from INFO
+        self.timeout_match = None
+        self.time_left = None
+
+    def send(self, text):
+        self.output.write(text + "\n")
+        self.output.flush()
+
+    def run(self):
+        """Answer commands until END or the end of the input."""
+        for line in self.input:
+            if not self.handle(line.strip()):
+                break
+
+    def handle(self, line):
+        """
+        Process one input line
+
+        Returns:
+            bool: False once END was received
+        """
+        try:
+            if self.board_lines is not None:
+                if line.upper() == "DONE":
+                    lines, self.board_lines = self.board_lines, None
+                    self.setup_board(lines)
+                else:
+                    self.board_lines.append(line)
+                return True
+            if not line:
+                return True
+
+            command, _, argument = line.partition(" ")
+            command = command.upper()
+            if command == "END":
+                return False
+            handler = getattr(self, "command_" + command.lower(), None)
+            if handler is None:
+                self.send(f"UNKNOWN {command}")
+            else:
+                handler(argument.strip())
+        except ValueError as error:
+            self.send(f"ERROR {error}")
+        return True
+
+    def command_start(self, argument):
+        size = int(argument)
+        if size < 5:
+            raise ValueError(f"unsupported board size {size}")
+        self.game = PenteGame(size)
+        self.ai = None
+        self.send("OK")
+
+    def command_restart(self, argument):
+        if self.game is None:
+            raise ValueError("no game started")
+        self.command_start(str(self.game.board_size))
+
+    def command_about(self, argument):
+        self.send(self.ABOUT)
+
+    def command_info(self, argument):
+        key, _, value = argument.partition(" ")
+        key = key.lower()
+        if key in ("timeout_turn", "timeout_match", "time_left"):
+            setattr(self, key, int(value) / 1000)
+
+    def command_begin(self, argument):
+        self.require_game()
+        self.think()
+
+    def command_turn(self, argument):
+        self.require_game()
+        row, col = self.parse_move(argument)
+        if not self.game.make_move(row, col):
+            raise ValueError(f"invalid move {argument}")
+        self.think()
+
+    def command_takeback(self, argument):
+        self.require_game()
+        row, col = self.parse_move(argument)
+        if not self.game.move_stack or self.game.move_stack[-1][:2] != (row, col):
+            raise ValueError(f"{argument} is not the last move")
+        self.game.pop_move()
+        self.send("OK")
+
+    def command_board(self, argument):
+        self.require_game()
+        self.board_lines = []
+
+    def require_game(self):
+        if self.game is None:
+            raise ValueError("no game started")
+
+    def parse_move(self, text):
+        """(row, col) of an "x,y" protocol move."""
+        x, y = (int(part) for part in text.split(",")[:2])
+        if not (0 <= x < self.game.board_size and 0 <= y < self.game.board_size):
+            raise ValueError(f"move {text} is off the board")
+        return y, x
+
+    def setup_board(self, lines):
+        """Replay the stones of a BOARD command, then move for field 1."""
+        stones = []
+        for line in lines:
+            x, y, field = (int(part) for part in line.split(","))
+            row, col = self.parse_move(f"{x},{y}")
+            stones.append((row, col, 1 if field == 1 else 2))
+        # The first stone is player 1's; the engine's stones (field 1) are the side to move
+        first = stones[0][2] if stones else 1
+        game = PenteGame(self.game.board_size)
+        for row, col, field in stones:
+            if not game.push_move(row, col, 1 if field == first else 2):
+                raise ValueError(f"invalid stone {col},{row}")
+        game.current_player = 1 if first == 1 else 2
+        game.hash = game.compute_hash()
+        self.game = game
+        self.ai = None
+        self.think()
+
+    def move_time(self):
+        """Seconds for the next move under the time limits received with INFO."""
+        budget = math.inf if self.timeout_turn is None else self.timeout_turn
+        if self.timeout_match:
+            remaining = self.timeout_match if self.time_left is None else self.time_left
+            budget = min(budget, remaining / self.MOVES_TO_GO)
+        if budget == math.inf:
+            budget = self.config.time_limit
+        return max(0.01, budget * (1 - self.SAFETY_MARGIN))
+
+    def report_iteration(self, iteration):
+        pv = " ".join(f"{col},{row}" for row, col in iteration["pv"])
+        self.send(f"MESSAGE depth {iteration['depth']} score {iteration['score']} nodes {iteration['nodes']} "
+                  f"nps {iteration['nps']:.0f} time {iteration['elapsed'] * 1000:.0f} pv {pv}")
+
+    def think(self):
+        """Search the position, play the move and send it."""
+        if self.game.check_win():
+            raise ValueError("game is over")
+        player = self.game.current_player
+        if self.ai is None or self.ai.player_number != player or self.ai.game is not self.game:
+            self.ai = self.config.create(self.game, player, SearchStats(on_iteration=self.report_iteration))
+        start = time.time()
+        move = self.config.best_move(self.ai, self.game, self.move_time())
+        if move is None or not self.game.make_move(*move):
+            raise ValueError("no move available")
+        if self.time_left is not None:
+            self.time_left = max(0.0, self.time_left - (time.time() - start))
+        self.send(f"{move[1]},{move[0]}")
+
+
+def main(argv=None, input=sys.stdin, output=sys.stdout):
+    parser = argparse.ArgumentParser(description="Pente engine speaking a Gomocup-style protocol")
+    parser.add_argument("--algorithm", choices=sorted(ALGORITHMS), default="pvs")
+    parser.add_argument("--heuristic", choices=sorted(HEURISTICS), default="advanced")
+    parser.add_argument("--depth", type=int, default=8, help="deepest iteration, the time limit usually ends it")
+    parser.add_argument("--time-limit", type=float, default=2.0, help="seconds per move when INFO sets none")
+    parser.add_argument("--threat-depth", type=int, default=8, help="threat-space search depth, 0 disables it")
+    args = parser.parse_args(argv)
+
+    config = EngineConfig("pente", args.algorithm, args.heuristic, args.depth, args.time_limit, args.threat_depth)
+    EngineProtocol(config, input, output).run()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
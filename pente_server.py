@@ -0,0 +1,465 @@
+"""
+Asyncio game server hosting many Pente sessions
+
+Sessions live in memory as the list of moves played (two bytes a move) and
+are replayed with PenteGame when needed. AI moves are searched in a bounded
+process pool: each session queues its own requests and the sessions with
+work waiting take turns, so a busy client cannot starve the others. Full
+queues turn requests away with a "busy" error, and a request still queued
+at its deadline fails without being searched.
+
+Clients send one JSON object per line and get one back, with the request's
+"id" echoed:
+
+    {"id": 1, "op": "new"}                                  -> {"id": 1, "session": 1}
+    {"id": 2, "op": "move", "session": 1, "move": [9, 9]}   -> the session's state
+    {"id": 3, "op": "best_move", "session": 1, "time_limit": 1, "deadline": 5, "play": true}
+    {"id": 4, "op": "state", "session": 1}
+    {"id": 5, "op": "close", "session": 1}
+    {"id": 6, "op": "stats"}                                -> queue depth and latency percentiles per op
+
+    python pente_server.py --port 7777 --workers 4
+    python pente_server.py --stdio
+"""
+import argparse
+import asyncio
+import json
+import sys
+import time
+from array import array
+from collections import defaultdict, deque
+from concurrent.futures import ProcessPoolExecutor
+
+from pente import PenteGame
+from pente_tournament import ALGORITHMS, HEURISTICS, EngineConfig
+
+
+class ServerError(Exception):
+    """A request the server refuses, reported to the client as {"error": message}."""
+
+
+def replay(board_size, moves):
+    """
+    Rebuild a game from its moves
+
+    Args:
+        board_size (int): Board size
+        moves (iterable): Cells (row * board_size + col) played alternately from player 1
+
+    Returns:
+        PenteGame: The game after the moves
+    """
+    game = PenteGame(board_size)
+    for cell in moves:
+        game.make_move(cell // board_size, cell % board_size)
+    return game
+
+
+def _search_worker(config, board_size, moves, time_limit):
+    """Search a session's position in a pool process; returns (move, nodes, depth, seconds)."""
+    game = replay(board_size, array('H', moves))
+    ai = config.create(game, game.current_player)
+    start = time.perf_counter()
+    move = config.best_move(ai, game, time_limit)
+    return move, ai.nodes, ai.completed_depth, time.perf_counter() - start
+
+
+def percentiles(samples, points=(50, 90, 99)):
+    """Nearest-rank percentiles of the samples, in milliseconds."""
+    if not samples:
+        return {f"p{point}": None for point in points}
+    ordered = sorted(samples)
+    return {f"p{point}": ordered[min(len(ordered) - 1, max(0, -(-point * len(ordered) // 100) - 1))] * 1000
+            for point in points}
+
+
+class Session:
+    """One game: its moves and the AI requests waiting for it"""
+
+    __slots__ = ("id", "board_size", "moves", "queue", "busy", "ready")
+
+    def __init__(self, session_id, board_size):
+        self.id = session_id
+        self.board_size = board_size
+        self.moves = array('H')  # Cells in the order played
+        self.queue = deque()  # SearchRequest objects not dispatched yet
+        self.busy = False  # A search of this session is running
+        self.ready = False  # The session is in GameServer.ready
+
+    def game(self):
+        return replay(self.board_size, self.moves)
+
+    def state(self, game=None):
+        """Moves, side to move, captures and winner of the session."""
+        game = game or self.game()
+        return {
+            "session": self.id,
+            "moves": [list(divmod(cell, self.board_size)) for cell in self.moves],
+            "current_player": game.current_player,
+            "captures": [game.captures_p1, game.captures_p2],
+            "winner": game.check_win(),
+        }
+
+
+class SearchRequest:
+    """A best_move request waiting in its session's queue"""
+
+    __slots__ = ("future", "time_limit", "deadline", "enqueued", "play", "plies", "timer")
+
+    def __init__(self, future, time_limit, deadline, enqueued, play):
+        self.future = future
+        self.time_limit = time_limit
+        self.deadline = deadline  # loop.time() after which the request is dropped
+        self.enqueued = enqueued
+        self.play = play  # Play the move found before the session's next search starts
+        self.plies = None  # Moves in the session when the search started
+        self.timer = None  # Fails the request at its deadline while it is still queued
+
+
+class GameServer:
+    """Sessions, the fair scheduler in front of the process pool, and the request handlers"""
+
+    SAMPLES = 1024  # Latencies kept for the percentiles
+    MIN_SIZE = 5
+    MAX_SIZE = 255  # Cells of larger boards do not fit the two-byte move array
+
+    def __init__(self, config=None, workers=2, max_sessions=10000, session_queue=4, max_pending=256,
+                 default_deadline=30.0):
+        """
+        Args:
+            config (EngineConfig): Search settings, time_limit is the default per request
+            workers (int): Searches running at once, one process each
+            max_sessions (int): Sessions kept before new ones are refused
+            session_queue (int): Requests one session may have waiting
+            max_pending (int): Requests waiting over all sessions
+            default_deadline (float): Seconds a request may take when it sets no deadline
+        """
+        self.config = config or EngineConfig("server", tt_size_mb=4)
+        self.workers = workers
+        self.max_sessions = max_sessions
+        self.session_queue = session_queue
+        self.max_pending = max_pending
+        self.default_deadline = default_deadline
+        self.pool = None
+        self.sessions = {}
+        self.next_id = 1
+        self.ready = deque()  # Sessions with queued requests and no running search, in turn order
+        self.pending = 0  # Queued requests over all sessions
+        self.running = 0
+        self.completed = 0
+        self.rejected = 0
+        self.expired = 0
+        self.latencies = defaultdict(lambda: deque(maxlen=self.SAMPLES))  # Seconds from arrival to answer, by op
+        self.waits = deque(maxlen=self.SAMPLES)  # Seconds queued before a worker took the request
+
+    def start(self):
+        if self.pool is None:
+            self.pool = ProcessPoolExecutor(max_workers=self.workers)
+
+    def close(self):
+        """Shut down the pool, failing the requests still queued."""
+        for session in self.sessions.values():
+            while session.queue:
+                request = session.queue.popleft()
+                if not request.future.done():
+                    request.future.set_exception(ServerError("server closed"))
+        if self.pool is not None:
+            self.pool.shutdown(cancel_futures=True)
+            self.pool = None
+
+    async def handle(self, request):
+        """
+        Answer one request
+
+        Args:
+            request (dict): Decoded request with "op" and its arguments
+
+        Returns:
+            dict: Response, {"error": message} when the request failed
+        """
+        started = time.perf_counter()
+        op = str(request.get("op"))
+        handler = getattr(self, "op_" + op, None)
+        try:
+            if handler is None:
+                raise ServerError(f"unknown op {op}")
+            response = await handler(request)
+        except ServerError as error:
+            response = {"error": str(error)}
+        except (KeyError, TypeError, ValueError) as error:
+            response = {"error": f"bad request: {error}"}
+        except Exception as error:  # Every request gets an answer, whatever went wrong
+            response = {"error": f"internal error: {type(error).__name__}: {error}"}
+        if "id" in request:
+            response["id"] = request["id"]
+        if handler is not None:
+            self.latencies[op].append(time.perf_counter() - started)
+        return response
+
+    def session(self, request):
+        session = self.sessions.get(request["session"])
+        if session is None:
+            raise ServerError(f"no session {request['session']}")
+        return session
+
+    async def op_new(self, request):
+        if len(self.sessions) >= self.max_sessions:
+            raise ServerError("too many sessions")
+        size = int(request.get("size", 19))
+        if not self.MIN_SIZE <= size <= self.MAX_SIZE:
+            raise ServerError(f"board size must be between {self.MIN_SIZE} and {self.MAX_SIZE}")
+        session = Session(self.next_id, size)
+        self.next_id += 1
+        self.sessions[session.id] = session
+        return {"session": session.id}
+
+    async def op_close(self, request):
+        session = self.session(request)
+        del self.sessions[session.id]
+        while session.queue:
+            session.queue.popleft().future.set_exception(ServerError("session closed"))
+            self.pending -= 1
+        return {"closed": session.id}
+
+    async def op_state(self, request):
+        return self.session(request).state()
+
+    async def op_move(self, request):
+        return self.play(self.session(request), request["move"])
+
+    def play(self, session, move):
+        """Play a move in the session and return its new state."""
+        row, col = (int(value) for value in move)
+        game = session.game()
+        if game.check_win():
+            raise ServerError("game is over")
+        if not game.make_move(row, col):
+            raise ServerError(f"invalid move {row},{col}")
+        session.moves.append(row * session.board_size + col)
+        return session.state(game)
+
+    async def op_stats(self, request):
+        return self.stats()
+
+    async def op_best_move(self, request):
+        """Queue a search of the session's position and wait for its move."""
+        session = self.session(request)
+        if session.game().check_win():
+            raise ServerError("game is over")
+        time_limit = float(request.get("time_limit", self.config.time_limit))
+        deadline = float(request.get("deadline", self.default_deadline))
+        play = bool(request.get("play"))
+        move, nodes, depth, seconds = await self.submit(session, time_limit, deadline, play)
+        response = {"session": session.id, "move": list(move) if move else None, "nodes": nodes,
+                    "depth": depth, "search_time": seconds}
+        if play:
+            response["state"] = session.state()
+        return response
+
+    def submit(self, session, time_limit, deadline, play=False):
+        """
+        Queue a search request, refusing it when the queues are full
+
+        Args:
+            session (Session): Session whose position is searched when its turn comes
+            time_limit (float): Seconds the search may take
+            deadline (float): Seconds from now after which the request fails instead of waiting longer
+            play (bool): Play the move found in the session
+
+        Returns:
+            asyncio.Future: Resolves to the worker's (move, nodes, depth, seconds)
+        """
+        if len(session.queue) >= self.session_queue or self.pending >= self.max_pending:
+            self.rejected += 1
+            raise ServerError("busy")
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        now = loop.time()
+        request = SearchRequest(future, time_limit, now + deadline, now, play)
+        request.timer = loop.call_at(request.deadline, self.expire, session, request)
+        session.queue.append(request)
+        self.pending += 1
+        if not session.busy:
+            self.make_ready(session)
+        self.dispatch()
+        return future
+
+    def make_ready(self, session):
+        """Give the session a turn after the sessions already waiting."""
+        if not session.ready:
+            session.ready = True
+            self.ready.append(session)
+
+    def dispatch(self):
+        """Start the next sessions' searches while workers are free, one session at a time in turn."""
+        loop = asyncio.get_running_loop()
+        while self.running < self.workers and self.ready:
+            session = self.ready.popleft()
+            session.ready = False
+            if session.id not in self.sessions or not session.queue:
+                continue
+            request = session.queue.popleft()
+            request.timer.cancel()
+            self.pending -= 1
+            now = loop.time()
+            remaining = request.deadline - now
+            if remaining <= 0 or request.future.done():
+                if not request.future.done():
+                    self.expired += 1
+                    request.future.set_exception(ServerError("deadline exceeded while queued"))
+                if session.queue:
+                    self.make_ready(session)
+                continue
+
+            self.start()
+            self.waits.append(now - request.enqueued)
+            session.busy = True
+            request.plies = len(session.moves)
+            self.running += 1
+            time_limit = min(request.time_limit, remaining * 0.9)  # Leave room to send the answer
+            work = loop.run_in_executor(self.pool, _search_worker, self.config, session.board_size,
+                                        session.moves.tobytes(), time_limit)
+            work.add_done_callback(lambda work, session=session, request=request:
+                                   self.finish(session, request, work))
+
+    def expire(self, session, request):
+        """Fail a request whose deadline passed before a worker took it."""
+        if request in session.queue:
+            session.queue.remove(request)
+            self.pending -= 1
+            if not request.future.done():
+                self.expired += 1
+                request.future.set_exception(ServerError("deadline exceeded while queued"))
+
+    def finish(self, session, request, work):
+        """Hand a search result to its request and give the worker to the next session."""
+        self.running -= 1
+        session.busy = False
+        self.completed += 1
+        if not request.future.done():
+            if work.cancelled():
+                request.future.set_exception(ServerError("search cancelled"))
+            elif work.exception() is not None:
+                request.future.set_exception(ServerError(f"search failed: {work.exception()}"))
+            else:
+                result = work.result()
+                try:
+                    if request.play and result[0]:
+                        if len(session.moves) != request.plies:
+                            raise ServerError("position changed during the search")
+                        self.play(session, result[0])
+                    request.future.set_result(result)
+                except ServerError as error:
+                    request.future.set_exception(error)
+        if session.queue and session.id in self.sessions:
+            self.make_ready(session)
+        self.dispatch()
+
+    def stats(self):
+        """Queue depth, counters and latency percentiles (milliseconds) by op of the server."""
+        return {
+            "sessions": len(self.sessions),
+            "queued": self.pending,
+            "running": self.running,
+            "workers": self.workers,
+            "completed": self.completed,
+            "rejected": self.rejected,
+            "expired": self.expired,
+            "latency_ms": {op: percentiles(samples) for op, samples in self.latencies.items()},
+            "queue_wait_ms": percentiles(self.waits),
+        }
+
+
+async def respond(server, line, write):
+    """Decode one request line, answer it and write the response line."""
+    try:
+        request = json.loads(line)
+        if not isinstance(request, dict):
+            raise ValueError("request must be an object")
+    except ValueError as error:
+        response = {"error": f"bad request: {error}"}
+    else:
+        response = await server.handle(request)
+    await write(json.dumps(response) + "\n")
+
+
+async def serve_connection(server, reader, writer):
+    """Answer the requests of one socket client, several at a time."""
+    async def write(text):
+        writer.write(text.encode())
+        await writer.drain()  # Slow readers hold back their own responses
+
+    tasks = set()
+    try:
+        while line := await reader.readline():
+            if line.strip():
+                task = asyncio.create_task(respond(server, line, write))
+                tasks.add(task)
+                task.add_done_callback(tasks.discard)
+        await asyncio.gather(*tasks)
+    finally:
+        writer.close()
+
+
+async def serve_stdio(server, input=sys.stdin, output=sys.stdout):
+    """Answer requests read from input until its end, writing responses to output."""
+    loop = asyncio.get_running_loop()
+
+    async def write(text):
+        output.write(text)
+        output.flush()
+
+    tasks = set()
+    while line := await loop.run_in_executor(None, input.readline):
+        if line.strip():
+            task = asyncio.create_task(respond(server, line, write))
+            tasks.add(task)
+            task.add_done_callback(tasks.discard)
+    await asyncio.gather(*tasks)
+
+
+async def serve(server, host="127.0.0.1", port=7777, unix=None):
+    """Listen on a TCP port, or a Unix socket path when given, until cancelled."""
+    def handler(reader, writer):
+        return serve_connection(server, reader, writer)
+
+    if unix:
+        listener = await asyncio.start_unix_server(handler, path=unix)
+    else:
+        listener = await asyncio.start_server(handler, host, port)
+    async with listener:
+        await listener.serve_forever()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Serve many Pente games with a shared AI worker pool")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=7777)
+    parser.add_argument("--unix", help="listen on this Unix socket path instead of TCP")
+    parser.add_argument("--stdio", action="store_true", help="read requests from stdin, answer on stdout")
+    parser.add_argument("--workers", type=int, default=2, help="searches running at once")
+    parser.add_argument("--session-queue", type=int, default=4, help="requests one session may have waiting")
+    parser.add_argument("--max-pending", type=int, default=256, help="requests waiting over all sessions")
+    parser.add_argument("--max-sessions", type=int, default=10000)
+    parser.add_argument("--algorithm", choices=sorted(ALGORITHMS), default="pvs")
+    parser.add_argument("--heuristic", choices=sorted(HEURISTICS), default="advanced")
+    parser.add_argument("--depth", type=int, default=8)
+    parser.add_argument("--time-limit", type=float, default=1.0, help="default seconds per search")
+    args = parser.parse_args(argv)
+
+    config = EngineConfig("server", args.algorithm, args.heuristic, args.depth, args.time_limit, tt_size_mb=4)
+    server = GameServer(config, args.workers, args.max_sessions, args.session_queue, args.max_pending)
+    try:
+        if args.stdio:
+            asyncio.run(serve_stdio(server))
+        else:
+            asyncio.run(serve(server, args.host, args.port, args.unix))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
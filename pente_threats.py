@@ -0,0 +1,245 @@
+import time
+from operator import itemgetter
+
+
+class ThreatBudgetExceeded(Exception):
+    """Raised inside ThreatSearch when its node or time budget runs out."""
+
+
+class ThreatSearch:
+    """
+    Threat-space search for forced wins
+
+    Only forcing moves are tried for the attacker: fours (a move leaving a
+    cell that completes five), capture threats once the attacker holds four
+    captured pairs, and optionally open threes. The defender answers a four
+    or a capture threat on the winning cells or by capturing, which covers
+    every defence. An open three is answered on its cost squares (the empty
+    cells of its open-four windows), by a capture, by bracketing a pair of
+    the attacker's stones or with a four. A defender who gets a winning cell
+    of their own refutes the attack.
+
+    The game is explored with push_move/pop_move and read through the
+    game's CandidateMoves observer, so positions are left as they were.
+    """
+
+    def __init__(self, game, generator, max_depth=8, max_nodes=20000, use_threes=True):
+        """
+        Args:
+            game (PenteGame): Game to search, restored before returning
+            generator (CandidateMoves): The game's attached move generator
+            max_depth (int): Most attacker moves in a forcing sequence
+            max_nodes (int): Positions visited before giving up
+            use_threes (bool): Whether open threes count as forcing moves
+        """
+        self.game = game
+        self.generator = generator
+        self.max_depth = max_depth
+        self.max_nodes = max_nodes
+        self.use_threes = use_threes
+        self.nodes = 0
+        self.deadline = None
+        self.failed = {}  # hash -> deepest remaining depth at which the attack failed
+
+    def find_win(self, player, deadline=None):
+        """
+        Look for a forcing sequence winning for `player`, who is to move
+
+        Args:
+            player (int): Attacking player (1 or 2)
+            deadline (float): time.time() value after which the search gives up
+
+        Returns:
+            tuple: (row, col) first move of a forced win, or None
+        """
+        self.nodes = 0
+        self.deadline = deadline
+        self.failed = {}
+        root_ply = len(self.game.move_stack)
+        cell = None
+        try:
+            # Deepen one attacker move at a time so short wins are found first
+            for depth in range(1, self.max_depth + 1):
+                cell = self._attack(player, depth)
+                if cell is not None:
+                    break
+        except ThreatBudgetExceeded:
+            cell = None
+        finally:
+            while len(self.game.move_stack) > root_ply:
+                self.game.pop_move()
+        return None if cell is None else divmod(cell, self.game.board_size)
+
+    def _count_node(self):
+        self.nodes += 1
+        if self.nodes > self.max_nodes or (self.deadline is not None and self.nodes % 64 == 0
+                                           and time.time() >= self.deadline):
+            raise ThreatBudgetExceeded()
+
+    def _captures(self, player):
+        return self.game.captures_p1 if player == 1 else self.game.captures_p2
+
+    def winning_cells(self, player):
+        """Empty cells where `player` makes five, or a fifth capture."""
+        generator = self.generator
+        cells = generator.cells
+        segments = generator.segments
+        capture_win = self._captures(player) >= 4
+        capture_shape = (3 - player, 3 - player, player)
+        wins = []
+        for cell in sorted(generator.candidates):
+            for getter in segments[cell]:
+                segment = getter(cells)
+                if segment.count(player) < 4 and not capture_win:
+                    continue
+                run = 0
+                for i in range(4, 0, -1):
+                    if segment[i] != player:
+                        break
+                    run += 1
+                for i in range(6, 10):
+                    if segment[i] != player:
+                        break
+                    run += 1
+                if run >= 4 or (capture_win and (segment[6:9] == capture_shape
+                                                 or segment[4:1:-1] == capture_shape)):
+                    wins.append(cell)
+                    break
+        return wins
+
+    def capture_moves(self, player):
+        """Empty cells where `player` captures a pair."""
+        bitboard = self.game.bitboard
+        if bitboard is not None:
+            return bitboard.cells(bitboard.capture_moves(player))  # Every capture cell in one bitboard pass
+        generator = self.generator
+        cells = generator.cells
+        shape = (3 - player, 3 - player, player)
+        return [cell for cell in sorted(generator.candidates)
+                if any(segment[6:9] == shape or segment[4:1:-1] == shape
+                       for segment in (getter(cells) for getter in generator.segments[cell]))]
+
+    def capture_threat_moves(self, player):
+        """Empty cells where `player` brackets a pair, threatening to capture it next move."""
+        generator = self.generator
+        cells = generator.cells
+        shape = (3 - player, 3 - player, 0)
+        return [cell for cell in sorted(generator.candidates)
+                if any(segment[6:9] == shape or segment[4:1:-1] == shape
+                       for segment in (getter(cells) for getter in generator.segments[cell]))]
+
+    def threats(self, player, threes=True):
+        """
+        Forcing moves for `player`, fours and capture threats before open threes
+
+        Args:
+            player (int): Player making the threats
+            threes (bool): Whether open threes are wanted, when use_threes is set
+
+        Returns:
+            list: (cell, cost squares) pairs, cost squares is None for a four
+                or capture threat and the set of the three's cost cells otherwise
+        """
+        generator = self.generator
+        cells = generator.cells
+        segment_cells = generator.segment_cells
+        capture_threat = self._captures(player) >= 4
+        capture_shape = (3 - player, 3 - player, 0)
+        threes = threes and self.use_threes
+        needed = 2 if threes else 3  # Stones already on a line for a three or a four through the cell
+
+        # Cells in line with and at most four cells away from one of the player's stones
+        nearby = set()
+        for cell in range(len(cells) - 1):
+            if cells[cell] == player:
+                for line in segment_cells[cell]:
+                    for index in line[1:10]:
+                        if cells[index] == 0:
+                            nearby.add(index)
+        if capture_threat:
+            nearby.update(generator.candidates)  # Bracketing a pair needs no stone of one's own nearby
+
+        fours = []
+        open_threes = []
+        for cell in sorted(nearby):
+            cost = set()
+            forcing = False
+            lines = 0  # Directions the move threatens on, more first
+            for getter, line in zip(generator.segments[cell], segment_cells[cell]):
+                segment = getter(cells)
+                if capture_threat and (segment[6:9] == capture_shape or segment[4:1:-1] == capture_shape):
+                    forcing = True
+                    lines += 1
+                    continue
+                if segment.count(player) < needed:
+                    continue
+                placed = segment[:5] + (player,) + segment[6:]
+                if any(placed[start:start + 5].count(player) == 4 and placed[start:start + 5].count(0) == 1
+                       for start in range(1, 6)):
+                    forcing = True
+                    lines += 1
+                    continue
+                if threes:
+                    open_three = False
+                    for start in range(1, 5):
+                        window = placed[start:start + 6]
+                        if (window[0] == 0 and window[5] == 0 and window[1:5].count(player) == 3
+                                and window[1:5].count(0) == 1):
+                            open_three = True
+                            cost.update(line[start + i] for i in range(6) if window[i] == 0)
+                    lines += open_three
+            if forcing:
+                fours.append((-lines, cell, None))
+            elif cost:
+                open_threes.append((-lines, cell, cost))
+        fours.sort(key=itemgetter(0, 1))
+        open_threes.sort(key=itemgetter(0, 1))
+        return [(cell, cost) for _, cell, cost in fours + open_threes]
+
+    def _attack(self, player, depth):
+        """Winning cell for `player` to move, or None if no forced win was found."""
+        wins = self.winning_cells(player)
+        if wins:
+            return wins[0]
+        if depth <= 0 or self.winning_cells(3 - player):
+            return None  # Answering the opponent's threat is not a forcing move
+        key = self.game.hash
+        if self.failed.get(key, -1) >= depth:
+            return None
+
+        size = self.game.board_size
+        # A three needs two more moves to become five, so at depth 1 only fours can win
+        for cell, cost in self.threats(player, threes=depth > 1):
+            self._count_node()
+            self.game.push_move(cell // size, cell % size, player)
+            defended = self._defend(player, depth - 1, cost)
+            self.game.pop_move()
+            if not defended:
+                return cell
+        self.failed[key] = depth
+        return None
+
+    def _defend(self, player, depth, cost):
+        """Whether the opponent of `player`, to move after a threat, has a defence."""
+        opponent = 3 - player
+        if self.game.check_win() == player:
+            return False
+        if self.winning_cells(opponent):
+            return True
+        defenses = set(self.winning_cells(player))
+        defenses.update(self.capture_moves(opponent))
+        if cost is not None:
+            defenses.update(cost)
+            defenses.update(self.capture_threat_moves(opponent))
+            defenses.update(cell for cell, _ in self.threats(opponent, threes=False))
+
+        size = self.game.board_size
+        for cell in sorted(defenses):
+            self._count_node()
+            if not self.game.push_move(cell // size, cell % size, opponent):
+                continue
+            refuted = self.game.check_win() == opponent or self._attack(player, depth) is None
+            self.game.pop_move()
+            if refuted:
+                return True
+        return False
@@ -0,0 +1,309 @@
+"""
+Headless self-play tournaments between engine configurations
+
+Every pair of configurations plays a number of games across a process pool,
+each opening played twice with the colours swapped. Finished games are
+appended to a JSON lines file as they come in, and the report gives each
+configuration's score with a 95% confidence interval, its average move
+latency and its nodes per second, playouts for PenteMCTS:
+
+    python pente_tournament.py --games 20 --workers 4 --output results.jsonl \\
+        --engine "easy:heuristic=easy,depth=2" --engine "advanced:heuristic=advanced,depth=2"
+"""
+import argparse
+import json
+import math
+import random
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from itertools import combinations
+
+from pente import PenteGame, PenteAI, PenteMCTS
+
+HEURISTICS = {
+    "easy": PenteAI.evaluate_board_state_easy,
+    "advanced": PenteAI.evaluate_board_state_advanced,
+    "patterns": PenteAI.evaluate_board_state_patterns,
+}
+
+# Search method name and whether it takes alpha and beta, mcts plays PenteMCTS
+ALGORITHMS = {
+    "alphabeta": ("minimax", True),
+    "pvs": ("pvs", True),
+    "minimax": ("minimax_without_alpha_Beta", False),
+    "mcts": (None, False),
+}
+
+
+class EngineConfig:
+    """One engine setup taking part in a tournament"""
+
+    def __init__(self, name, algorithm="alphabeta", heuristic="advanced", depth=3, time_limit=2.0,
+                 threat_depth=8, tt_size_mb=16):
+        """
+        Args:
+            name (str): Name in the results
+            algorithm (str): alphabeta, pvs, minimax or mcts
+            heuristic (str): easy, advanced or patterns
+            depth (int): Deepest iteration of the minimax searches
+            time_limit (float): Seconds per move
+            threat_depth (int): Threat-space search depth, 0 disables it
+            tt_size_mb (float): Transposition table size in megabytes
+        """
+        if algorithm not in ALGORITHMS:
+            raise ValueError(f"Unknown algorithm: {algorithm}")
+        if heuristic not in HEURISTICS:
+            raise ValueError(f"Unknown heuristic: {heuristic}")
+        self.name = name
+        self.algorithm = algorithm
+        self.heuristic = heuristic
+        self.depth = int(depth)
+        self.time_limit = float(time_limit)
+        self.threat_depth = int(threat_depth)
+        self.tt_size_mb = float(tt_size_mb)
+
+    @classmethod
+    def parse(cls, spec):
+        """
+        Build a configuration from "name:key=value,key=value"
+
+        Args:
+            spec (str): e.g. "deep:algorithm=pvs,depth=4,time_limit=5"
+
+        Returns:
+            EngineConfig: The configuration
+        """
+        name, _, options = spec.partition(":")
+        settings = {}
+        for option in filter(None, options.split(",")):
+            key, _, value = option.partition("=")
+            settings[key.strip()] = value.strip()
+        return cls(name.strip(), **settings)
+
+    def create(self, game, player_number, stats=None):
+        """The AI playing `player_number` in `game` with this configuration, stats only reach PenteAI."""
+        if self.algorithm == "mcts":
+            return PenteMCTS(game, player_number)
+        return PenteAI(game, player_number, tt_size_mb=self.tt_size_mb, threat_depth=self.threat_depth, stats=stats)
+
+    def best_move(self, ai, game, time_limit=None):
+        """Let ai search the game's position with this configuration's settings, or another time limit."""
+        method, is_alpha_beta = ALGORITHMS[self.algorithm]
+        return ai.get_best_move(game.board, getattr(ai, method) if method else None, is_alpha_beta,
+                                HEURISTICS[self.heuristic], max_depth=self.depth,
+                                time_limit=self.time_limit if time_limit is None else time_limit)
+
+
+def random_opening(seed, moves, board_size=19, radius=3):
+    """
+    Random legal opening moves near the centre, reproducible from the seed
+
+    Returns:
+        list: (row, col) moves, played alternately from player 1
+    """
+    rng = random.Random(seed)
+    game = PenteGame(board_size)
+    center = board_size // 2
+    opening = []
+    while len(opening) < moves:
+        row = center + rng.randint(-radius, radius)
+        col = center + rng.randint(-radius, radius)
+        if game.make_move(row, col):
+            if game.check_win():
+                game.pop_move()
+                continue
+            opening.append((row, col))
+    return opening
+
+
+def play_game(index, black, white, opening, max_plies=200):
+    """
+    Play one game between two configurations
+
+    Args:
+        index (int): Game number in the tournament
+        black (EngineConfig): Configuration playing player 1
+        white (EngineConfig): Configuration playing player 2
+        opening (list): Moves played before the engines take over
+        max_plies (int): Plies after which the game is a draw
+
+    Returns:
+        dict: Players, winner's name (None for a draw), plies, and per player
+            the moves searched, seconds spent and nodes visited
+    """
+    game = PenteGame()
+    for row, col in opening:
+        game.make_move(row, col)
+    configs = {1: black, 2: white}
+    ais = {player: config.create(game, player) for player, config in configs.items()}
+    usage = {player: {"moves": 0, "seconds": 0.0, "nodes": 0} for player in configs}
+
+    winner = game.check_win()
+    while winner is None and len(game.move_stack) < max_plies:
+        player = game.current_player
+        start = time.perf_counter()
+        move = configs[player].best_move(ais[player], game)
+        usage[player]["seconds"] += time.perf_counter() - start
+        usage[player]["moves"] += 1
+        usage[player]["nodes"] += ais[player].nodes
+        if move is None or not game.make_move(*move):
+            break  # No legal move left, a draw
+        winner = game.check_win()
+
+    for ai in ais.values():
+        if isinstance(ai, PenteAI):
+            ai.close()
+    return {
+        "game": index,
+        "black": black.name,
+        "white": white.name,
+        "winner": configs[winner].name if winner else None,
+        "plies": len(game.move_stack),
+        "captures": [game.captures_p1, game.captures_p2],
+        "opening": [list(move) for move in opening],
+        "usage": {configs[player].name: usage[player] for player in configs},
+    }
+
+
+def wilson_interval(score, games, z=1.96):
+    """
+    Wilson score interval of a win rate
+
+    Args:
+        score (float): Points scored, a draw counting half
+        games (int): Games played
+        z (float): Normal quantile, 1.96 for 95%
+
+    Returns:
+        tuple: (low, high) bounds of the rate
+    """
+    if not games:
+        return 0.0, 1.0
+    rate = score / games
+    denominator = 1 + z * z / games
+    center = (rate + z * z / (2 * games)) / denominator
+    margin = z * math.sqrt(rate * (1 - rate) / games + z * z / (4 * games * games)) / denominator
+    return max(0.0, center - margin), min(1.0, center + margin)
+
+
+def standings(results, configs):
+    """
+    Score, confidence interval, latency and speed of each configuration
+
+    Args:
+        results (list): play_game results
+        configs (list): EngineConfig of every participant
+
+    Returns:
+        list: One dict per configuration, best score first
+    """
+    table = {config.name: {"name": config.name, "games": 0, "wins": 0, "losses": 0, "draws": 0,
+                           "moves": 0, "seconds": 0.0, "nodes": 0} for config in configs}
+    for result in results:
+        for name in (result["black"], result["white"]):
+            row = table[name]
+            row["games"] += 1
+            if result["winner"] is None:
+                row["draws"] += 1
+            elif result["winner"] == name:
+                row["wins"] += 1
+            else:
+                row["losses"] += 1
+            usage = result["usage"][name]
+            row["moves"] += usage["moves"]
+            row["seconds"] += usage["seconds"]
+            row["nodes"] += usage["nodes"]
+
+    for row in table.values():
+        score = row["wins"] + row["draws"] / 2
+        row["score"] = score / row["games"] if row["games"] else 0.0
+        row["interval"] = wilson_interval(score, row["games"])
+        row["latency"] = row["seconds"] / row["moves"] if row["moves"] else 0.0
+        row["nps"] = row["nodes"] / row["seconds"] if row["seconds"] else 0.0
+    return sorted(table.values(), key=lambda row: -row["score"])
+
+
+def run_tournament(configs, games=10, workers=1, output=None, seed=0, opening_moves=4, max_plies=200):
+    """
+    Play every pair of configurations against each other
+
+    Each pair plays `games` games, every random opening twice with the
+    colours swapped. Results are appended to `output` as JSON lines while
+    the games finish.
+
+    Args:
+        configs (list): EngineConfig of every participant
+        games (int): Games per pair, rounded up to an even number
+        workers (int): Games played at once, each in its own process
+        output (str): JSON lines file the results are appended to
+        seed (int): Seed of the random openings
+        opening_moves (int): Random moves played before the engines take over
+        max_plies (int): Plies after which a game is a draw
+
+    Returns:
+        tuple: (list of game results, standings)
+    """
+    if len({config.name for config in configs}) != len(configs):
+        raise ValueError("Engine names must be unique")
+    tasks = []
+    for first, second in combinations(configs, 2):
+        for _ in range((games + 1) // 2):
+            opening = random_opening(seed * 1000003 + len(tasks), opening_moves)
+            tasks.append((first, second, opening))
+            tasks.append((second, first, opening))
+
+    results = []
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = [pool.submit(play_game, index, black, white, opening, max_plies)
+                   for index, (black, white, opening) in enumerate(tasks)]
+        stream = open(output, "a") if output else None
+        try:
+            for future in as_completed(futures):
+                result = future.result()
+                results.append(result)
+                if stream:
+                    stream.write(json.dumps(result) + "\n")
+                    stream.flush()
+                print(f"game {result['game']}: {result['black']} vs {result['white']} -> "
+                      f"{result['winner'] or 'draw'} in {result['plies']} plies", flush=True)
+        finally:
+            if stream:
+                stream.close()
+    results.sort(key=lambda result: result["game"])
+    return results, standings(results, configs)
+
+
+def print_standings(table):
+    print(f"{'engine':<16} {'games':>5} {'W-L-D':>10} {'score':>6} {'95% CI':>13} {'ms/move':>8} {'nodes/s':>9}")
+    for row in table:
+        record = f"{row['wins']}-{row['losses']}-{row['draws']}"
+        low, high = row["interval"]
+        print(f"{row['name']:<16} {row['games']:>5} {record:>10} {row['score']:>6.2f} "
+              f"{f'{low:.2f}-{high:.2f}':>13} {row['latency'] * 1e3:>8.0f} {row['nps']:>9.0f}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Play engine configurations against each other")
+    parser.add_argument("--engine", action="append", required=True,
+                        help='configuration as "name:key=value,...", keys: algorithm, heuristic, depth, '
+                             'time_limit, threat_depth, tt_size_mb; give two or more')
+    parser.add_argument("--games", type=int, default=10, help="games per pair of engines")
+    parser.add_argument("--workers", type=int, default=1, help="games played in parallel")
+    parser.add_argument("--output", help="JSON lines file the game results are appended to")
+    parser.add_argument("--seed", type=int, default=0, help="seed of the random openings")
+    parser.add_argument("--opening-moves", type=int, default=4, help="random moves before the engines play")
+    parser.add_argument("--max-plies", type=int, default=200, help="plies after which a game is drawn")
+    args = parser.parse_args(argv)
+
+    configs = [EngineConfig.parse(spec) for spec in args.engine]
+    if len(configs) < 2:
+        parser.error("give at least two engines")
+    _, table = run_tournament(configs, args.games, args.workers, args.output, args.seed, args.opening_moves,
+                              args.max_plies)
+    print_standings(table)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
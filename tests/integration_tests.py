@@ -1,5 +1,14 @@
+import asyncio
+import io
+import json
+import os
+import tempfile
+import time
 import unittest
-from pente import PenteGame, PenteAI
+from pente import PenteGame, PenteAI, PenteMCTS, SearchStats
+from pente_protocol import main as protocol_main
+from pente_server import GameServer, serve_connection
+from pente_tournament import EngineConfig, run_tournament
 
 class TestPenteIntegration(unittest.TestCase):
     def setUp(self):
@@ -20,5 +29,285 @@ class TestPenteIntegration(unittest.TestCase):
         self.game.make_move(ai_move[0], ai_move[1])
         self.assertEqual(self.game.board[ai_move[0]][ai_move[1]], 2)
 
+    def test_principal_variation_starts_with_best_move(self):
+        for row, col in [(9, 9), (9, 10), (10, 10), (8, 8)]:
+            self.game.make_move(row, col)
+        self.game.make_move(11, 11)
+        ai_move = self.ai.get_best_move(self.game.board, self.ai.minimax, True,
+                                        self.ai.evaluate_board_state_advanced, max_depth=3, time_limit=60)
+        self.assertEqual(self.ai.pv[0], ai_move)
+        self.assertEqual(len(self.ai.pv), 3)
+        self.assertEqual(self.game.move_stack[-1][:2], (11, 11))  # Search left the game as it was
+
+    def test_deadline_aborts_mid_iteration(self):
+        for row, col in [(9, 9), (9, 10), (10, 10), (8, 8), (11, 11)]:
+            self.game.make_move(row, col)
+        board_before = [list(row) for row in self.game.board]
+        hash_before = self.game.hash
+        start = time.time()
+        ai_move = self.ai.get_best_move(self.game.board, self.ai.minimax_without_alpha_Beta, False,
+                                        self.ai.evaluate_board_state_easy, max_depth=10, time_limit=0.3)
+        self.assertLess(time.time() - start, 1.0)
+        self.assertLess(self.ai.completed_depth, 10)
+        self.assertTrue(self.game.is_valid_move(*ai_move))
+        self.assertEqual([list(row) for row in self.game.board], board_before)
+        self.assertEqual(self.game.hash, hash_before)
+
+    def test_stop_before_search_starts_is_kept(self):
+        self.game.make_move(9, 9)
+        self.ai.stop()  # Sent after the search was handed to a worker but before it started
+        self.ai.get_best_move(self.game.board, self.ai.minimax, True, self.ai.evaluate_board_state_easy,
+                              max_depth=3, time_limit=60)
+        self.assertLess(self.ai.completed_depth, 3)
+        self.ai.get_best_move(self.game.board, self.ai.minimax, True, self.ai.evaluate_board_state_easy,
+                              max_depth=3, time_limit=60)
+        self.assertEqual(self.ai.completed_depth, 3)  # The stop ended with the search it aborted
+
+    def test_parallel_root_search_matches_serial(self):
+        for row, col in [(9, 9), (9, 10), (10, 10), (8, 8), (11, 11)]:
+            self.game.make_move(row, col)
+        serial_move = self.ai.get_best_move(self.game.board, self.ai.minimax, True,
+                                            self.ai.evaluate_board_state_advanced, max_depth=2, time_limit=60)
+        parallel_ai = PenteAI(self.game, player_number=2, workers=2)
+        self.addCleanup(parallel_ai.close)
+        parallel_move = parallel_ai.get_best_move(self.game.board, parallel_ai.minimax, True,
+                                                  parallel_ai.evaluate_board_state_advanced, max_depth=2, time_limit=60)
+        self.assertEqual(parallel_move, serial_move)
+        self.assertEqual(parallel_ai.completed_depth, 2)
+
+    def test_pvs_matches_alpha_beta(self):
+        for row, col in [(9, 9), (9, 10), (10, 10), (8, 8), (11, 11)]:
+            self.game.make_move(row, col)
+        scores = []
+        for search in (self.ai.minimax, self.ai.pvs):
+            ai = PenteAI(self.game, player_number=2)
+            ai.prepare_search(ai.evaluate_board_state_advanced)
+            scores.append(getattr(ai, search.__name__)(self.game.board, 2, True, float('-inf'), float('inf'),
+                                                       ai.evaluate_board_state_advanced))
+        self.assertEqual(scores[0], scores[1])
+        pvs_move = self.ai.get_best_move(self.game.board, self.ai.pvs, True,
+                                         self.ai.evaluate_board_state_advanced, max_depth=3, time_limit=60)
+        self.assertEqual(self.ai.pv[0], pvs_move)
+        self.assertEqual(self.ai.completed_depth, 3)
+
+    def test_forced_win_skips_full_search(self):
+        for row, col in [(9, 4), (3, 3), (15, 15)]:
+            self.game.push_move(row, col, 1)
+        for row, col in [(9, 5), (9, 6), (9, 7), (7, 8), (8, 8)]:
+            self.game.push_move(row, col, 2)
+        ai_move = self.ai.get_best_move(self.game.board, self.ai.minimax, True,
+                                        self.ai.evaluate_board_state_advanced, max_depth=3, time_limit=2)
+        self.assertEqual(ai_move, (9, 8))
+        self.assertEqual(self.ai.pv, [(9, 8)])
+        self.assertEqual(self.ai.nodes, 0)
+
+    def test_mcts_blocks_four_within_playout_budget(self):
+        for col in range(5, 9):
+            self.game.push_move(9, col, 1)
+        self.game.push_move(9, 4, 2)
+        self.game.push_move(3, 3, 1)
+        board_before = [list(row) for row in self.game.board]
+        mcts = PenteMCTS(self.game, player_number=2, playouts=300, seed=1)
+        ai_move = mcts.get_best_move(self.game.board, None, False, None, time_limit=60)
+        self.assertEqual(ai_move, (9, 9))
+        self.assertEqual(mcts.nodes, 300)
+        self.assertEqual([list(row) for row in self.game.board], board_before)
+
+    def test_mcts_priors_from_heuristic(self):
+        for col in range(5, 9):
+            self.game.push_move(9, col, 1)
+        self.game.push_move(9, 4, 2)
+        self.game.push_move(3, 3, 1)
+        mcts = PenteMCTS(self.game, player_number=2, playouts=100, seed=1)
+        ai_move = mcts.get_best_move(self.game.board, None, False, PenteAI.evaluate_board_state_advanced,
+                                     time_limit=60)
+        self.assertEqual(ai_move, (9, 9))
+        priors = {child.move: child.prior for child in mcts.root.children}
+        self.assertEqual(max(priors, key=priors.get), (9, 9))  # Blocking the four scores best
+        self.assertTrue(all(0 <= prior <= 1 for prior in priors.values()))
+
+    def test_mcts_reuses_tree_between_moves(self):
+        for row, col in [(9, 9), (9, 10), (10, 10)]:
+            self.game.make_move(row, col)
+        mcts = PenteMCTS(self.game, player_number=2, playouts=200, seed=1)
+        ai_move = mcts.get_best_move(self.game.board, time_limit=60)
+        reply = mcts.pv[1]
+        self.game.make_move(*ai_move)
+        self.game.make_move(*reply)
+        kept = mcts.reuse_root()
+        self.assertIsNotNone(kept)
+        self.assertEqual(kept.move, reply)
+        self.assertGreater(kept.visits, 0)
+
+    def test_ponder_hit_keeps_completed_iterations(self):
+        for row, col in [(9, 9), (9, 10), (10, 10), (8, 8), (10, 9)]:
+            self.game.make_move(row, col)
+        heuristic = self.ai.evaluate_board_state_advanced
+        ai_move = self.ai.get_best_move(self.game.board, self.ai.minimax, True, heuristic,
+                                        max_depth=2, time_limit=60)
+        self.game.make_move(*ai_move)
+        reply = self.ai.ponder(self.ai.minimax, True, heuristic, max_depth=2)
+        self.ai.ponder_thread.join()
+        self.game.make_move(*reply)
+        ai_move = self.ai.get_best_move(self.game.board, self.ai.minimax, True, heuristic,
+                                        max_depth=2, time_limit=60)
+        self.assertEqual(self.ai.ponder_hits, 1)
+        self.assertEqual(self.ai.completed_depth, 2)
+        self.assertEqual(self.ai.nodes, 0)  # Nothing left to search after the ponder hit
+
+        fresh = PenteAI(self.game.copy(), player_number=2)
+        self.assertEqual(ai_move, fresh.get_best_move(fresh.game.board, fresh.minimax, True, heuristic,
+                                                      max_depth=2, time_limit=60))
+
+    def test_ponder_miss_searches_actual_position(self):
+        for row, col in [(9, 9), (9, 10), (10, 10)]:
+            self.game.make_move(row, col)
+        heuristic = self.ai.evaluate_board_state_advanced
+        reply = self.ai.ponder(self.ai.minimax, True, heuristic, max_depth=3)
+        self.assertIsNone(reply)  # Not the opponent's turn
+        self.game.make_move(11, 11)
+        board_before = [list(row) for row in self.game.board]
+        self.assertIsNotNone(self.ai.ponder(self.ai.minimax, True, heuristic, max_depth=3))
+        self.game.make_move(0, 0)
+        ai_move = self.ai.get_best_move(self.game.board, self.ai.minimax, True, heuristic,
+                                        max_depth=2, time_limit=60)
+        self.assertEqual(self.ai.ponder_misses, 1)
+        self.assertEqual(self.ai.completed_depth, 2)
+        self.assertTrue(self.game.is_valid_move(*ai_move))
+        board_before[0][0] = 1
+        self.assertEqual([list(row) for row in self.game.board], board_before)
+
+    def test_search_stats_hooks(self):
+        for row, col in [(9, 9), (9, 10), (10, 10), (8, 8), (10, 9)]:
+            self.game.make_move(row, col)
+        iterations, searches = [], []
+        plain = PenteAI(self.game.copy(), player_number=2)
+        self.ai.stats = SearchStats(on_iteration=iterations.append, on_search=searches.append)
+        heuristic = self.ai.evaluate_board_state_advanced
+        ai_move = self.ai.get_best_move(self.game.board, self.ai.pvs, True, heuristic, max_depth=3, time_limit=60)
+
+        self.assertEqual([iteration["depth"] for iteration in iterations], [1, 2, 3])
+        self.assertEqual(iterations[-1]["move"], ai_move)
+        self.assertEqual(len(searches), 1)
+        summary = searches[0]
+        self.assertEqual(summary["nodes"], self.ai.nodes)
+        self.assertGreater(summary["evaluations"], 0)
+        self.assertGreater(summary["cutoffs"][0], 0)
+        self.assertIn(0, summary["branching_factor"])
+        self.assertGreater(summary["times"]["move_generation"], 0)
+        self.assertEqual(plain.get_best_move(plain.game.board, plain.pvs, True, heuristic, max_depth=3,
+                                             time_limit=60), ai_move)
+        self.assertEqual(plain.nodes, self.ai.nodes)  # Collecting statistics does not change the search
+
+    def test_tournament_streams_every_game(self):
+        configs = [EngineConfig("easy", heuristic="easy", depth=1), EngineConfig("advanced", depth=1)]
+        with tempfile.TemporaryDirectory() as directory:
+            output = os.path.join(directory, "results.jsonl")
+            results, table = run_tournament(configs, games=2, output=output, max_plies=12)
+            with open(output) as stream:
+                streamed = [json.loads(line) for line in stream]
+        self.assertEqual(len(results), 2)
+        self.assertEqual(sorted(result["game"] for result in streamed), [0, 1])
+        self.assertEqual(results[0]["opening"], results[1]["opening"])  # Same opening, colours swapped
+        self.assertEqual((results[0]["black"], results[1]["black"]), ("easy", "advanced"))
+        self.assertEqual(sum(row["games"] for row in table), 4)
+
+    def test_protocol_session(self):
+        commands = ["START 19", "INFO timeout_turn 5000", "BOARD", "5,9,2", "6,9,2", "7,9,2", "8,9,2",
+                    "4,9,1", "3,3,1", "DONE", "TURN 0,0", "TAKEBACK 1,1", "HELLO", "END", "ABOUT"]
+        output = io.StringIO()
+        protocol_main(["--depth", "2"], io.StringIO("\n".join(commands) + "\n"), output)
+        answers = [line for line in output.getvalue().splitlines() if not line.startswith("MESSAGE")]
+        self.assertEqual(answers[0], "OK")
+        self.assertEqual(answers[1], "9,9")  # Blocks the four, x is the column
+        self.assertRegex(answers[2], r"^\d+,\d+$")
+        self.assertEqual(answers[3], "ERROR 1,1 is not the last move")
+        self.assertEqual(answers[4], "UNKNOWN HELLO")
+        self.assertEqual(len(answers), 5)  # Nothing is read after END
+
+    def test_server_sessions_over_socket(self):
+        async def session():
+            server = GameServer(EngineConfig("server", depth=2, time_limit=5, tt_size_mb=1), workers=2)
+            listener = await asyncio.start_server(lambda reader, writer: serve_connection(server, reader, writer),
+                                                  "127.0.0.1", 0)
+            reader, writer = await asyncio.open_connection(*listener.sockets[0].getsockname()[:2])
+            requests = [{"id": 1, "op": "new"}, {"id": 2, "op": "new"}, "not json"]
+            for request in requests:
+                writer.write(((request if isinstance(request, str) else json.dumps(request)) + "\n").encode())
+            answers = {}
+            for _ in requests:
+                answer = json.loads(await reader.readline())
+                answers[answer.get("id")] = answer
+            first, second = answers[1]["session"], answers[2]["session"]
+            requests = [{"id": 3, "op": "move", "session": first, "move": [9, 5]},
+                        {"id": 4, "op": "best_move", "session": first, "play": True},
+                        {"id": 5, "op": "best_move", "session": second, "play": True},
+                        {"id": 6, "op": "move", "session": first, "move": [9, 5]}]
+            for request in requests:
+                writer.write((json.dumps(request) + "\n").encode())
+            for _ in requests:
+                answer = json.loads(await reader.readline())
+                answers[answer["id"]] = answer
+            writer.write(b'{"id": 7, "op": "stats"}\n')
+            answers[7] = json.loads(await reader.readline())
+            writer.close()
+            listener.close()
+            server.close()
+            return answers
+
+        answers = asyncio.run(session())
+        self.assertTrue(answers[None]["error"].startswith("bad request"))
+        self.assertEqual(answers[3]["current_player"], 2)
+        self.assertEqual(answers[4]["state"]["moves"], [[9, 5], answers[4]["move"]])
+        self.assertEqual(answers[5]["state"]["moves"], [answers[5]["move"]])
+        self.assertEqual(answers[6]["error"], "invalid move 9,5")
+        self.assertEqual(answers[7]["completed"], 2)
+        self.assertEqual(answers[7]["queued"], 0)
+        self.assertGreater(answers[7]["latency_ms"]["best_move"]["p50"], answers[7]["latency_ms"]["new"]["p99"])
+
+    def test_server_backpressure_and_deadlines(self):
+        async def session():
+            server = GameServer(EngineConfig("server", depth=8, time_limit=5, tt_size_mb=1), workers=1,
+                                session_queue=1)
+            first = (await server.handle({"op": "new"}))["session"]
+            second = (await server.handle({"op": "new"}))["session"]
+            await server.handle({"op": "move", "session": first, "move": [9, 9]})
+            running = asyncio.create_task(server.handle({"op": "best_move", "session": first, "time_limit": 2}))
+            await asyncio.sleep(0)  # Takes the only worker
+            queued = asyncio.create_task(server.handle({"op": "best_move", "session": first, "time_limit": 0.1}))
+            await asyncio.sleep(0)
+            refused = await server.handle({"op": "best_move", "session": first})
+            started = time.perf_counter()
+            expired = await server.handle({"op": "best_move", "session": second, "deadline": 0.2})
+            waited = time.perf_counter() - started
+            answers = await asyncio.gather(running, queued)
+            stats = server.stats()
+            server.close()
+            return answers, refused, expired, waited, stats
+
+        answers, refused, expired, waited, stats = asyncio.run(session())
+        self.assertEqual(refused, {"error": "busy"})
+        self.assertEqual(expired, {"error": "deadline exceeded while queued"})
+        self.assertLess(waited, 1.0)  # Answered at its deadline, not when the running search ends
+        self.assertTrue(all("move" in answer for answer in answers))
+        self.assertEqual((stats["completed"], stats["rejected"], stats["expired"]), (2, 1, 1))
+
+    def test_server_rejects_bad_sizes_and_answers_every_request(self):
+        async def session():
+            server = GameServer(EngineConfig("server", depth=1, tt_size_mb=1), workers=1)
+            answers = [await server.handle({"id": size, "op": "new", "size": size}) for size in (-3, 4, 256, 5)]
+            session = answers[-1]["session"]
+            server.sessions[session].board_size = 300  # Cells past the move array's range raise OverflowError
+            broken = await server.handle({"id": 9, "op": "move", "session": session, "move": [299, 299]})
+            server.close()
+            return answers, broken
+
+        answers, broken = asyncio.run(session())
+        for answer in answers[:3]:
+            self.assertEqual(answer["error"], "board size must be between 5 and 255")
+        self.assertIn("session", answers[3])
+        self.assertEqual(broken["id"], 9)
+        self.assertTrue(broken["error"].startswith("internal error"))
+
 if __name__ == '__main__':
     unittest.main()
\ No newline at end of file
@@ -1,35 +1,351 @@
+"""
+Engine benchmarks
+
+Searches the positions of tests/positions.txt at a fixed depth or for a fixed
+time, repeating every run, and reports nodes, nodes/sec, time-to-depth and
+best-move agreement. Micro-benchmarks then time check_win, check_captures,
+the move generator and each heuristic on their own. Results can be written
+as JSON and compared with an earlier run to catch performance regressions:
+
+    python tests/performance_tests.py --depth 3 --output before.json
+    python tests/performance_tests.py --depth 3 --compare before.json
+"""
+import argparse
+import json
+import math
+import os
+import platform
+import statistics
+import subprocess
+import sys
 import time
-from pente import PenteGame, PenteAI
+import timeit
+from collections import Counter
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))  # Run as a script from any directory
+import pente
+from pente import PenteGame, PenteAI, CandidateMoves, AdvancedLineScores, EasyLineScores
+from pente_tournament import ALGORITHMS, HEURISTICS
+
+POSITIONS_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "positions.txt")
+
+# The minimax searches of ALGORITHMS, the ones with nodes and depths to compare
+SEARCHES = sorted(name for name, (method, _) in ALGORITHMS.items() if method)
+
+
+def parse_move(text):
+    row, col = text.split(",")
+    return int(row), int(col)
+
+
+def load_positions(path=POSITIONS_FILE):
+    """
+    Read a position corpus
+
+    Each non-comment line is "name: moves | best moves", the moves being
+    row,col pairs played alternately from player 1.
+
+    Args:
+        path (str): Corpus file
+
+    Returns:
+        list: dicts with the position's name, moves and accepted best moves
+    """
+    positions = []
+    with open(path) as corpus:
+        for line in corpus:
+            line = line.strip()
+            if not line or line.startswith("#"):
+                continue
+            name, _, rest = line.partition(":")
+            moves, _, best = rest.partition("|")
+            positions.append({
+                "name": name.strip(),
+                "moves": [parse_move(move) for move in moves.split()],
+                "best": [parse_move(move) for move in best.split()],
+            })
+    return positions
+
+
+def setup_game(moves, backend="list"):
+    """
+    Play a move list into a new game
+
+    Raises:
+        ValueError: If a move is illegal or the game is already won
+    """
+    game = PenteGame(backend=backend)
+    for row, col in moves:
+        if game.check_win() or not game.make_move(row, col):
+            raise ValueError(f"Illegal move {row},{col}")
+    if game.check_win():
+        raise ValueError("Position is already won")
+    return game
+
+
+def run_search(position, max_depth, time_limit, algorithm, heuristic, backend, threat_depth):
+    """
+    Search a position once with a fresh AI, so no run warms the next one's tables
+
+    Returns:
+        dict: Best move, nodes, elapsed seconds and completed depth
+    """
+    game = setup_game(position["moves"], backend)
+    ai = PenteAI(game, player_number=game.current_player, threat_depth=threat_depth)
+    method, is_alpha_beta = ALGORITHMS[algorithm]
+    start = time.perf_counter()
+    move = ai.get_best_move(game.board, getattr(ai, method), is_alpha_beta, HEURISTICS[heuristic],
+                            max_depth=max_depth, time_limit=time_limit, soft_time_limit=time_limit)
+    seconds = time.perf_counter() - start
+    return {"move": list(move) if move else None, "nodes": ai.nodes, "seconds": seconds,
+            "depth": ai.completed_depth}
+
+
+def bench_position(position, mode, depth, time_limit, repeats, algorithm, heuristic, backend, threat_depth):
+    """
+    Benchmark the search of one position
+
+    In "depth" mode every depth up to `depth` is searched from scratch, which
+    gives the time to reach it; the last one supplies nodes and best move. In
+    "time" mode the search deepens until time_limit runs out.
+
+    Returns:
+        dict: Median seconds, nodes, nodes/sec, time-to-depth and the share of
+            runs agreeing on the most common (and, when known, the correct) move
+    """
+    time_to_depth = {}
+    if mode == "depth":
+        for current in range(1, depth + 1):
+            runs = [run_search(position, current, math.inf, algorithm, heuristic, backend, threat_depth)
+                    for _ in range(repeats)]
+            time_to_depth[current] = statistics.median(run["seconds"] for run in runs)
+    else:
+        runs = [run_search(position, 64, time_limit, algorithm, heuristic, backend, threat_depth)
+                for _ in range(repeats)]
+
+    moves = Counter(tuple(run["move"]) if run["move"] else None for run in runs)
+    move, count = moves.most_common(1)[0]
+    seconds = statistics.median(run["seconds"] for run in runs)
+    nodes = statistics.median_low(run["nodes"] for run in runs)
+    result = {
+        "position": position["name"],
+        "mode": mode,
+        "move": list(move) if move else None,
+        "agreement": count / len(runs),
+        "nodes": nodes,
+        "seconds": seconds,
+        "nps": nodes / seconds if seconds else 0.0,
+        "depth": statistics.median_low(run["depth"] for run in runs),
+        "time_to_depth": time_to_depth,
+    }
+    if position["best"]:
+        best = set(position["best"])
+        result["best_agreement"] = sum(1 for run in runs if run["move"] and tuple(run["move"]) in best) / len(runs)
+    return result
+
+
+def _check_captures(game, cells):
+    """Place a stone on each cell, resolve its captures as check_captures does and take it all back."""
+    board = game.board
+    bitboard = game.bitboard
+    player = game.current_player
+    opponent = 3 - player
+    size = game.board_size
+    for cell in cells:
+        row, col = divmod(cell, size)
+        board[row][col] = player
+        captured = game.remove_captures(row, col)
+        for r, c in captured:
+            board[r][c] = opponent
+            if bitboard is not None:
+                bitboard.bits[opponent] |= bitboard.cell_bits[r * size + c]
+        board[row][col] = 0
+
+
+def _push_pop(game, cells):
+    size = game.board_size
+    for cell in cells:
+        game.push_move(cell // size, cell % size)
+        game.pop_move()
+
+
+def _cold_easy(board, player):
+    pente._analyze_cells.cache_clear()  # Time the analysis, not the cache hit of the previous call
+    return PenteAI.evaluate_board_state_easy(board, player)
+
+
+def micro_benchmarks(positions, repeats=5, number=20, backend="list"):
+    """
+    Time the engine's hot functions over every position of the corpus
+
+    Each benchmark calls its function once per position per loop; the best
+    of `repeats` timings of `number` loops is reported.
+
+    Returns:
+        list: dicts with the benchmark name and seconds per loop
+    """
+    games = [setup_game(position["moves"], backend) for position in positions]
+    generators = [game.attach_observer(CandidateMoves) for game in games]
+    candidates = [sorted(generator.candidates) for generator in generators]
+    # The incremental evaluators live on copies so push_move/pop_move is timed with the generator only
+    scored = [game.copy() for game in games]
+    advanced_scores = [game.attach_observer(AdvancedLineScores) for game in scored]
+    easy_scores = [game.attach_observer(EasyLineScores) for game in scored]
+    for observer in advanced_scores + easy_scores:
+        observer.rebuild()
+
+    benchmarks = {
+        "check_win": lambda: [game.check_win() for game in games],
+        "has_five": lambda: [game.has_five(1) or game.has_five(2) for game in games],
+        "check_captures": lambda: [_check_captures(game, cells) for game, cells in zip(games, candidates)],
+        "push_move/pop_move": lambda: [_push_pop(game, cells) for game, cells in zip(games, candidates)],
+        "CandidateMoves.rebuild": lambda: [generator.rebuild() for generator in generators],
+        "CandidateMoves.ranked": lambda: [generator.ranked(game.current_player)
+                                          for game, generator in zip(games, generators)],
+        "CandidateMoves.tactical": lambda: [generator.tactical(game.current_player)
+                                            for game, generator in zip(games, generators)],
+        "evaluate_board_state_easy": lambda: [_cold_easy(game.board, game.current_player) for game in games],
+        "evaluate_board_state_advanced_python": lambda: [
+            PenteAI.evaluate_board_state_advanced_python(game.board, game.current_player) for game in games],
+        "evaluate_board_state_patterns": lambda: [
+            PenteAI.evaluate_board_state_patterns(game.board, game.current_player) for game in games],
+        "AdvancedLineScores.score": lambda: [scores.score(game.current_player)
+                                             for game, scores in zip(scored, advanced_scores)],
+        "EasyLineScores.score": lambda: [scores.score(game.current_player)
+                                         for game, scores in zip(scored, easy_scores)],
+    }
+    if pente.np is not None:
+        benchmarks["evaluate_board_state_advanced_numpy"] = lambda: [
+            PenteAI.evaluate_board_state_advanced_numpy(game.board, game.current_player) for game in games]
+
+    results = []
+    for name, function in benchmarks.items():
+        best = min(timeit.repeat(function, repeat=repeats, number=number))
+        results.append({"name": name, "seconds": best / number})
+    return results
+
+
+def git_commit():
+    """Commit of the working tree, None outside a git checkout."""
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              cwd=os.path.dirname(POSITIONS_FILE), check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(results, baseline, tolerance):
+    """
+    Compare a run with an earlier one
+
+    Args:
+        results (dict): This run's report
+        baseline (dict): Earlier report, loaded from its JSON
+        tolerance (float): Relative slowdown accepted before it counts as a regression
+
+    Returns:
+        list: Descriptions of the regressions and best-move changes found
+    """
+    problems = []
+    old_searches = {(entry["position"], entry["mode"]): entry for entry in baseline.get("search", [])}
+    for entry in results["search"]:
+        old = old_searches.get((entry["position"], entry["mode"]))
+        if old is None:
+            continue
+        ratio = entry["nps"] / old["nps"] if old["nps"] else 1.0
+        print(f"{entry['position']:<20} {old['nps']:>10.0f} -> {entry['nps']:>10.0f} nodes/s ({ratio:.2f}x)")
+        if ratio < 1 - tolerance:
+            problems.append(f"{entry['position']}: nodes/sec fell to {ratio:.2f}x")
+        if entry["mode"] == "depth" and old["move"] != entry["move"]:
+            problems.append(f"{entry['position']}: best move changed from {old['move']} to {entry['move']}")
+
+    old_micro = {entry["name"]: entry for entry in baseline.get("micro", [])}
+    for entry in results["micro"]:
+        old = old_micro.get(entry["name"])
+        if old is None:
+            continue
+        ratio = entry["seconds"] / old["seconds"] if old["seconds"] else 1.0
+        print(f"{entry['name']:<40} {ratio:.2f}x time")
+        if ratio > 1 + tolerance:
+            problems.append(f"{entry['name']}: {ratio:.2f}x slower")
+    return problems
+
+
+def run_benchmarks(mode="depth", depth=3, time_limit=2.0, repeats=3, algorithm="alphabeta", heuristic="advanced",
+                   backend="list", threat_depth=0, positions=None, micro=True):
+    """
+    Run the search benchmarks and micro-benchmarks
+
+    Returns:
+        dict: Report with the run's settings, one entry per position and one per micro-benchmark
+    """
+    positions = load_positions() if positions is None else positions
+    settings = {"mode": mode, "depth": depth, "time_limit": time_limit, "repeats": repeats,
+                "algorithm": algorithm, "heuristic": heuristic, "backend": backend, "threat_depth": threat_depth}
+    report = {
+        "meta": {
+            "commit": git_commit(),
+            "time": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "numpy": getattr(pente.np, "__version__", None),
+        },
+        "settings": settings,
+        "search": [],
+        "micro": [],
+    }
+    for position in positions:
+        entry = bench_position(position, mode, depth, time_limit, repeats, algorithm, heuristic, backend,
+                               threat_depth)
+        report["search"].append(entry)
+        agreement = f"{entry['agreement']:.0%}"
+        if "best_agreement" in entry:
+            agreement += f", correct {entry['best_agreement']:.0%}"
+        print(f"{entry['position']:<20} move {entry['move']} depth {entry['depth']} nodes {entry['nodes']:.0f} "
+              f"{entry['seconds']:.3f}s {entry['nps']:.0f} nodes/s (agreement {agreement})")
+    if micro:
+        report["micro"] = micro_benchmarks(positions, backend=backend)
+        for entry in report["micro"]:
+            print(f"{entry['name']:<40} {entry['seconds'] * 1e3:.3f} ms")
+    return report
+
 
 def performance_test():
-    game = PenteGame()
-    ai = PenteAI(game, player_number=2)
-
-    depths = [1, 2, 3, 4, 5]
-    for depth in depths:
-        start_time = time.time()
-        ai.get_best_move(
-            board=game.board,
-            minimax_func=ai.minimax_without_alpha_Beta,
-            isAlphaBeta=False,
-            heuristic_fun=ai.evaluate_board_state_easy,
-            max_depth=depth,
-            time_limit=2  # Example time limit in seconds
-        )
-        without_ab_time = time.time() - start_time
-
-        start_time = time.time()
-        ai.get_best_move(
-            board=game.board,
-            minimax_func=ai.minimax,
-            isAlphaBeta=True,
-            heuristic_fun=ai.evaluate_board_state_easy,
-            max_depth=depth,
-            time_limit=2  # Example time limit in seconds
-        )
-        with_ab_time = time.time() - start_time
-
-        print(f"Depth: {depth}, Without Alpha-Beta: {without_ab_time:.4f}s, With Alpha-Beta: {with_ab_time:.4f}s")
+    run_benchmarks()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the Pente engine on fixed positions")
+    parser.add_argument("--mode", choices=("depth", "time"), default="depth",
+                        help="search each position to a fixed depth or for a fixed time")
+    parser.add_argument("--depth", type=int, default=3, help="depth of the fixed-depth mode")
+    parser.add_argument("--time-limit", type=float, default=2.0, help="seconds per search in fixed-time mode")
+    parser.add_argument("--repeats", type=int, default=3, help="runs per position")
+    parser.add_argument("--algorithm", choices=SEARCHES, default="alphabeta")
+    parser.add_argument("--heuristic", choices=sorted(HEURISTICS), default="advanced")
+    parser.add_argument("--backend", choices=("list", "bitboard"), default="list")
+    parser.add_argument("--threat-depth", type=int, default=0,
+                        help="threat-space search depth, off by default so only the full-width search is timed")
+    parser.add_argument("--positions", default=POSITIONS_FILE, help="position corpus file")
+    parser.add_argument("--no-micro", action="store_true", help="skip the micro-benchmarks")
+    parser.add_argument("--output", help="write the JSON report to this file")
+    parser.add_argument("--compare", help="JSON report of an earlier run to compare with")
+    parser.add_argument("--tolerance", type=float, default=0.1, help="relative slowdown counted as a regression")
+    args = parser.parse_args(argv)
+
+    report = run_benchmarks(args.mode, args.depth, args.time_limit, args.repeats, args.algorithm, args.heuristic,
+                            args.backend, args.threat_depth, load_positions(args.positions), not args.no_micro)
+    if args.output:
+        with open(args.output, "w") as output:
+            json.dump(report, output, indent=2)
+    if args.compare:
+        with open(args.compare) as baseline:
+            problems = compare(report, json.load(baseline), args.tolerance)
+        for problem in problems:
+            print(f"REGRESSION {problem}")
+        return 1 if problems else 0
+    return 0
+
 
 if __name__ == '__main__':
-    performance_test()
\ No newline at end of file
+    sys.exit(main())
@@ -1,5 +1,13 @@
+import random
 import unittest
-from pente import PenteGame
+try:
+    import numpy
+except ImportError:
+    numpy = None
+from pente import (PenteGame, PenteAI, TranspositionTable, AdvancedLineScores, EasyLineScores, CandidateMoves,
+                   PatternTable, EvaluationCache, agent_patterns)
+from pente_threats import ThreatSearch
+from pente_tournament import EngineConfig, random_opening, standings, wilson_interval
 
 class TestPenteGame(unittest.TestCase):
     def setUp(self):
@@ -21,5 +29,418 @@ class TestPenteGame(unittest.TestCase):
         self.game.board[0] = [1, 1, 1, 1, 1]  # Horizontal win
         self.assertEqual(self.game.check_win(), 1)
 
+    def test_check_win_uses_last_move(self):
+        for col in range(4):
+            self.game.board[9][col + 3] = 1
+        self.game.current_player = 1
+        self.game.make_move(9, 7)
+        self.assertEqual(self.game.last_move, (9, 7))
+        self.assertEqual(self.game.check_win(), 1)
+        self.assertTrue(self.game.check_win_at(9, 5))
+        self.assertFalse(self.game.check_win_at(8, 5))
+
+    def test_check_win_by_captures(self):
+        self.game.make_move(0, 0)
+        self.game.captures_p2 = 5
+        self.assertEqual(self.game.check_win(), 2)
+
+    def test_push_and_pop_move_restore_captures(self):
+        self.game.board[5][6] = 2
+        self.game.board[5][7] = 2
+        self.game.board[5][8] = 1
+        self.assertTrue(self.game.push_move(5, 5, 1))
+        self.assertEqual(self.game.captures_p1, 1)
+        self.assertEqual(self.game.board[5][6], 0)
+        self.assertEqual(self.game.current_player, 2)
+        self.assertEqual(self.game.pop_move(), (5, 5))
+        self.assertEqual(self.game.board[5][5], 0)
+        self.assertEqual(self.game.board[5][6], 2)
+        self.assertEqual(self.game.board[5][7], 2)
+        self.assertEqual(self.game.captures_p1, 0)
+        self.assertEqual(self.game.current_player, 1)
+        self.assertIsNone(self.game.last_move)
+
+    def test_hash_is_incremental(self):
+        self.game.board[5][6] = 2
+        self.game.board[5][7] = 2
+        self.game.board[5][8] = 1
+        self.game.hash = self.game.compute_hash()
+        start = self.game.hash
+        self.game.push_move(5, 5, 1)
+        self.assertEqual(self.game.hash, self.game.compute_hash())
+        self.game.push_move(9, 9)
+        self.assertEqual(self.game.hash, self.game.compute_hash())
+        self.game.pop_move()
+        self.game.pop_move()
+        self.assertEqual(self.game.hash, start)
+
+    def test_capture_does_not_wrap_around_board_edge(self):
+        self.game.board[18][0] = 2
+        self.game.board[17][0] = 2
+        self.game.board[16][0] = 1
+        self.game.current_player = 1
+        self.game.make_move(0, 0)
+        self.assertEqual(self.game.captures_p1, 0)
+        self.assertEqual(self.game.board[18][0], 2)
+
+    def test_copy_is_independent(self):
+        self.game.make_move(9, 9)
+        self.game.make_move(9, 10)
+        copy = self.game.copy()
+        self.assertEqual(copy.board, self.game.board)
+        self.assertEqual(copy.hash, self.game.hash)
+        self.assertEqual(copy.current_player, 1)
+        copy.make_move(10, 10)
+        self.assertEqual(self.game.board[10][10], 0)
+        self.assertEqual(copy.pop_move(), (10, 10))
+        self.assertEqual(copy.hash, self.game.hash)
+
+
+class TestBitBoardGame(unittest.TestCase):
+    def setUp(self):
+        self.game = PenteGame(backend="bitboard")
+
+    def test_make_move(self):
+        self.assertTrue(self.game.make_move(0, 0))
+        self.assertEqual(self.game.board[0][0], 1)
+        self.assertFalse(self.game.make_move(0, 0))
+
+    def test_check_win(self):
+        self.game.board[0] = [1, 1, 1, 1, 1]  # Horizontal win
+        self.assertEqual(self.game.check_win(), 1)
+
+    def test_check_win_diagonal(self):
+        for i in range(5):
+            self.game.board[4 - i][14 + i] = 2
+        self.assertEqual(self.game.check_win(), 2)
+        self.game.board[2][16] = 0
+        self.assertIsNone(self.game.check_win())
+
+    def test_five_does_not_wrap_rows(self):
+        for col in range(16, 19):
+            self.game.board[3][col] = 1
+        self.game.board[4][0] = 1
+        self.game.board[4][1] = 1
+        self.assertIsNone(self.game.check_win())
+
+    def test_capture(self):
+        self.game.board[5][6] = 2
+        self.game.board[5][7] = 2
+        self.game.board[5][8] = 1
+        self.game.board.sync()  # Cells written straight into the rows
+        self.game.current_player = 1
+        self.game.make_move(5, 5)
+        self.assertEqual(self.game.captures_p1, 1)
+        self.assertEqual(self.game.board[5][6], 0)
+        self.assertEqual(self.game.board[5][7], 0)
+        self.assertEqual(self.game.board.bits[2], 0)
+        self.game.pop_move()
+        self.assertEqual(self.game.board[5][6], 2)
+        board = self.game.board
+        self.assertEqual(board.bits[2], (1 << board.index(5, 6)) | (1 << board.index(5, 7)))
+
+    def test_matches_list_backend(self):
+        captures = 0
+        for seed in range(6):
+            rng = random.Random(seed)
+            games = [PenteGame(), PenteGame(backend="bitboard")]
+            threats = [ThreatSearch(game, game.attach_observer(CandidateMoves)) for game in games]
+            while not games[0].check_win():
+                empty = [(r, c) for r in range(6, 13) for c in range(6, 13) if not games[0].board[r][c]]
+                if not empty:
+                    break
+                move = rng.choice(empty)
+                for game in games:
+                    game.make_move(*move)
+                self.assertEqual(games[1].board, games[0].board)
+                self.assertEqual(games[1].check_win(), games[0].check_win())
+                self.assertEqual(games[1].move_stack[-1][3], games[0].move_stack[-1][3])  # Same stones captured
+                for player in (1, 2):
+                    self.assertEqual(threats[1].capture_moves(player), threats[0].capture_moves(player))
+            captures += games[0].captures_p1 + games[0].captures_p2
+            bits = list(games[1].board.bits)
+            games[1].board.sync()
+            self.assertEqual(games[1].board.bits, bits)  # push/pop kept the bitboards in sync
+            while games[1].move_stack:
+                games[1].pop_move()
+            self.assertEqual(games[1].board.bits, [0, 0, 0])
+        self.assertGreater(captures, 3)
+
+    def test_copy_keeps_bitboards(self):
+        self.game.make_move(5, 5)
+        copy = self.game.copy()
+        self.assertEqual(copy.board.bits, self.game.board.bits)
+        copy.make_move(5, 6)
+        self.assertEqual(self.game.board.bits[2], 0)
+
+class TestTranspositionTable(unittest.TestCase):
+    def setUp(self):
+        self.table = TranspositionTable(size_mb=0.001)
+
+    def test_store_and_probe(self):
+        self.assertIsNone(self.table.probe(12345))
+        self.table.store(12345, 3, TranspositionTable.LOWER, 42.5, 180)
+        self.assertEqual(self.table.probe(12345), (3, TranspositionTable.LOWER, 42.5, 180))
+        self.table.clear()
+        self.assertIsNone(self.table.probe(12345))
+
+    def test_depth_preferred_replacement(self):
+        buckets = self.table.buckets
+        self.table.store(1, 5, TranspositionTable.EXACT, 1.0)
+        self.table.store(1 + buckets, 2, TranspositionTable.EXACT, 2.0)
+        self.table.store(1 + 2 * buckets, 1, TranspositionTable.EXACT, 3.0)
+        self.assertEqual(self.table.probe(1)[2], 1.0)  # Deeper entry kept
+        self.assertIsNone(self.table.probe(1 + buckets))  # Always-replace slot overwritten
+        self.assertEqual(self.table.probe(1 + 2 * buckets)[2], 3.0)
+        self.table.new_search()
+        self.table.store(1 + buckets, 2, TranspositionTable.EXACT, 2.0)
+        self.assertEqual(self.table.probe(1 + buckets)[2], 2.0)  # Stale deep entry reclaimed
+
+class TestEvaluationCache(unittest.TestCase):
+    def test_least_recently_used_is_evicted(self):
+        cache = EvaluationCache(capacity=2)
+        cache.put(1, 10)
+        cache.put(2, 20)
+        self.assertEqual(cache.get(1), 10)
+        cache.put(3, 30)
+        self.assertIsNone(cache.get(2))
+        self.assertEqual(cache.get(3), 30)
+        self.assertEqual(len(cache), 2)
+        self.assertEqual((cache.hits, cache.misses), (2, 1))
+
+    def test_search_reuses_and_switches_heuristics(self):
+        game = PenteGame()
+        ai = PenteAI(game, player_number=2, eval_cache_size=100)
+        for row, col in [(9, 9), (9, 10), (10, 10)]:
+            game.make_move(row, col)
+        easy = ai.evaluate(PenteAI.evaluate_board_state_easy)
+        self.assertEqual(ai.evaluate(PenteAI.evaluate_board_state_easy), easy)
+        self.assertEqual(ai.eval_cache.hits, 1)
+        self.assertEqual(ai.evaluate(PenteAI.evaluate_board_state_advanced),
+                         PenteAI.evaluate_board_state_advanced(game.board, 2))
+        self.assertEqual(len(ai.eval_cache), 1)
+
+
+class TestLineScores(unittest.TestCase):
+    def test_matches_full_heuristics(self):
+        rng = random.Random(7)
+        game = PenteGame()
+        advanced = game.attach_observer(AdvancedLineScores)
+        easy = game.attach_observer(EasyLineScores)
+        for move in range(80):
+            if move % 4 == 3:
+                game.pop_move()
+            else:
+                game.push_move(rng.randrange(19), rng.randrange(4, 15))
+            for player in (1, 2):
+                self.assertEqual(advanced.score(player), PenteAI.evaluate_board_state_advanced(game.board, player))
+                self.assertEqual(easy.score(player), PenteAI.evaluate_board_state_easy(game.board, player))
+
+
+class TestCandidateMoves(unittest.TestCase):
+    def setUp(self):
+        self.game = PenteGame()
+        self.ai = PenteAI(self.game, player_number=2)
+
+    def test_empty_board_starts_at_center(self):
+        self.assertEqual(self.ai.get_prioritized_moves(self.game.board)[0], (9, 9))
+
+    def test_moves_are_unique_and_near_stones(self):
+        for row, col in [(9, 9), (9, 10), (10, 10), (3, 3)]:
+            self.game.make_move(row, col)
+        moves = self.ai.get_prioritized_moves(self.game.board)
+        self.assertEqual(len(moves), len(set(moves)))
+        for row, col in moves:
+            self.assertEqual(self.game.board[row][col], 0)
+            self.assertTrue(any(self.game.board[r][c]
+                                for r in range(row - 1, row + 2) for c in range(col - 1, col + 2)
+                                if 0 <= r < 19 and 0 <= c < 19))
+
+    def test_win_block_and_capture_come_first(self):
+        for col in range(5, 9):
+            self.game.push_move(9, col, 1)
+        self.game.push_move(3, 4, 2)
+        self.game.push_move(3, 5, 1)
+        self.game.push_move(3, 6, 1)
+        moves = self.ai.get_prioritized_moves(self.game.board, 2)
+        self.assertEqual(set(moves[:2]), {(9, 4), (9, 9)})
+        self.assertEqual(moves[2], (3, 7))
+        self.game.push_move(9, 4, 2)
+        self.game.pop_move()
+        self.assertEqual(self.ai.get_prioritized_moves(self.game.board, 2), moves)
+
+    def test_tactical_matches_ranked_tiers(self):
+        rng = random.Random(11)
+        generator = self.ai.move_generator()
+        for _ in range(60):
+            self.game.push_move(rng.randrange(5, 14), rng.randrange(5, 14))
+            for me in (1, 2):
+                expected = sorted((tier, cell) for tier, _, cell in generator.ranked(me) if tier <= 4)
+                self.assertEqual(generator.tactical(me), expected)
+
+
+class TestAnalyzeBoard(unittest.TestCase):
+    def setUp(self):
+        self.game = PenteGame()
+        for row, col in [(9, 9), (5, 5), (9, 10), (5, 6)]:
+            self.game.make_move(row, col)
+
+    def test_single_pass_fills_every_mode(self):
+        analysis = PenteAI.analyze_board(self.game.board, 1, 2, 19)
+        self.assertEqual(analysis.opportunities[(9, 11)], 80)
+        self.assertEqual(analysis.threats[(9, 11)], 80)
+        self.assertEqual(analysis.threats[(5, 7)], 100)
+        self.assertNotIn((5, 7), analysis.opportunities)
+        self.assertIn((5, 7), analysis.parallel)
+        self.assertNotIn((9, 11), analysis.parallel)
+        self.assertEqual(analysis.surrounding, ())
+        for mode in ("threats", "opportunities"):
+            self.assertEqual(PenteAI.analyze_board(self.game.board, 1, 2, 19, mode), getattr(analysis, mode))
+        self.assertEqual(PenteAI.analyze_board(self.game.board, 1, 2, 19, "parallel"), list(analysis.parallel))
+
+    def test_repeated_position_is_cached(self):
+        analysis = PenteAI.analyze_board(self.game.board, 1, 2, 19)
+        self.assertIs(PenteAI.analyze_board([list(row) for row in self.game.board], 1, 2, 19), analysis)
+        self.game.make_move(3, 3)
+        self.assertIsNot(PenteAI.analyze_board(self.game.board, 1, 2, 19), analysis)
+
+
+class TestPatternTable(unittest.TestCase):
+    def test_find_matches_brute_force(self):
+        table = PatternTable(agent_patterns)
+        rng = random.Random(5)
+        board = [[rng.choice([0, 0, 1, 2]) for _ in range(9)] for _ in range(9)]
+        expected = set()
+        for row in range(9):
+            for col in range(9):
+                for dx, dy in [(0, 1), (1, 0), (1, 1), (-1, 1)]:
+                    for pattern, weight in table.patterns.items():
+                        cells = [(row + i * dx, col + i * dy) for i in range(len(pattern))]
+                        if all(0 <= r < 9 and 0 <= c < 9 and board[r][c] == stone
+                               for (r, c), stone in zip(cells, pattern)):
+                            expected.add(((row, col), (dx, dy), pattern, weight))
+        self.assertEqual(set(table.find(board)), expected)
+        self.assertEqual(table.board_score(board), sum(weight for _, _, _, weight in expected))
+
+    def test_scan_reports_positions_in_both_orientations(self):
+        table = PatternTable({(0, 1, 1, 0): 10, (1, 1, 0, 0): 5})
+        self.assertEqual(table.scan((2, 0, 0, 1, 1, 0, 0)),
+                         [(1, (0, 0, 1, 1), 5), (2, (0, 1, 1, 0), 10), (3, (1, 1, 0, 0), 5)])
+        self.assertTrue(table.covers((2, 0, 0, 1, 1, 0, 0), 5))
+        self.assertFalse(table.covers((2, 0, 0, 1, 1, 0, 0), 0))
+
+    def test_pattern_heuristic_is_symmetric(self):
+        game = PenteGame()
+        for row, col in [(9, 9), (9, 10), (10, 10), (8, 8), (10, 9), (7, 7)]:
+            game.make_move(row, col)
+        score = PenteAI.evaluate_board_state_patterns(game.board, 1)
+        self.assertNotEqual(score, 0)
+        self.assertEqual(PenteAI.evaluate_board_state_patterns(game.board, 2), -score)
+
+
+class TestQuiescence(unittest.TestCase):
+    def setUp(self):
+        self.game = PenteGame()
+        self.ai = PenteAI(self.game, player_number=2)
+        self.ai.prepare_search(PenteAI.evaluate_board_state_easy)
+
+    def test_depth_zero_is_static_evaluation(self):
+        for row, col in [(9, 9), (9, 10), (10, 10)]:
+            self.game.make_move(row, col)
+        self.assertEqual(self.ai.quiescence(True, float('-inf'), float('inf'), PenteAI.evaluate_board_state_easy, 0),
+                         self.ai.evaluate(PenteAI.evaluate_board_state_easy))
+
+    def test_pending_five_is_resolved(self):
+        for col in range(5, 9):
+            self.game.push_move(9, col, 1)
+        self.game.push_move(9, 4, 2)
+        # The opponent to move completes five; the AI to move blocks it
+        self.assertEqual(self.ai.quiescence(False, float('-inf'), float('inf'),
+                                            PenteAI.evaluate_board_state_easy, 4), -10000)
+        self.assertGreater(self.ai.quiescence(True, float('-inf'), float('inf'),
+                                              PenteAI.evaluate_board_state_easy, 4), -10000)
+        self.assertEqual(len(self.game.move_stack), 5)
+
+
+class TestThreatSearch(unittest.TestCase):
+    def setUp(self):
+        self.game = PenteGame()
+        self.ai = PenteAI(self.game, player_number=2)
+
+    def place(self, stones, player):
+        for row, col in stones:
+            self.game.push_move(row, col, player)
+
+    def test_finds_four_three(self):
+        self.place([(9, 4), (3, 3), (15, 15)], 1)
+        self.place([(9, 5), (9, 6), (9, 7), (7, 8), (8, 8)], 2)
+        hash_before = self.game.hash
+        search = ThreatSearch(self.game, self.ai.move_generator())
+        self.assertEqual(search.find_win(2), (9, 8))
+        self.assertEqual(self.game.hash, hash_before)
+        self.assertEqual(len(self.game.move_stack), 8)
+
+    def test_threes_can_be_turned_off(self):
+        self.place([(3, 3), (15, 15), (3, 15)], 1)
+        self.place([(9, 6), (9, 7), (7, 8), (8, 8)], 2)
+        self.assertEqual(ThreatSearch(self.game, self.ai.move_generator()).find_win(2), (9, 8))
+        self.assertIsNone(ThreatSearch(self.game, self.ai.move_generator(), use_threes=False).find_win(2))
+
+    def test_opponent_four_stops_the_attack(self):
+        self.place([(3, 3), (3, 4), (3, 5), (3, 6)], 1)
+        self.place([(9, 5), (9, 6), (9, 7), (7, 8), (8, 8)], 2)
+        self.assertIsNone(ThreatSearch(self.game, self.ai.move_generator()).find_win(2))
+
+    def test_capture_threat_wins_at_four_captures(self):
+        self.place([(9, 9), (9, 10), (10, 8), (11, 8), (3, 3)], 1)
+        self.game.captures_p2 = 4
+        self.game.hash = self.game.compute_hash()
+        # (9, 8) threatens both pairs, only one can be saved
+        self.assertEqual(ThreatSearch(self.game, self.ai.move_generator()).find_win(2), (9, 8))
+        self.game.captures_p2 = 3
+        self.game.hash = self.game.compute_hash()
+        self.assertIsNone(ThreatSearch(self.game, self.ai.move_generator()).find_win(2))
+
+
+@unittest.skipIf(numpy is None, "NumPy is not installed")
+class TestNumpyEvaluation(unittest.TestCase):
+    def test_matches_python_version(self):
+        rng = random.Random(3)
+        for density in (0.05, 0.3, 0.7):
+            board = [[rng.choice([1, 2]) if rng.random() < density else 0 for _ in range(19)] for _ in range(19)]
+            for player in (1, 2):
+                self.assertEqual(PenteAI.evaluate_board_state_advanced_numpy(board, player),
+                                 PenteAI.evaluate_board_state_advanced_python(board, player))
+
+class TestTournament(unittest.TestCase):
+    def test_engine_config_parse(self):
+        config = EngineConfig.parse("deep:algorithm=pvs,depth=4,time_limit=0.5")
+        self.assertEqual((config.name, config.algorithm, config.depth, config.time_limit), ("deep", "pvs", 4, 0.5))
+        self.assertEqual(config.heuristic, "advanced")
+        with self.assertRaises(ValueError):
+            EngineConfig.parse("bad:algorithm=random")
+
+    def test_wilson_interval(self):
+        low, high = wilson_interval(5, 10)
+        self.assertAlmostEqual(low + high, 1.0)
+        self.assertLess(low, 0.5)
+        self.assertGreater(wilson_interval(50, 100)[0], low)  # More games, narrower interval
+        self.assertEqual(wilson_interval(10, 10)[1], 1.0)
+
+    def test_random_opening_is_reproducible(self):
+        self.assertEqual(random_opening(3, 6), random_opening(3, 6))
+        self.assertEqual(len(set(random_opening(3, 6))), 6)
+
+    def test_standings_count_draws_as_half(self):
+        configs = [EngineConfig("a"), EngineConfig("b")]
+        usage = {"moves": 2, "seconds": 1.0, "nodes": 100}
+        results = [{"black": "a", "white": "b", "winner": "a", "usage": {"a": usage, "b": usage}},
+                   {"black": "b", "white": "a", "winner": None, "usage": {"a": usage, "b": usage}}]
+        table = {row["name"]: row for row in standings(results, configs)}
+        self.assertEqual(table["a"]["score"], 0.75)
+        self.assertEqual((table["b"]["losses"], table["b"]["draws"]), (1, 1))
+        self.assertEqual(table["a"]["latency"], 0.5)
+        self.assertEqual(table["a"]["nps"], 100)
+
 if __name__ == '__main__':
     unittest.main()
\ No newline at end of file